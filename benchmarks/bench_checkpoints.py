@@ -0,0 +1,79 @@
+"""Benchmark of the size, save time and load time of the checkpoint formats of the training works.
+
+Trains a synthetic model of ``--params`` million parameters (about the size of a ``resnet101`` backbone by default)
+for one step with Adam, so it has optimizer states, then saves it as ``full`` (what ``trainer.save_checkpoint`` saves:
+the weights and the optimizer states, with ``torch.save``) and as ``weights`` in float32 and float16 with
+``flashy.components.checkpoints.save_weights``. Loading measures the time until the weights can be used.
+
+Usage: ``python benchmarks/bench_checkpoints.py --params 44``
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import torch
+
+from flashy.components.checkpoints import load_weights, save_weights
+
+
+def build_model(num_params: int) -> torch.nn.Module:
+    width = 2048
+    num_layers = max(1, num_params // (width * width))
+    model = torch.nn.Sequential(*[torch.nn.Linear(width, width) for _ in range(num_layers)])
+    optimizer = torch.optim.Adam(model.parameters())
+    model(torch.randn(8, width)).sum().backward()
+    optimizer.step()
+    model.optimizer = optimizer
+    return model
+
+
+def save_full(model: torch.nn.Module, path: str):
+    torch.save({"state_dict": model.state_dict(), "optimizer_states": [model.optimizer.state_dict()]}, path)
+
+
+def load_full(path: str) -> int:
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    return len(checkpoint["state_dict"])
+
+
+def load_mmap(path: str) -> int:
+    tensors, _ = load_weights(path)
+    return len(tensors)
+
+
+def time_call(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--params", type=int, default=44, help="Millions of parameters of the model")
+    args = parser.parse_args()
+
+    model = build_model(args.params * 1000 * 1000)
+    num_params = sum(parameter.numel() for parameter in model.parameters())
+    print(f"model: {num_params / 1e6:.1f}M parameters")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        formats = (
+            ("full", "checkpoint.pt", lambda path: save_full(model, path), load_full),
+            ("weights", "fp32.safetensors", lambda path: save_weights(model, path), load_mmap),
+            ("weights_fp16", "fp16.safetensors", lambda path: save_weights(model, path, dtype="float16"), load_mmap),
+        )
+        for name, filename, save_fn, load_fn in formats:
+            path = os.path.join(tmpdir, filename)
+            save = time_call(save_fn, path)
+            load = time_call(load_fn, path)
+            rows.append((name, os.path.getsize(path), save, load))
+
+    print(f"{'format':<14} {'size (MB)':>10} {'save (s)':>9} {'load (s)':>9}")
+    for name, size, save, load in rows:
+        print(f"{name:<14} {size / 1e6:>10.1f} {save:>9.2f} {load:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark of the extraction of a dataset archive by the FlashTrainer.
+
+Builds a synthetic zip of ``--images`` small JPEG-like files split into ``train``, ``val`` and ``test`` folders and
+extracts it for a data config referencing only the train folder. ``extractall`` is the previous behaviour of
+extracting the whole archive with a single thread, ``filtered`` only extracts the members referenced by the data
+config and ``parallel`` also decompresses them with one thread per CPU.
+
+Usage: ``python benchmarks/bench_extract_archive.py --images 100000 --image-size 2048``
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+
+from flashy.components.dataset_cache import extract_archive, get_archive_members
+
+_SPLITS = (("train", 0.7), ("val", 0.15), ("test", 0.15))
+
+
+def make_archive(path: str, num_images: int, image_size: int, num_classes: int = 10):
+    rng = random.Random(0)
+    # Half random and half constant bytes, as JPEGs compress a little
+    noise = rng.randbytes(image_size * 8)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        index = 0
+        for split, fraction in _SPLITS:
+            for _ in range(int(num_images * fraction)):
+                offset = rng.randrange(len(noise) - image_size // 2)
+                data = b"\xff\xd8\xff\xe0" + noise[offset : offset + image_size // 2] + bytes(image_size // 2)
+                zf.writestr(f"data/{split}/{index % num_classes}/{index}.jpg", data)
+                index += 1
+
+
+def get_bytes_written(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(dirpath, filename))
+        for dirpath, _, filenames in os.walk(path)
+        for filename in filenames
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=100000)
+    parser.add_argument("--image-size", type=int, default=2048)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=len(os.sched_getaffinity(0)))
+    args = parser.parse_args()
+
+    data_config = {"target": "from_folders", "train_folder": "data/train/"}
+    members = get_archive_members(data_config)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        archive_path = os.path.join(tmpdir, "data.zip")
+        t0 = time.perf_counter()
+        make_archive(archive_path, args.images, args.image_size)
+        print(f"Built a {os.path.getsize(archive_path) / 1024**2:.0f} MB archive in {time.perf_counter() - t0:.1f}s")
+
+        def run_extractall(output_dir):
+            with zipfile.ZipFile(archive_path) as zf:
+                zf.extractall(output_dir)
+
+        modes = {
+            "extractall": run_extractall,
+            "filtered": lambda output_dir: extract_archive(archive_path, output_dir, members=members, num_workers=1),
+            "parallel": lambda output_dir: extract_archive(
+                archive_path, output_dir, members=members, num_workers=args.workers
+            ),
+        }
+
+        # The modes are run in turns and the fastest of their runs is reported, as the writeback of the files of a run
+        # slows down the next one
+        timings = {mode: [] for mode in modes}
+        written = {}
+        for _ in range(args.repeats):
+            for mode, extract in modes.items():
+                output_dir = os.path.join(tmpdir, mode)
+                t0 = time.perf_counter()
+                extract(output_dir)
+                timings[mode].append(time.perf_counter() - t0)
+                written[mode] = (
+                    sum(len(filenames) for _, _, filenames in os.walk(output_dir)),
+                    get_bytes_written(output_dir) / 1024**2,
+                )
+                shutil.rmtree(output_dir)
+
+        print(f"{'mode':<12} {'wall (s)':>10} {'files':>10} {'MB written':>12}")
+        for mode in modes:
+            num_files, megabytes = written[mode]
+            print(f"{mode:<12} {min(timings[mode]):>10.2f} {num_files:>10} {megabytes:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
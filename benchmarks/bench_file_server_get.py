@@ -0,0 +1,88 @@
+"""Benchmark of the FileServer ``/file/<id>`` GET latency against a Drive holding many objects.
+
+The Drive stand-in lists a local directory, so the cost of a listing grows with the number of stored objects as it
+does for a real Drive. ``--no-index`` emulates the previous behaviour of listing the Drive on every request.
+
+Usage: ``python benchmarks/bench_file_server_get.py --objects 10000``
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from lightning.app.storage import Drive
+
+from flashy.components.file_server import FileServer
+
+
+class LocalDrive(Drive):
+    """A stand-in for a ``Drive`` which copies files to a local directory."""
+
+    def __init__(self, local_root: str):
+        super().__init__("lit://benchmark")
+        self.local_root = local_root
+
+    def put(self, path: str):
+        shutil.copy(path, os.path.join(self.local_root, os.path.basename(path)))
+
+    def get(self, path: str):
+        shutil.copy(os.path.join(self.local_root, os.path.basename(path)), path)
+
+    def list(self, path: str = "."):
+        return os.listdir(self.local_root)
+
+
+def benchmark(num_objects: int, num_requests: int, use_index: bool, workdir: str):
+    drive_root = os.path.join(workdir, "drive")
+    os.makedirs(drive_root)
+    for index in range(num_objects):
+        open(os.path.join(drive_root, f"object_{index}"), "w").close()
+
+    server = FileServer(LocalDrive(drive_root), base_dir=os.path.join(workdir, "files"))
+    if not use_index:
+        server._drive_index.contains = lambda path: os.path.normpath(path) in server.drive.list()
+    client = server._create_app().test_client()
+
+    meta = client.post(
+        "/uploadfile/",
+        data={"file": (io.BytesIO(os.urandom(1024)), "file.bin")},
+        content_type="multipart/form-data",
+    ).json
+
+    latencies = []
+    for _ in range(num_requests):
+        t0 = time.perf_counter()
+        response = client.get(f"/file/{meta['drive_path']}")
+        response.close()
+        latencies.append((time.perf_counter() - t0) * 1e3)
+        assert response.status_code == 200
+
+    shutil.rmtree(drive_root)
+    shutil.rmtree(os.path.join(workdir, "files"))
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--no-index", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'objects':>8} | {'index':>6} | {'p50 ms':>8} | {'p99 ms':>8}")
+        for num_objects in args.objects:
+            for use_index in (False, True) if not args.no_index else (False,):
+                p50, p99 = benchmark(num_objects, args.requests, use_index, workdir)
+                print(f"{num_objects:>8} | {str(use_index):>6} | {p50:>8.3f} | {p99:>8.3f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Load benchmark of the FileServer serving engines.
+
+Measures the latency of ``/listarchive/`` while large uploads and downloads are running concurrently against a real
+server listening on localhost, with a local directory standing in for the Drive.
+
+Usage: ``python benchmarks/bench_file_server_load.py --servers waitress threaded development``
+"""
+import argparse
+import io
+import os
+import shutil
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import zipfile
+
+import requests
+from lightning.app.storage import Drive
+
+from flashy.components.file_server import FileServer
+
+_MB = 1024 * 1024
+
+
+class LocalDrive(Drive):
+    """A stand-in for a ``Drive`` which copies files to a local directory."""
+
+    def __init__(self, local_root: str):
+        super().__init__("lit://benchmark")
+        self.local_root = local_root
+
+    def put(self, path: str):
+        shutil.copy(path, os.path.join(self.local_root, os.path.basename(path)))
+
+    def get(self, path: str):
+        shutil.copy(os.path.join(self.local_root, os.path.basename(path)), path)
+
+    def list(self, path: str = "."):
+        return os.listdir(self.local_root)
+
+
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_server(url: str):
+    for _ in range(100):
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f"The server at {url} did not start!")
+
+
+def _make_archive() -> bytes:
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for index in range(1000):
+            zf.writestr(f"data/{index % 10}/{index}.jpg", b"image")
+    return archive.getvalue()
+
+
+def benchmark(server_name: str, num_uploads: int, num_downloads: int, size_mb: int, num_requests: int, workdir: str):
+    drive_root = os.path.join(workdir, server_name, "drive")
+    os.makedirs(drive_root)
+
+    server = FileServer(
+        LocalDrive(drive_root),
+        base_dir=os.path.join(workdir, server_name, "files"),
+        server=server_name,
+    )
+    port = _get_free_port()
+    url = f"http://127.0.0.1:{port}"
+    threading.Thread(target=server._serve, args=(server._create_app(), "127.0.0.1", port), daemon=True).start()
+    _wait_for_server(url + "/listarchive/missing/")
+
+    archive_id = requests.post(url + "/uploadfile/", files={"file": ("data.zip", _make_archive())}).json()["drive_path"]
+    payload = os.urandom(size_mb * _MB)
+    large_id = requests.post(url + "/uploadfile/", files={"file": ("large.bin", payload)}).json()["drive_path"]
+
+    stop = threading.Event()
+
+    def upload():
+        while not stop.is_set():
+            requests.post(url + "/uploadfile/", files={"file": ("large.bin", payload)})
+
+    def download():
+        while not stop.is_set():
+            with requests.get(f"{url}/file/{large_id}", stream=True) as response:
+                for _ in response.iter_content(_MB):
+                    pass
+
+    load = [threading.Thread(target=upload, daemon=True) for _ in range(num_uploads)]
+    load += [threading.Thread(target=download, daemon=True) for _ in range(num_downloads)]
+    for thread in load:
+        thread.start()
+    time.sleep(1)
+
+    latencies = []
+    for _ in range(num_requests):
+        t0 = time.perf_counter()
+        response = requests.get(f"{url}/listarchive/{archive_id}/jpg/?limit=100")
+        latencies.append((time.perf_counter() - t0) * 1e3)
+        assert response.status_code == 200
+
+    stop.set()
+    for thread in load:
+        thread.join()
+
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--servers", nargs="+", default=["waitress", "threaded"])
+    parser.add_argument("--uploads", type=int, default=4, help="Number of concurrent uploads.")
+    parser.add_argument("--downloads", type=int, default=4, help="Number of concurrent downloads.")
+    parser.add_argument("--size", type=int, default=200, help="Size of the uploaded / downloaded files in MB.")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'server':>12} | {'p50 ms':>8} | {'p99 ms':>8}")
+        for server_name in args.servers:
+            p50, p99 = benchmark(server_name, args.uploads, args.downloads, args.size, args.requests, workdir)
+            print(f"{server_name:>12} | {p50:>8.2f} | {p99:>8.2f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark of the FileServer upload throughput.
+
+Uploads files of increasing size through the ``/uploadfile/`` endpoint using the Flask test client, with a local
+directory standing in for the Drive.
+
+Usage: ``python benchmarks/bench_file_server_upload.py --sizes 10 100 1000 5000``
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from lightning.app.storage import Drive
+
+from flashy.components.file_server import FileServer
+
+_MB = 1024 * 1024
+
+
+class LocalDrive(Drive):
+    """A stand-in for a ``Drive`` which copies files to a local directory."""
+
+    def __init__(self, local_root: str):
+        super().__init__("lit://benchmark")
+        self.local_root = local_root
+
+    def put(self, path: str):
+        shutil.copy(path, os.path.join(self.local_root, os.path.basename(path)))
+
+    def get(self, path: str):
+        shutil.copy(os.path.join(self.local_root, os.path.basename(path)), path)
+
+    def list(self, path: str = "."):
+        return [os.path.join(path, name) for name in os.listdir(self.local_root)]
+
+
+def _make_file(path: str, size: int):
+    block = os.urandom(_MB)
+    with open(path, "wb") as f:
+        for _ in range(size // _MB):
+            f.write(block)
+        f.write(block[: size % _MB])
+
+
+def benchmark(size_mb: int, chunk_size: int, workdir: str) -> float:
+    drive_root = os.path.join(workdir, "drive")
+    os.makedirs(drive_root, exist_ok=True)
+
+    server = FileServer(LocalDrive(drive_root), base_dir=os.path.join(workdir, "uploads"), chunk_size=chunk_size)
+    client = server._create_app().test_client()
+
+    source = os.path.join(workdir, "source.bin")
+    _make_file(source, size_mb * _MB)
+
+    with open(source, "rb") as f:
+        t0 = time.perf_counter()
+        response = client.post("/uploadfile/", data={"file": (f, "source.bin")}, content_type="multipart/form-data")
+        elapsed = time.perf_counter() - t0
+
+    assert response.status_code == 200, response.json
+    shutil.rmtree(drive_root)
+    shutil.rmtree(os.path.join(workdir, "uploads"))
+    os.remove(source)
+    return size_mb / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="File sizes in MB.")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[10240, 1024 * 1024])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        print(f"{'size (MB)':>10} | {'chunk size':>10} | {'MB/s':>10}")
+        for size_mb in args.sizes:
+            for chunk_size in args.chunk_sizes:
+                throughput = benchmark(size_mb, chunk_size, workdir)
+                print(f"{size_mb:>10} | {chunk_size:>10} | {throughput:>10.1f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
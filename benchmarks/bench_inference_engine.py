@@ -0,0 +1,88 @@
+"""Load benchmark of the FlashGradio inference engine.
+
+Concurrent clients send requests to a synthetic model whose latency is a fixed overhead per call plus a small cost per
+input, as for a model predicting a batch on a GPU. ``reload`` emulates the previous behaviour of loading the checkpoint
+for every request.
+
+Usage: ``python benchmarks/bench_inference_engine.py --clients 16 --requests 50``
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from flashy.components.inference_engine import InferenceEngine
+
+
+class SyntheticModel:
+    """Predicts one batch at a time, like a single model on a GPU."""
+
+    def __init__(self, overhead: float, per_input: float, load_time: float = 0.0):
+        self.overhead = overhead
+        self.per_input = per_input
+        self.load_time = load_time
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs):
+        with self._lock:
+            time.sleep(self.load_time + self.overhead + self.per_input * len(inputs))
+        return [len(text) for text in inputs]
+
+
+def run_clients(predict, num_clients: int, num_requests: int, num_distinct: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(seed):
+        rng = random.Random(seed)
+        for _ in range(num_requests):
+            text = f"sample text {rng.randrange(num_distinct)}"
+            t0 = time.perf_counter()
+            predict(text)
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1e3)
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(num_clients)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))], len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="Number of requests per client.")
+    parser.add_argument("--distinct", type=int, default=200, help="Number of distinct inputs.")
+    parser.add_argument("--overhead", type=float, default=0.02, help="Latency of a model call in seconds.")
+    parser.add_argument("--per-input", type=float, default=0.001, help="Latency per input of a model call in seconds.")
+    parser.add_argument("--load-time", type=float, default=0.5, help="Time to load the model in seconds.")
+    args = parser.parse_args()
+
+    modes = {
+        "reload": (None, {}),
+        "engine (no batching)": (SyntheticModel(args.overhead, args.per_input), {"max_batch_size": 1, "cache_size": 0}),
+        "engine (batching)": (SyntheticModel(args.overhead, args.per_input), {"cache_size": 0}),
+        "engine (batching, cache)": (SyntheticModel(args.overhead, args.per_input), {}),
+    }
+
+    print(f"{'mode':>26} | {'p50 ms':>8} | {'p99 ms':>8} | {'req/s':>8}")
+    for mode, (model, kwargs) in modes.items():
+        if model is None:
+            model = SyntheticModel(args.overhead, args.per_input, load_time=args.load_time)
+            # Few requests, as every request loads the model again
+            p50, p99, throughput = run_clients(lambda text: model([text])[0], args.clients, 2, args.distinct)
+        else:
+            with InferenceEngine(model, **kwargs) as engine:
+                p50, p99, throughput = run_clients(engine.predict, args.clients, args.requests, args.distinct)
+        print(f"{mode:>26} | {p50:>8.1f} | {p99:>8.1f} | {throughput:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Memory benchmark of streaming the predictions of FlashFiftyOne to its dataset.
+
+A synthetic model predicts a dataset of ``--samples`` images, each prediction holding a label and the logits over
+``--classes`` classes. The samples are written to a dataset backed by a file, as FiftyOne writes them to its database
+outside of the process. ``all_at_once`` emulates the previous behaviour of predicting the whole dataset before adding
+it, ``streaming`` adds the predictions chunk by chunk with a ``PredictionStream``.
+
+Usage: ``python benchmarks/bench_prediction_stream.py --samples 20000 --chunk-size 1024``
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+
+from flashy.components.prediction_stream import PredictionStream
+
+
+class FileDataset:
+    """Writes the samples it is given to a file instead of keeping them in memory."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def add_samples(self, samples):
+        for sample in samples:
+            self.f.write(json.dumps(sample))
+            self.f.write("\n")
+
+
+def predict(start: int, stop: int, batch_size: int, num_classes: int):
+    rng = random.Random(start)
+    batches = []
+    for batch_start in range(start, stop, batch_size):
+        batch = []
+        for index in range(batch_start, min(batch_start + batch_size, stop)):
+            logits = [rng.random() for _ in range(num_classes)]
+            batch.append(
+                {
+                    "filepath": f"images/{index:08d}.jpg",
+                    "predictions": {"label": str(max(range(num_classes), key=logits.__getitem__)), "logits": logits},
+                }
+            )
+        batches.append(batch)
+    return batches
+
+
+def run(num_samples: int, chunk_size: int, batch_size: int, num_classes: int):
+    """Returns the peak memory in MB, the seconds until the first samples are in the dataset and the total seconds."""
+    first_at = []
+    with tempfile.TemporaryFile("w") as f:
+        stream = PredictionStream(
+            FileDataset(f), lambda prediction: prediction, on_first_chunk=lambda _: first_at.append(time.perf_counter())
+        )
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for start in range(0, num_samples, chunk_size):
+            stream.add(predict(start, min(start + chunk_size, num_samples), batch_size, num_classes))
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / 1024**2, first_at[0] - t0, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--classes", type=int, default=100)
+    args = parser.parse_args()
+
+    modes = {"all_at_once": args.samples, "streaming": args.chunk_size}
+    print(f"{'mode':<12} {'chunk':>8} {'peak MB':>10} {'first (s)':>10} {'total (s)':>10}")
+    for mode, chunk_size in modes.items():
+        peak, first, total = run(args.samples, chunk_size, args.batch_size, args.classes)
+        print(f"{mode:<12} {chunk_size:>8} {peak:>10.1f} {first:>10.2f} {total:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
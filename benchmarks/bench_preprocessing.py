@@ -0,0 +1,109 @@
+"""Benchmark of the data loading CPU time of the runs of a text classification sweep.
+
+Writes a synthetic CSV of ``--texts`` reviews and emulates ``--runs`` runs which each go over the training data once
+in batches. ``per_run`` tokenizes the texts of every batch, as the runs did before, ``cached`` tokenizes them once
+with ``flashy.components.preprocessing.tokenize`` and the runs read the batches from the memory-mapped cache.
+
+With ``--tokenizer`` set to a Hugging Face model (e.g. ``prajjwal1/bert-tiny``, which requires ``transformers``), its
+fast tokenizer is used. By default, a simple Python tokenizer is used.
+
+Usage: ``python benchmarks/bench_preprocessing.py --texts 20000 --runs 10``
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from flashy.components.preprocessing import load_preprocessed, save_preprocessed, tokenize
+
+_WORDS = [f"word{index}" for index in range(5000)]
+
+
+class SimpleTokenizer:
+    """Splits texts on whitespace and looks the words up in a vocabulary."""
+
+    def __init__(self):
+        self.vocab = {word: index + 1 for index, word in enumerate(_WORDS)}
+
+    def __call__(self, texts, max_length, truncation=True, padding="max_length", return_tensors="np"):
+        input_ids = np.zeros((len(texts), max_length), dtype=np.int64)
+        for row, text in enumerate(texts):
+            tokens = [self.vocab.get(word, 0) for word in text.lower().split()][:max_length]
+            input_ids[row, : len(tokens)] = tokens
+        return {"input_ids": input_ids, "attention_mask": (input_ids > 0).astype(np.int64)}
+
+
+def write_csv(path: str, num_texts: int, num_words: int):
+    rng = random.Random(0)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["review", "sentiment"])
+        for _ in range(num_texts):
+            writer.writerow([" ".join(rng.choices(_WORDS, k=num_words)), rng.choice(["positive", "negative"])])
+
+
+def run_per_run(tokenizer, texts, num_runs: int, batch_size: int, max_length: int) -> float:
+    t0 = time.process_time()
+    for _ in range(num_runs):
+        for start in range(0, len(texts), batch_size):
+            tokenizer(texts[start : start + batch_size], max_length=max_length)
+    return time.process_time() - t0
+
+
+def run_cached(tokenizer, data_config, root: str, num_runs: int, batch_size: int, max_length: int) -> float:
+    t0 = time.process_time()
+    save_preprocessed(tokenize(data_config, root, "benchmark", max_length, tokenizer=tokenizer))
+    for _ in range(num_runs):
+        dataset = load_preprocessed(root)
+        columns = dataset.splits["train"]
+        for start in range(0, len(columns["targets"]), batch_size):
+            np.asarray(columns["input_ids"][start : start + batch_size], dtype=np.int64)
+            np.asarray(columns["attention_mask"][start : start + batch_size], dtype=np.int64)
+    return time.process_time() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--tokenizer", default=None)
+    args = parser.parse_args()
+
+    if args.tokenizer is None:
+        tokenizer = SimpleTokenizer()
+    else:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, use_fast=True)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csv_path = os.path.join(tmpdir, "train.csv")
+        write_csv(csv_path, args.texts, args.words)
+        data_config = {
+            "target": "from_csv",
+            "input_field": "review",
+            "target_fields": "sentiment",
+            "train_file": csv_path,
+        }
+        with open(csv_path, newline="") as f:
+            texts = [row["review"] for row in csv.DictReader(f)]
+
+        per_run = run_per_run(tokenizer, texts, args.runs, args.batch_size, args.max_length)
+        cache_dir = os.path.join(tmpdir, "cache")
+        cached = run_cached(tokenizer, data_config, cache_dir, args.runs, args.batch_size, args.max_length)
+
+    print(f"{'mode':<10} {'CPU (s)':>10} {'per run (s)':>12}")
+    for mode, seconds in (("per_run", per_run), ("cached", cached)):
+        print(f"{mode:<10} {seconds:>10.2f} {seconds / args.runs:>12.3f}")
+    print(f"speedup: {per_run / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark of the per-tick cost of updating the HPOManager results.
+
+Compares rebuilding every result on each tick (the previous behaviour of ``HPOManager.run``) with the incremental
+``RunTracker``. All runs but the ones from the last sweep have finished, as is the case in a long-lived app.
+
+Usage: ``python benchmarks/bench_run_tracker.py``
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from flashy.run_tracker import RunTracker, get_run_result
+
+
+class FakeWork:
+    def __init__(self, finished: bool):
+        self.has_succeeded = finished
+        self.has_failed = False
+        self.has_stopped = False
+        self.ready = True
+        self.progress = 0.0
+        self.monitor = 0.9 if finished else None
+
+
+def _make_sweeps(num_runs: int, runs_per_sweep: int):
+    running_runs: Dict[int, List[Dict[str, Any]]] = {}
+    works = {}
+    num_sweeps = max(num_runs // runs_per_sweep, 1)
+    for sweep_id in range(1, num_sweeps + 1):
+        running_runs[sweep_id] = []
+        for index in range(runs_per_sweep):
+            run = {
+                "id": f"{sweep_id:05d}{index:03d}",
+                "task": "image_classification",
+                "model_config": {"backbone": "resnet18", "learning_rate": 0.001},
+                "data_config": {"target": "from_folders", "train_folder": "data/train", "val_folder": "data/val"},
+            }
+            running_runs[sweep_id].append(run)
+            works[run["id"]] = FakeWork(finished=sweep_id != num_sweeps)
+    return running_runs, works
+
+
+def _full_rebuild(running_runs, results, works) -> List:
+    written = []
+    for sweep_id, runs in running_runs.items():
+        if sweep_id not in results:
+            results[sweep_id] = {}
+        for run in runs:
+            results[sweep_id][run["id"]] = get_run_result(run, works[run["id"]])
+            written.append((sweep_id, run["id"]))
+    return written
+
+
+def _delta_size(results, written) -> int:
+    return sum(len(json.dumps(results[sweep_id][run_id])) for sweep_id, run_id in written)
+
+
+def _tick_active_runs(running_runs, works):
+    for run in running_runs[max(running_runs)]:
+        works[run["id"]].progress += 0.01
+
+
+def benchmark(num_runs: int, runs_per_sweep: int, ticks: int):
+    running_runs, works = _make_sweeps(num_runs, runs_per_sweep)
+
+    # Full rebuild
+    results = {}
+    _full_rebuild(running_runs, results, works)
+    full_time, full_delta = 0.0, 0
+    for _ in range(ticks):
+        _tick_active_runs(running_runs, works)
+        t0 = time.perf_counter()
+        written = _full_rebuild(running_runs, results, works)
+        full_time += time.perf_counter() - t0
+        full_delta += _delta_size(results, written)
+
+    # Incremental
+    results = {}
+    tracker = RunTracker()
+    tracker.restore(running_runs, results)
+    tracker.update(results, works.get)
+    incremental_time, incremental_delta = 0.0, 0
+    for _ in range(ticks):
+        _tick_active_runs(running_runs, works)
+        t0 = time.perf_counter()
+        written = tracker.update(results, works.get)
+        incremental_time += time.perf_counter() - t0
+        incremental_delta += _delta_size(results, written)
+
+    return (
+        full_time / ticks * 1e3,
+        full_delta // ticks,
+        incremental_time / ticks * 1e3,
+        incremental_delta // ticks,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--runs-per-sweep", type=int, default=10)
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'runs':>8} | {'full ms/tick':>12} | {'full B/tick':>12} | {'incr ms/tick':>12} | {'incr B/tick':>12}")
+    for num_runs in args.runs:
+        full_ms, full_bytes, incr_ms, incr_bytes = benchmark(num_runs, args.runs_per_sweep, args.ticks)
+        print(f"{num_runs:>8} | {full_ms:>12.3f} | {full_bytes:>12} | {incr_ms:>12.3f} | {incr_bytes:>12}")
+
+
+if __name__ == "__main__":
+    main()
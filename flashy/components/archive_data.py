@@ -0,0 +1,81 @@
+import functools
+import os
+from typing import Any, Dict, List, Tuple, Type
+
+from flashy.components.archive_index import ArchiveIndex, ArchiveReader
+from flashy.components.tasks import TaskMeta
+
+# How the training works get the samples of a dataset: "extract" extracts the dataset archive to disk, "archive" reads
+# the samples from the archive in place (for the tasks and data configs which support it, see `supports_archive`)
+DATA_MODES = ("extract", "archive")
+
+# The data config targets whose datasets can be read from the archive in place
+ARCHIVE_TARGETS = ("from_folders",)
+
+_SPLITS = ("train", "val", "test", "predict")
+
+
+def supports_archive(task_meta: TaskMeta, data_config: Dict) -> bool:
+    return task_meta.supports_archive and data_config.get("target") in ARCHIVE_TARGETS
+
+
+def list_folder(index: ArchiveIndex, folder: str) -> Tuple[List[str], List[str]]:
+    """Returns the files of a folder of the archive laid out as ``<folder>/<class>/<file>``, with their class."""
+    prefix = os.path.normpath(folder).lstrip("/") + "/"
+    files, targets = [], []
+    for name, is_dir in zip(index.names, index.is_dir):
+        if is_dir or not name.startswith(prefix):
+            continue
+        parts = name[len(prefix) :].split("/")
+        if len(parts) >= 2:
+            files.append(name)
+            targets.append(parts[0])
+    return files, targets
+
+
+@functools.lru_cache
+def _get_archive_input_class() -> Type:
+    from flash.core.data.io.input import DataKeys
+    from flash.image.classification.input import ImageClassificationFilesInput
+    from flash.image.data import ImageInput
+    from PIL import Image
+
+    class ArchiveImageClassificationFilesInput(ImageClassificationFilesInput):
+        """Loads the images of the files inputs (members of the archive of ``reader``) from the archive."""
+
+        reader: ArchiveReader
+
+        def load_sample(self, sample: Dict[str, Any]) -> Dict[str, Any]:
+            name = sample[DataKeys.INPUT]
+            sample[DataKeys.INPUT] = Image.open(self.reader.open(name)).convert("RGB")
+            sample = ImageInput.load_sample(self, sample)
+            sample[DataKeys.METADATA]["filepath"] = name
+            if DataKeys.TARGET in sample:
+                sample[DataKeys.TARGET] = self.format_target(sample[DataKeys.TARGET])
+            return sample
+
+    return ArchiveImageClassificationFilesInput
+
+
+def build_archive_datamodule(task_meta: TaskMeta, data_config: Dict, reader: ArchiveReader, **kwargs) -> Any:
+    """Builds the datamodule of a task from a ``from_folders`` data config, with the samples read from the archive of
+    ``reader`` in place. The folders of the data config are paths inside the archive."""
+    from flashy.components.engines import get_data_module_class
+
+    data_config = dict(data_config)
+    target = data_config.pop("target")
+    if not supports_archive(task_meta, {"target": target}):
+        raise ValueError(
+            f"Unsupported data config target for an archive: {target}. Expected one of: {ARCHIVE_TARGETS}."
+        )
+
+    files = {}
+    for split in _SPLITS:
+        folder = data_config.pop(f"{split}_folder", None)
+        if folder:
+            files[f"{split}_files"], targets = list_folder(reader.index, folder)
+            if split != "predict":
+                files[f"{split}_targets"] = targets
+
+    input_cls = type("ArchiveInput", (_get_archive_input_class(),), {"reader": reader})
+    return get_data_module_class(task_meta).from_files(**files, **data_config, input_cls=input_cls, **kwargs)
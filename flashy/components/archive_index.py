@@ -0,0 +1,243 @@
+import io
+import json
+import mmap
+import os
+import struct
+import tarfile
+import zipfile
+import zlib
+from collections import OrderedDict
+from typing import Dict, Generic, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# The size of the fixed part of a zip local file header, and the offset of its file name and extra field lengths
+_ZIP_LOCAL_HEADER_SIZE = 30
+_ZIP_LOCAL_HEADER_LENGTHS = 26
+
+
+def is_archive(file_path: str) -> bool:
+    return zipfile.is_zipfile(file_path) or tarfile.is_tarfile(file_path)
+
+
+def _is_uncompressed_tar(file_path: str) -> bool:
+    try:
+        with tarfile.open(file_path, "r:"):
+            return True
+    except tarfile.ReadError:
+        return False
+
+
+class LRUCache(Generic[T]):
+    """A mapping which holds at most ``max_size`` items, discarding the least recently used ones first."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, T]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable) -> Optional[T]:
+        try:
+            self._items.move_to_end(key)
+            return self._items[key]
+        except KeyError:
+            return None
+
+    def put(self, key: Hashable, value: T):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+class ArchiveIndex:
+    """The list of members of a zip or tar archive, with their size and type.
+
+    The index is built once by reading the zip central directory or streaming over the tar headers, and is stored in a
+    columnar JSON file so that listing the members (by extension or by directory) never reopens the archive.
+
+    For zip and uncompressed tar archives, the index also holds the offset, stored size and compression method of the
+    data of each member, so that an ``ArchiveReader`` can read the members in place.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        sizes: List[int],
+        is_dir: List[bool],
+        offsets: Optional[List[int]] = None,
+        compressed_sizes: Optional[List[int]] = None,
+        compress_types: Optional[List[int]] = None,
+    ):
+        self.names = names
+        self.sizes = sizes
+        self.is_dir = is_dir
+        self.offsets = offsets
+        self.compressed_sizes = compressed_sizes
+        self.compress_types = compress_types
+
+        self._by_ext: Dict[str, List[str]] = {}
+        self._dirnames: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def is_random_access(self) -> bool:
+        """Whether the members can be read in place, which is not the case for compressed tar archives."""
+        return self.offsets is not None
+
+    @classmethod
+    def build(cls, file_path: str) -> "ArchiveIndex":
+        names, sizes, is_dir, offsets, compressed_sizes, compress_types = [], [], [], [], [], []
+        if zipfile.is_zipfile(file_path):
+            with zipfile.ZipFile(file_path, "r") as zf, open(file_path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for info in zf.infolist():
+                        names.append(info.filename)
+                        sizes.append(info.file_size)
+                        is_dir.append(info.is_dir())
+                        # The data follows the local file header, whose extra field may differ from the central one
+                        lengths_offset = info.header_offset + _ZIP_LOCAL_HEADER_LENGTHS
+                        name_length, extra_length = struct.unpack("<HH", mm[lengths_offset : lengths_offset + 4])
+                        offsets.append(info.header_offset + _ZIP_LOCAL_HEADER_SIZE + name_length + extra_length)
+                        compressed_sizes.append(info.compress_size)
+                        compress_types.append(info.compress_type)
+        elif tarfile.is_tarfile(file_path):
+            with tarfile.open(file_path, "r|*") as tf:
+                for info in tf:
+                    names.append(info.name)
+                    sizes.append(info.size)
+                    is_dir.append(info.isdir())
+                    offsets.append(info.offset_data)
+                    compressed_sizes.append(info.size)
+                    compress_types.append(zipfile.ZIP_STORED)
+            if not _is_uncompressed_tar(file_path):
+                offsets, compressed_sizes, compress_types = None, None, None
+        else:
+            raise ValueError("Cannot open archive file!")
+        return cls(names, sizes, is_dir, offsets, compressed_sizes, compress_types)
+
+    @classmethod
+    def load(cls, index_path: str) -> "ArchiveIndex":
+        with open(index_path) as f:
+            index = json.load(f)
+        # Indexes saved before the offsets were indexed only hold the names, sizes and types of the members
+        return cls(
+            index["names"],
+            index["sizes"],
+            index["is_dir"],
+            index.get("offsets"),
+            index.get("compressed_sizes"),
+            index.get("compress_types"),
+        )
+
+    def save(self, index_path: str):
+        with open(index_path, "w") as f:
+            json.dump(
+                {
+                    "names": self.names,
+                    "sizes": self.sizes,
+                    "is_dir": self.is_dir,
+                    "offsets": self.offsets,
+                    "compressed_sizes": self.compressed_sizes,
+                    "compress_types": self.compress_types,
+                },
+                f,
+            )
+
+    def get_names(self, ext: Optional[str] = None) -> List[str]:
+        """Returns the names of the members, optionally only those with the given extension."""
+        if ext is None:
+            return self.names
+
+        ext = ext.lower()
+        ext = ext[1:] if ext.startswith(".") else ext
+        if ext not in self._by_ext:
+            self._by_ext[ext] = [name for name in self.names if os.path.splitext(name)[1].lower()[1:] == ext]
+        return self._by_ext[ext]
+
+    def get_dirnames(self) -> List[str]:
+        """Returns the (sorted) directories which contain at least one member."""
+        if self._dirnames is None:
+            self._dirnames = sorted({os.path.dirname(name) for name in self.names})
+        return self._dirnames
+
+
+class ArchiveReader:
+    """Reads the members of a zip or uncompressed tar archive in place, through a memory map of the archive and its
+    index, without extracting it.
+
+    Stored members are sliced out of the memory map and deflated ones are decompressed from it. The reader can be
+    pickled (e.g. to dataloader workers), each process mapping the archive on its first read.
+    """
+
+    def __init__(self, file_path: str, index: Optional[ArchiveIndex] = None):
+        index = index if index is not None else ArchiveIndex.build(file_path)
+        if not index.is_random_access:
+            raise ValueError(f"Cannot read {file_path} in place! Compressed tar archives are not supported.")
+
+        self.file_path = file_path
+        self.index = index
+
+        self._positions = {name: position for position, name in enumerate(index.names)}
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_file=None, _mmap=None, _pid=None)
+        return state
+
+    def _get_mmap(self) -> mmap.mmap:
+        if self._mmap is None or self._pid != os.getpid():
+            self._file = open(self.file_path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._pid = os.getpid()
+        return self._mmap
+
+    def read(self, name: str) -> bytes:
+        position = self._positions[name]
+        offset = self.index.offsets[position]
+        data = self._get_mmap()[offset : offset + self.index.compressed_sizes[position]]
+
+        compress_type = self.index.compress_types[position]
+        if compress_type == zipfile.ZIP_STORED:
+            return data
+        if compress_type == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        raise ValueError(f"Unsupported compression method of {name}: {compress_type}.")
+
+    def open(self, name: str) -> io.BytesIO:
+        return io.BytesIO(self.read(name))
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+
+def open_archive(file_path: str, index_path: Optional[str] = None) -> ArchiveReader:
+    """Returns a reader of an archive, using the index at ``index_path`` (``<file_path>.index`` by default) if it
+    exists and holds the member offsets, or building and saving it otherwise."""
+    index_path = index_path or file_path + ".index"
+    if os.path.exists(index_path):
+        index = ArchiveIndex.load(index_path)
+        if index.is_random_access:
+            return ArchiveReader(file_path, index)
+
+    index = ArchiveIndex.build(file_path)
+    index.save(index_path)
+    return ArchiveReader(file_path, index)
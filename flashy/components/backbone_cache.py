@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Callable, Dict, Optional, Set
+
+from flashy.components.drive_index import put_shared, try_get
+from flashy.components.stage_timer import StageTimer, timed
+
+_DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "flashy", "backbones")
+
+# Bumped when the layout of the cached artifacts changes, so stale entries are fetched again
+BACKBONE_CACHE_VERSION = 1
+
+# The files of the download caches which are not part of the artifacts of a backbone: the blobs of the Hugging Face
+# cache (its snapshots hold their content), its lock files and the partial downloads
+_IGNORED_DIRS = ("blobs", ".locks")
+_IGNORED_SUFFIXES = (".incomplete", ".lock", ".tmp")
+
+
+def get_backbone_key(task: str, backbone: str) -> str:
+    """Returns the cache key of the pretrained weights of a backbone, e.g. ``text_classification-prajjwal1--bert-tiny``
+    for ``prajjwal1/bert-tiny``."""
+    return f"{task}-{re.sub(r'[^A-Za-z0-9._-]', '--', backbone)}-v{BACKBONE_CACHE_VERSION}"
+
+
+def _list_files(root: str) -> Set[str]:
+    """Returns the paths (relative to ``root``) of the artifact files of the download caches under ``root``."""
+    files = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            dirname
+            for dirname in dirnames
+            if dirname not in _IGNORED_DIRS and not (dirpath == root and dirname == "manifests")
+        ]
+        for filename in filenames:
+            if not filename.endswith(_IGNORED_SUFFIXES):
+                files.add(os.path.relpath(os.path.join(dirpath, filename), root))
+    return files
+
+
+def _link_or_copy(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(os.path.realpath(src), dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+
+class BackboneCache:
+    """A cache of the pretrained weights of the backbones, shared by the training works through a Drive.
+
+    The torch hub and Hugging Face download caches of a work (``TORCH_HOME`` and ``HF_HOME``, see ``environ``) are
+    under ``root``. The first run which needs a backbone fetches its weights from the internet into these caches and
+    uploads the files it added to the Drive, so that the other runs (on this work or on others) seed their caches from
+    the Drive and the model is then built without any network fetch.
+    """
+
+    def __init__(self, drive, root: str = _DEFAULT_ROOT):
+        self.drive = drive
+        self.root = root
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def environ(self) -> Dict[str, str]:
+        """The environment variables pointing the torch hub and Hugging Face download caches to this cache."""
+        return {"TORCH_HOME": os.path.join(self.root, "torch"), "HF_HOME": os.path.join(self.root, "huggingface")}
+
+    def seed(self, key: str, fetch_fn: Callable[[], None], timer: Optional[StageTimer] = None) -> bool:
+        """Makes sure the artifacts of ``key`` are in the download caches, calling ``fetch_fn`` to download them (with
+        the environment set to ``environ``) if neither this cache nor the Drive has them.
+
+        Returns whether the artifacts were cached. The download and the fetch are recorded as ``download`` and
+        ``fetch`` stages of the ``timer``.
+        """
+        manifest_path = os.path.join(self.root, "manifests", f"{key}.json")
+        if os.path.exists(manifest_path):
+            self.hits += 1
+            return True
+
+        # The files are staged under the current directory, where the Drive reads and writes its files
+        staging_dir = os.path.join("backbones", key)
+        if os.path.exists(staging_dir):
+            shutil.rmtree(staging_dir)
+        try:
+            with timed(timer, "download"):
+                cached = try_get(self.drive, os.path.join(staging_dir, "manifest.json"))
+                if cached:
+                    with open(os.path.join(staging_dir, "manifest.json")) as f:
+                        files = json.load(f)["files"]
+                    for path in files:
+                        self.drive.get(os.path.join(staging_dir, path))
+            if cached:
+                for path in files:
+                    os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+                    os.replace(os.path.join(staging_dir, path), os.path.join(self.root, path))
+                self.hits += 1
+            else:
+                self.misses += 1
+                logging.info(f"Fetching backbone: {key}")
+                existing = _list_files(self.root)
+                with timed(timer, "fetch"):
+                    fetch_fn()
+                files = sorted(_list_files(self.root) - existing)
+                # Another work may have fetched the same backbone in the meantime, in which case its files are kept
+                for path in files:
+                    _link_or_copy(os.path.join(self.root, path), os.path.join(staging_dir, path))
+                    put_shared(self.drive, os.path.join(staging_dir, path))
+                # The manifest is uploaded last, so the other runs only find complete entries
+                with open(os.path.join(staging_dir, "manifest.json"), "w") as f:
+                    json.dump({"files": files}, f)
+                put_shared(self.drive, os.path.join(staging_dir, "manifest.json"))
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump({"files": files}, f)
+        return cached
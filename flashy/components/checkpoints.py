@@ -0,0 +1,186 @@
+import functools
+import inspect
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Optional, Tuple, Type
+
+# How the training works save the checkpoint of a run: "full" saves a Lightning checkpoint (with the optimizer and
+# loop states, to resume training), "weights" saves only the weights of the model, in the safetensors layout, for
+# inference
+CHECKPOINT_FORMATS = ("full", "weights")
+
+# The dtypes the floating point weights of a "weights" checkpoint can be cast to
+CHECKPOINT_DTYPES = ("float32", "float16", "bfloat16")
+
+_EXTENSIONS = {"full": ".pt", "weights": ".safetensors"}
+
+# The safetensors names of the torch dtypes
+_DTYPE_NAMES = {
+    "float64": "F64",
+    "float32": "F32",
+    "float16": "F16",
+    "bfloat16": "BF16",
+    "int64": "I64",
+    "int32": "I32",
+    "int16": "I16",
+    "int8": "I8",
+    "uint8": "U8",
+    "bool": "BOOL",
+}
+
+# The data of each tensor starts at a multiple of this alignment, so it can be viewed in place from a memory map
+_ALIGNMENT = 8
+
+
+def get_checkpoint_filename(id: str, checkpoint_format: str = "full") -> str:
+    if checkpoint_format not in CHECKPOINT_FORMATS:
+        raise ValueError(f"Unknown checkpoint format: {checkpoint_format}. Expected one of: {CHECKPOINT_FORMATS}.")
+    return f"{id}_checkpoint{_EXTENSIONS[checkpoint_format]}"
+
+
+def is_weights_checkpoint(path: str) -> bool:
+    return str(path).endswith(_EXTENSIONS["weights"])
+
+
+def _get_hparams(model: Any) -> Dict[str, Any]:
+    """Returns the JSON serializable hyperparameters of a model, with which its class builds it again."""
+    hparams = {}
+    for key, value in dict(getattr(model, "hparams", {})).items():
+        try:
+            json.dumps(value)
+        except TypeError:
+            logging.warning(f"Not saving the hyperparameter {key} of type {type(value).__name__} with the weights")
+            continue
+        hparams[key] = value
+    return hparams
+
+
+def save_weights(
+    model: Any,
+    path: str,
+    dtype: Optional[str] = None,
+    chunk_size: int = 16 * 1024 * 1024,
+) -> int:
+    """Saves the weights of a ``torch.nn.Module`` to ``path`` in the safetensors layout and returns the file size.
+
+    The floating point weights are cast to ``dtype``, if given. The class and hyperparameters of the model are saved in
+    the metadata of the header, so ``load_weights_model`` can build the model again. The tensors are written one by
+    one in chunks of ``chunk_size`` bytes, so saving does not hold a serialized copy of the whole model in memory. The
+    file is written next to ``path`` and renamed, so an interrupted save does not leave a partial checkpoint behind.
+    """
+    import torch
+
+    if dtype is not None and dtype not in CHECKPOINT_DTYPES:
+        raise ValueError(f"Unknown checkpoint dtype: {dtype}. Expected one of: {CHECKPOINT_DTYPES}.")
+
+    tensors = {}
+    for name, tensor in model.state_dict().items():
+        tensor = tensor.detach()
+        if dtype is not None and tensor.is_floating_point():
+            tensor = tensor.to(getattr(torch, dtype))
+        tensors[name] = tensor.cpu().contiguous()
+
+    header: Dict[str, Any] = {
+        "__metadata__": {
+            "task_class": f"{type(model).__module__}.{type(model).__qualname__}",
+            "hparams": json.dumps(_get_hparams(model)),
+        }
+    }
+    # The number of zero bytes written after the data of each tensor, so the next one starts aligned
+    padding = {}
+    offset = 0
+    for name, tensor in tensors.items():
+        dtype_name = str(tensor.dtype).replace("torch.", "")
+        if dtype_name not in _DTYPE_NAMES:
+            raise ValueError(f"Unsupported tensor dtype: {dtype_name}. Expected one of: {tuple(_DTYPE_NAMES)}.")
+        size = tensor.numel() * tensor.element_size()
+        header[name] = {
+            "dtype": _DTYPE_NAMES[dtype_name],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + size],
+        }
+        padding[name] = -size % _ALIGNMENT
+        offset += size + padding[name]
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    # Pad the header so the data starts aligned
+    header_bytes += b" " * (-(len(header_bytes) + 8) % _ALIGNMENT)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            for name, tensor in tensors.items():
+                data = memoryview(tensor.reshape(-1).view(torch.uint8).numpy()) if tensor.numel() else b""
+                for start in range(0, len(data), chunk_size):
+                    f.write(data[start : start + chunk_size])
+                f.write(b"\0" * padding[name])
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def load_weights(path: str) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Loads the weights saved by ``save_weights`` and returns them with the metadata of the header.
+
+    The tensors are views of a copy-on-write memory map of the file, so loading reads no data up front and the pages
+    of the weights are shared with the page cache (and with the other processes loading the same checkpoint).
+    """
+    import torch
+
+    dtypes = {name: getattr(torch, dtype) for dtype, name in _DTYPE_NAMES.items()}
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+        data_start = 8 + header_size
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) if os.path.getsize(path) > data_start else b""
+
+    metadata = header.pop("__metadata__", {})
+    tensors = {}
+    for name, info in header.items():
+        start, end = info["data_offsets"]
+        dtype = dtypes[info["dtype"]]
+        if start == end:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensor = torch.frombuffer(buffer, dtype=torch.uint8, count=end - start, offset=data_start + start)
+        tensors[name] = tensor.view(dtype).reshape(info["shape"])
+    return tensors, metadata
+
+
+@functools.lru_cache
+def _supports_assign() -> bool:
+    """Returns whether ``load_state_dict`` can assign the given tensors to the module (torch >= 2.1)."""
+    import torch
+
+    return "assign" in inspect.signature(torch.nn.Module.load_state_dict).parameters
+
+
+def load_weights_model(task_class: Type, path: str) -> Any:
+    """Builds a model of ``task_class`` from the hyperparameters saved with its weights and loads the weights.
+
+    The backbone is built without its pretrained weights, as they are replaced by the saved ones. With torch >= 2.1,
+    the weights whose dtype matches the model's are used in place (without a copy). Otherwise, they are copied (and
+    cast to the dtype of the model).
+    """
+    tensors, metadata = load_weights(path)
+    hparams = json.loads(metadata.get("hparams", "{}"))
+    if "pretrained" in inspect.signature(task_class).parameters:
+        hparams["pretrained"] = False
+    model = task_class(**hparams)
+
+    current = model.state_dict()
+    in_place = all(name not in current or current[name].dtype == tensor.dtype for name, tensor in tensors.items())
+    if in_place and _supports_assign():
+        model.load_state_dict(tensors, assign=True)
+    else:
+        model.load_state_dict(tensors)
+    return model.eval()
@@ -0,0 +1,400 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flashy.components.archive_index import ArchiveIndex
+from flashy.components.stage_timer import StageTimer, timed
+
+_DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "flashy", "datasets")
+_DEFAULT_MAX_BYTES = 20 * 1024**3
+
+# Data config arguments ending with one of these suffixes are paths relative to the root of the dataset archive
+_PATH_SUFFIXES = ("_folder", "_file", "_root")
+
+
+# Zip archives with fewer members than this are extracted by a single thread
+_MIN_MEMBERS_PER_WORKER = 256
+
+
+def _normalize(name: str) -> str:
+    return os.path.normpath(name).lstrip("/") if name else ""
+
+
+def get_archive_members(data_config: Dict[str, Any]) -> Optional[List[str]]:
+    """Returns the paths inside the dataset archive referenced by the data config, or ``None`` if it references none
+    (in which case the whole archive is needed)."""
+    members = sorted(
+        {
+            _normalize(value)
+            for key, value in data_config.items()
+            if key.endswith(_PATH_SUFFIXES) and isinstance(value, str) and value
+        }
+    )
+    if not members or "." in members:
+        return None
+    return members
+
+
+def _is_selected(name: str, members: Optional[Sequence[str]]) -> bool:
+    """Whether an archive member is one of ``members`` or is inside one of them."""
+    if members is None:
+        return True
+    name = _normalize(name)
+    return any(name == member or name.startswith(member + "/") for member in members)
+
+
+def _get_member_path(output_dir: str, name: str) -> str:
+    """Returns the path an archive member is extracted to. Raises if it is outside of ``output_dir``, e.g. for a
+    member named ``../name``."""
+    root = os.path.realpath(output_dir)
+    path = os.path.realpath(os.path.join(root, _normalize(name)))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Unsafe member path in archive: {name}")
+    return path
+
+
+def _get_num_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _extract_zip_members(file_path: str, output_dir: str, names: List[str]):
+    # Each worker reads the archive through its own file handle
+    with zipfile.ZipFile(file_path, "r") as zf:
+        for name in names:
+            zf.extract(name, output_dir)
+
+
+def _extract_zip(file_path: str, output_dir: str, members: Optional[Sequence[str]], num_workers: int):
+    with zipfile.ZipFile(file_path, "r") as zf:
+        infos = [info for info in zf.infolist() if _is_selected(info.filename, members)]
+
+    # Every member is checked before anything is written
+    paths = [_get_member_path(output_dir, info.filename) for info in infos]
+
+    # The directories are created upfront so that the workers never race to create the same one
+    for info, path in zip(infos, paths):
+        os.makedirs(path if info.is_dir() else os.path.dirname(path), exist_ok=True)
+
+    names = [info.filename for info in infos if not info.is_dir()]
+    num_workers = max(1, min(num_workers, len(names) // _MIN_MEMBERS_PER_WORKER))
+    if num_workers == 1:
+        _extract_zip_members(file_path, output_dir, names)
+        return
+
+    # Each worker extracts a contiguous range of members, so that it reads its part of the archive sequentially
+    chunk_size = -(-len(names) // num_workers)
+    with ThreadPoolExecutor(num_workers) as executor:
+        futures = [
+            executor.submit(_extract_zip_members, file_path, output_dir, names[start : start + chunk_size])
+            for start in range(0, len(names), chunk_size)
+        ]
+        for future in futures:
+            future.result()
+
+
+def _extract_tar(file_path: str, output_dir: str, members: Optional[Sequence[str]]):
+    # The archive is read as a stream, so the members are extracted as they are read without listing them first
+    with tarfile.open(file_path, "r|*") as tf:
+        for member in tf:
+            if _is_selected(member.name, members):
+                _get_member_path(output_dir, member.name)
+                tf.extract(member, output_dir)
+
+
+def extract_archive(
+    file_path: str,
+    output_dir: str,
+    members: Optional[Sequence[str]] = None,
+    num_workers: Optional[int] = None,
+):
+    """Extracts an archive to ``output_dir``.
+
+    If ``members`` is given, only these paths of the archive (files, or directories with their content) are extracted.
+    The members of zip archives are decompressed by ``num_workers`` threads (one per CPU by default), those of tar
+    archives are extracted while the archive is read.
+    """
+    if zipfile.is_zipfile(file_path):
+        _extract_zip(file_path, output_dir, members, num_workers or _get_num_cpus())
+    elif tarfile.is_tarfile(file_path):
+        _extract_tar(file_path, output_dir, members)
+    else:
+        raise ValueError("Cannot open archive file!")
+
+
+def resolve_paths(data_config: Dict[str, Any], root: str) -> Dict[str, Any]:
+    """Returns a copy of the data config with the paths inside the dataset archive made relative to ``root``."""
+    return {
+        key: os.path.join(root, value) if key.endswith(_PATH_SUFFIXES) and isinstance(value, str) and value else value
+        for key, value in data_config.items()
+    }
+
+
+def _get_extracted_name(members: Optional[Sequence[str]]) -> str:
+    if members is None:
+        return "extracted"
+    return "extracted-" + hashlib.sha256("\n".join(sorted(members)).encode()).hexdigest()[:16]
+
+
+def _get_user_name(view_dir: str) -> str:
+    return hashlib.sha256(os.path.abspath(view_dir).encode()).hexdigest()[:16]
+
+
+def _get_size(path: str) -> int:
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(dirpath, filename))
+    return size
+
+
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+def _make_read_only(path: str):
+    """Makes the files and directories under ``path`` read-only, so that no file can be modified, added or removed.
+    The directories are made read-only bottom-up, after their content."""
+    mode = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+    for dirpath, _, filenames in os.walk(path, topdown=False):
+        for filename in filenames:
+            os.chmod(os.path.join(dirpath, filename), mode)
+        os.chmod(dirpath, stat.S_IMODE(os.stat(dirpath).st_mode) & ~_WRITE_BITS)
+
+
+def _make_writable(path: str):
+    """Gives the owner the write permission on the directories under ``path`` back, top-down, so that their content
+    can be removed."""
+    for dirpath, _, _ in os.walk(path):
+        os.chmod(dirpath, stat.S_IMODE(os.stat(dirpath).st_mode) | stat.S_IWUSR)
+
+
+def _remove(path: str):
+    def onerror(func, path, exc_info):
+        os.chmod(path, stat.S_IWUSR | stat.S_IRUSR)
+        func(path)
+
+    _make_writable(path)
+    shutil.rmtree(path, onerror=onerror)
+
+
+class DatasetCache:
+    """A local cache of the datasets stored in a Drive, downloaded and extracted once and keyed by their content hash
+    (or by their immutable drive path for datasets uploaded without one).
+
+    Entries are evicted in least recently used order once the cache grows beyond ``max_bytes``. Each run gets its own
+    view of an extracted dataset made of symlinks to the (read-only) cached files. Each view is recorded in the entry
+    until it is released (or its directory is removed), and the entries with views are not evicted, as other runs
+    (possibly in other processes sharing the cache) still read them.
+
+    When only some ``members`` of a dataset are requested (see ``get_archive_members``), only these are extracted, to a
+    directory of their own within the cache entry.
+    """
+
+    def __init__(self, drive, root: str = _DEFAULT_ROOT, max_bytes: int = _DEFAULT_MAX_BYTES):
+        self.drive = drive
+        self.root = root
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        self._metas: Dict[str, Dict[str, Any]] = {}
+
+    def get_meta(self, dataset: str) -> Dict[str, Any]:
+        if dataset not in self._metas:
+            meta_file_path = dataset + ".meta"
+            if not os.path.exists(meta_file_path):
+                self.drive.get(meta_file_path)
+            with open(meta_file_path) as f:
+                self._metas[dataset] = json.load(f)
+        return self._metas[dataset]
+
+    def get_key(self, dataset: str) -> str:
+        """Returns the content hash of the dataset, or its drive path for datasets uploaded without one."""
+        meta = self.get_meta(dataset)
+        return meta.get("sha256") or meta["drive_path"]
+
+    def get_entry_dir(self, dataset: str) -> str:
+        return os.path.join(self.root, self.get_key(dataset))
+
+    def get(
+        self,
+        dataset: str,
+        timer: Optional[StageTimer] = None,
+        members: Optional[Sequence[str]] = None,
+    ) -> str:
+        """Returns the directory of the extracted dataset (or of its ``members``), downloading and extracting it first
+        on a cache miss.
+
+        The download and the extraction are recorded as ``download`` and ``extract`` stages of the ``timer``, if any.
+        """
+        entry_dir = self.get_entry_dir(dataset)
+        extracted_dir = os.path.join(entry_dir, _get_extracted_name(members))
+
+        if os.path.isdir(extracted_dir):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._fill(dataset, entry_dir, extracted_dir, timer=timer, members=members)
+
+        self._touch(entry_dir)
+        return extracted_dir
+
+    def get_archive(self, dataset: str, timer: Optional[StageTimer] = None) -> Tuple[str, ArchiveIndex]:
+        """Returns the path of the dataset archive and its index (also saved to ``<archive>.index``), downloading and
+        indexing the archive first on a cache miss. Nothing is extracted.
+
+        The download and the indexing are recorded as ``download`` and ``index`` stages of the ``timer``, if any.
+        """
+        entry_dir = self.get_entry_dir(dataset)
+        archive_path = os.path.join(entry_dir, self.get_meta(dataset)["original_path"])
+        index_path = archive_path + ".index"
+
+        if os.path.exists(index_path):
+            self.hits += 1
+            index = ArchiveIndex.load(index_path)
+        else:
+            self.misses += 1
+            os.makedirs(entry_dir, exist_ok=True)
+            self._download(dataset, archive_path, timer=timer)
+            with timed(timer, "index"):
+                index = ArchiveIndex.build(archive_path)
+                fd, tmp_index_path = tempfile.mkstemp(dir=entry_dir)
+                os.close(fd)
+                index.save(tmp_index_path)
+                os.replace(tmp_index_path, index_path)
+            self._write_size(entry_dir)
+
+        self._touch(entry_dir)
+        return archive_path, index
+
+    def view(
+        self,
+        dataset: str,
+        view_dir: str,
+        timer: Optional[StageTimer] = None,
+        members: Optional[Sequence[str]] = None,
+    ) -> str:
+        """Populates ``view_dir`` with symlinks to the top level entries of the extracted dataset. The view should be
+        released with ``release`` once the dataset is no longer read."""
+        extracted_dir = self.get(dataset, timer=timer, members=members)
+
+        users_dir = os.path.join(self.get_entry_dir(dataset), "users")
+        os.makedirs(users_dir, exist_ok=True)
+        with open(os.path.join(users_dir, _get_user_name(view_dir)), "w") as f:
+            f.write(os.path.abspath(view_dir))
+
+        os.makedirs(view_dir, exist_ok=True)
+        for name in os.listdir(extracted_dir):
+            link_path = os.path.join(view_dir, name)
+            if os.path.islink(link_path):
+                os.remove(link_path)
+            os.symlink(os.path.join(extracted_dir, name), link_path)
+        return view_dir
+
+    def release(self, dataset: str, view_dir: str):
+        """Removes a view made by ``view``, so that its dataset can be evicted again."""
+        shutil.rmtree(view_dir, ignore_errors=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(self.get_entry_dir(dataset), "users", _get_user_name(view_dir)))
+
+    @staticmethod
+    def _is_in_use(entry_dir: str) -> bool:
+        """Returns whether an entry has views. The views whose directory was removed without releasing them, e.g. by
+        a run which crashed, are discarded."""
+        users_dir = os.path.join(entry_dir, "users")
+        if not os.path.isdir(users_dir):
+            return False
+        in_use = False
+        for name in os.listdir(users_dir):
+            try:
+                with open(os.path.join(users_dir, name)) as f:
+                    view_dir = f.read()
+            except OSError:
+                continue
+            if os.path.isdir(view_dir):
+                in_use = True
+            else:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(users_dir, name))
+        return in_use
+
+    def _fill(
+        self,
+        dataset: str,
+        entry_dir: str,
+        extracted_dir: str,
+        timer: Optional[StageTimer] = None,
+        members: Optional[Sequence[str]] = None,
+    ):
+        meta = self.get_meta(dataset)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        archive_path = os.path.join(entry_dir, meta["original_path"])
+        self._download(dataset, archive_path, timer=timer)
+
+        # Extract to a temporary directory first so that concurrent runs never see a partially extracted dataset
+        output_dir = tempfile.mkdtemp(dir=entry_dir)
+        with timed(timer, "extract"):
+            extract_archive(archive_path, output_dir, members=members)
+            _make_read_only(output_dir)
+
+        try:
+            os.rename(output_dir, extracted_dir)
+        except OSError:
+            # Another run extracted the same dataset in the meantime
+            _remove(output_dir)
+
+        self._write_size(entry_dir)
+
+    def _download(self, dataset: str, archive_path: str, timer: Optional[StageTimer] = None):
+        if not os.path.exists(archive_path):
+            with timed(timer, "download"):
+                if not os.path.exists(dataset):
+                    self.drive.get(dataset)
+                os.replace(dataset, archive_path)
+
+    @staticmethod
+    def _write_size(entry_dir: str):
+        with open(os.path.join(entry_dir, "size"), "w") as f:
+            f.write(str(_get_size(entry_dir)))
+
+    def _touch(self, entry_dir: str):
+        with open(os.path.join(entry_dir, "last_used"), "w") as f:
+            f.write(str(time.time()))
+
+        self._evict(keep=entry_dir)
+
+    def _evict(self, keep: Optional[str] = None):
+        entries = []
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            try:
+                with open(os.path.join(entry_dir, "size")) as f:
+                    size = int(f.read())
+                last_used = os.path.getmtime(os.path.join(entry_dir, "last_used"))
+            except (OSError, ValueError):
+                # Still being filled
+                continue
+            entries.append((last_used, size, entry_dir))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry_dir == keep or self._is_in_use(entry_dir):
+                continue
+            logging.info(f"Evicting dataset from cache: {entry_dir}")
+            _remove(entry_dir)
+            total -= size
@@ -0,0 +1,77 @@
+import logging
+import os
+import time
+from typing import Callable, Dict, Set, Tuple
+
+# The messages of the errors a Drive raises (as a bare `Exception`) when getting a missing file and when putting a file
+# which another component already put (unless the Drive allows duplicates)
+_MISSING_MESSAGE = "didn't find any match"
+_DUPLICATE_MESSAGE = "already found in the Drive"
+
+
+def try_get(drive, path: str) -> bool:
+    """Downloads a file from a Drive and returns whether it was there."""
+    try:
+        drive.get(path)
+    except FileNotFoundError:
+        return False
+    except Exception as error:
+        if _MISSING_MESSAGE not in str(error):
+            raise
+        return False
+    return True
+
+
+def put_shared(drive, path: str):
+    """Uploads a file which other components may upload too, e.g. an entry of a cache keyed by its content. A file
+    already put by another component is left as is."""
+    try:
+        drive.put(path)
+    except Exception as error:
+        if _DUPLICATE_MESSAGE not in str(error):
+            raise
+        logging.info(f"Not uploading {path}, another component already did")
+
+
+class DriveIndex:
+    """An in-process index of the objects known to be stored in a Drive, so that checking whether a file exists does
+    not require listing the whole Drive.
+
+    Objects are added to the index as they are put. On a miss, the directory is listed again, but at most once every
+    ``ttl`` seconds: within that window, misses are answered from the last listing (negative caching). This still
+    picks up objects put by other components, e.g. checkpoints saved by the trainers.
+    """
+
+    def __init__(self, drive, ttl: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.drive = drive
+        self.ttl = ttl
+        self.clock = clock
+
+        self._known: Set[str] = set()
+        # Maps directory -> time of its last listing
+        self._listed_at: Dict[str, float] = {}
+
+    @staticmethod
+    def _split(path: str) -> Tuple[str, str]:
+        path = os.path.normpath(path)
+        return os.path.dirname(path) or ".", path
+
+    def add(self, path: str):
+        self._known.add(self._split(path)[1])
+
+    def discard(self, path: str):
+        self._known.discard(self._split(path)[1])
+
+    def refresh(self, dir_path: str = "."):
+        self._listed_at[dir_path] = self.clock()
+        self._known.update(os.path.normpath(path) for path in self.drive.list(dir_path))
+
+    def contains(self, path: str) -> bool:
+        dir_path, path = self._split(path)
+        if path in self._known:
+            return True
+
+        listed_at = self._listed_at.get(dir_path)
+        if listed_at is None or self.clock() - listed_at >= self.ttl:
+            self.refresh(dir_path)
+        return path in self._known
@@ -0,0 +1,211 @@
+import functools
+import importlib
+import time
+from typing import Any, Dict, Iterator, List, Optional, Type
+
+from flashy.components.archive_data import build_archive_datamodule
+from flashy.components.archive_index import open_archive
+from flashy.components.model_cache import load_model
+from flashy.components.preprocessing import (
+    PreprocessedDataset,
+    attach_preprocessed,
+    build_preprocessed_datamodule,
+    load_preprocessed,
+)
+from flashy.components.tasks import TaskMeta
+
+# How the demo and training works run a task: "in_process" builds the datamodule, model and trainer directly from the
+# task meta and configs, "script" renders the Jinja template of the task to a script and traces it
+ENGINES = ("in_process", "script")
+
+
+def get_data_module_class(task_meta: TaskMeta) -> Type:
+    return getattr(importlib.import_module(task_meta.data_module_import_path), task_meta.data_module_class)
+
+
+def get_task_class(task_meta: TaskMeta) -> Type:
+    return getattr(importlib.import_module(task_meta.task_import_path), task_meta.task_class)
+
+
+def build_datamodule(
+    task_meta: TaskMeta,
+    data_config: Dict,
+    archive_path: Optional[str] = None,
+    preprocessed: Optional[PreprocessedDataset] = None,
+    **kwargs,
+) -> Any:
+    """Builds the datamodule of a task with the constructor named by the ``target`` of the data config.
+
+    If ``preprocessed`` is given, the datamodule is built from the preprocessed dataset instead. If ``archive_path`` is
+    given, the samples are read from the dataset archive in place and the paths of the data config are paths inside
+    the archive.
+    """
+    if preprocessed is not None:
+        return build_preprocessed_datamodule(task_meta, preprocessed, **kwargs)
+    if archive_path is not None:
+        return build_archive_datamodule(task_meta, data_config, open_archive(archive_path), **kwargs)
+
+    data_config = dict(data_config)
+    target = data_config.pop("target")
+    return getattr(get_data_module_class(task_meta), target)(**data_config, **kwargs)
+
+
+def build_model(task_meta: TaskMeta, task_config: Dict, datamodule: Any) -> Any:
+    """Builds the model of a task, with the linked attributes (e.g. ``num_classes``) taken from the datamodule."""
+    linked_attributes = {attribute: getattr(datamodule, attribute) for attribute in task_meta.linked_attributes}
+    return get_task_class(task_meta)(**task_config, **linked_attributes)
+
+
+def fetch_backbone(task_meta: TaskMeta, backbone: str):
+    """Downloads the pretrained weights of a backbone into the torch hub or Hugging Face cache, by building a model of
+    the task with it. The head is irrelevant, so the model is built with two classes."""
+    get_task_class(task_meta)(backbone=backbone, num_classes=2)
+
+
+def build_trainer(trainer_config: Dict, precision: int = 32, callbacks: Optional[List] = None, root: str = ".") -> Any:
+    import flash
+    import torch
+
+    return flash.Trainer(
+        **trainer_config,
+        accelerator="auto",
+        precision=precision if torch.cuda.is_available() else 32,
+        callbacks=callbacks or [],
+        default_root_dir=root,
+    )
+
+
+@functools.lru_cache
+def _get_progress_bar_class() -> Type:
+    from pytorch_lightning.callbacks.progress.base import ProgressBarBase
+
+    class AppProgressBar(ProgressBarBase):
+        """Reports the progress, throughput and validation metrics of training to the work running it."""
+
+        def __init__(self, app_state: Any, monitor: str):
+            super().__init__()
+            self.app_state = app_state
+            self.monitor = monitor
+
+            self._total = 0
+            self._started = False
+            self._start_time = None
+            self._num_samples = 0
+            self._num_steps = 0
+
+        def disable(self):
+            pass
+
+        def on_train_batch_start(self, trainer, pl_module, batch, batch_idx):
+            super().on_train_batch_start(trainer, pl_module, batch, batch_idx)
+            if not self._started:
+                self._started = True
+                self._start_time = time.time()
+                self.app_state.on_first_batch(trainer.datamodule.batch_size)
+
+        def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
+            super().on_train_batch_end(trainer, pl_module, outputs, batch, batch_idx)
+            self._num_samples += trainer.datamodule.batch_size
+            self._num_steps += 1
+            if self.app_state.should_stop():
+                trainer.should_stop = True
+            if batch_idx % 10 == 0:
+                self.app_state.progress = (self._total + self.train_batch_idx) / (
+                    self.total_train_batches * self.trainer.max_epochs
+                )
+                elapsed = time.time() - self._start_time
+                self.app_state.samples_per_second = self._num_samples / elapsed
+                self.app_state.steps_per_second = self._num_steps / elapsed
+
+        def on_train_epoch_end(self, trainer, pl_module):
+            super().on_train_epoch_end(trainer, pl_module)
+            self._total += self.total_train_batches
+
+        def on_train_end(self, trainer, pl_module):
+            super().on_train_end(trainer, pl_module)
+            self.app_state.on_train_end()
+
+        def on_validation_end(self, trainer, pl_module):
+            super().on_validation_end(trainer, pl_module)
+            if not trainer.sanity_checking and self.monitor in trainer.callback_metrics:
+                self.app_state.on_validation_end(float(trainer.callback_metrics[self.monitor].item()))
+
+    return AppProgressBar
+
+
+def train(
+    app_state: Any,
+    task_meta: TaskMeta,
+    data_config: Dict,
+    task_config: Dict,
+    trainer_config: Dict,
+    batch_size: int,
+    num_workers: int,
+    precision: int,
+    auto_batch_size: bool,
+    root: str = ".",
+    archive_path: Optional[str] = None,
+    preprocessed_dir: Optional[str] = None,
+) -> Any:
+    """Fine-tunes the model of a task in this process, as ``flash_training.jinja`` does, and returns the trainer.
+
+    ``app_state`` (the training work) is called back with the progress, throughput and metrics of training. If
+    ``archive_path`` is given, the samples are read from the dataset archive in place. If ``preprocessed_dir`` is
+    given, they are read from the preprocessed dataset saved there.
+    """
+    import torch
+    from pytorch_lightning.callbacks import BatchSizeFinder
+
+    preprocessed = load_preprocessed(preprocessed_dir) if preprocessed_dir else None
+    datamodule = build_datamodule(
+        task_meta,
+        data_config,
+        archive_path=archive_path,
+        preprocessed=preprocessed,
+        batch_size=batch_size,
+        num_workers=num_workers,
+    )
+    model = build_model(task_meta, task_config, datamodule)
+    if preprocessed is not None:
+        attach_preprocessed(model, preprocessed)
+
+    callbacks = [_get_progress_bar_class()(app_state, task_meta.monitor)]
+    if auto_batch_size and torch.cuda.is_available():
+        # Search for the largest batch size which fits in memory, starting from the configured one
+        callbacks.append(BatchSizeFinder(mode="binsearch", init_val=batch_size))
+
+    trainer = build_trainer(trainer_config, precision=precision, callbacks=callbacks, root=root)
+    trainer.finetune(model, datamodule=datamodule, strategy="freeze")
+    return trainer
+
+
+def predict_fiftyone(
+    task_meta: TaskMeta,
+    url: str,
+    data_config: Dict,
+    checkpoint: str,
+    batch_size: int,
+    chunk_size: Optional[int],
+) -> Iterator[List]:
+    """Predicts the validation data of a task in this process, as ``flash_fiftyone.jinja`` does, and yields the
+    predictions in FiftyOne format chunk by chunk."""
+    import flash
+    import torch
+    from flash.core.data.utils import download_data
+
+    download_data(url, ".")
+    datamodule = build_datamodule(task_meta, data_config, batch_size=batch_size)
+    trainer = flash.Trainer()
+    model = load_model(task_meta, checkpoint)
+
+    val_dataloader = datamodule.val_dataloader()
+    val_dataset = val_dataloader.dataset
+    chunk_size = chunk_size or len(val_dataset)
+    for start in range(0, len(val_dataset), chunk_size):
+        dataloader = torch.utils.data.DataLoader(
+            torch.utils.data.Subset(val_dataset, range(start, min(start + chunk_size, len(val_dataset)))),
+            batch_size=batch_size,
+            collate_fn=val_dataloader.collate_fn,
+            num_workers=val_dataloader.num_workers,
+        )
+        yield trainer.predict(model, dataloaders=dataloader, output="fiftyone")
@@ -1,22 +1,95 @@
+import hashlib
 import json
 import os
-import tarfile
+import re
+import threading
+import time
 import traceback
 import uuid
-import zipfile
 from dataclasses import dataclass
 from functools import wraps
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 import requests
 from lightning import LightningWork, BuildConfig
 from lightning.app.storage import Drive
 
+from flashy.components.archive_index import ArchiveIndex, LRUCache, is_archive
+from flashy.components.drive_index import DriveIndex
+
+
+# The number of leading bytes used to detect the MIME type of an upload
+_MIME_SNIFF_SIZE = 8192
+
+_SERVERS = ("waitress", "threaded", "development")
+_MAX_REQUEST_BODY_SIZE = 1024**4
+
 
 @dataclass
 class FileServerBuildConfig(BuildConfig):
     def build_commands(self) -> List[str]:
-        return ["python -m pip install Flask==2.1.2 Flask-Cors==3.0.10 python-magic==0.4.27"]
+        return ["python -m pip install Flask==2.1.2 Flask-Cors==3.0.10 python-magic==0.4.27 waitress==2.1.2"]
+
+
+def _iter_multipart_file(stream, boundary: str, field_name: str, chunk_size: int) -> Iterator[Union[str, bytes]]:
+    """Parses a multipart body as it is read from the stream. Yields the filename of the given file field, then the
+    chunks of its content."""
+    from werkzeug.sansio.multipart import Data, Epilogue, File, MultipartDecoder, NeedData
+
+    decoder = MultipartDecoder(boundary.encode())
+    in_file = False
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            decoder.receive_data(stream.read(chunk_size) or None)
+        elif isinstance(event, File) and event.name == field_name:
+            in_file = True
+            yield event.filename
+        elif isinstance(event, Data):
+            if in_file:
+                if event.data:
+                    yield event.data
+                if not event.more_data:
+                    return
+        elif isinstance(event, Epilogue):
+            raise ValueError(f"No `{field_name}` field in the uploaded form!")
+
+
+class _UploadDigest:
+    """Computes the size, SHA-256 and MIME type of an upload as its chunks go by, sniffing the MIME type from the
+    first bytes only. The chunks themselves are not kept, the caller writes them to the local disk."""
+
+    def __init__(self):
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._head = b""
+
+    def update(self, chunk: bytes):
+        if len(self._head) < _MIME_SNIFF_SIZE:
+            self._head += chunk[: _MIME_SNIFF_SIZE - len(self._head)]
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def mime_type(self) -> str:
+        import magic
+
+        return magic.from_buffer(self._head, mime=True)
+
+
+def _add_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """Adds the half-open byte range ``[start, end)`` to a sorted list of disjoint ranges, merging adjacent ones."""
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
 
 
 def handle_error(fn):
@@ -37,7 +110,17 @@ def handle_error(fn):
 
 
 class FileServer(LightningWork):
-    def __init__(self, drive: Drive, base_dir: str = ".", chunk_size=10240, **kwargs):
+    def __init__(
+        self,
+        drive: Drive,
+        base_dir: str = ".",
+        chunk_size: int = 1024 * 1024,
+        archive_index_cache_size: int = 32,
+        drive_index_ttl: float = 5.0,
+        server: Optional[str] = None,
+        num_workers: int = 8,
+        **kwargs,
+    ):
         super().__init__(cloud_build_config=FileServerBuildConfig(), **kwargs)
 
         self.drive = drive
@@ -46,128 +129,339 @@ class FileServer(LightningWork):
 
         self.chunk_size = chunk_size
 
+        if server is not None and server not in _SERVERS:
+            raise ValueError(f"Unknown server: {server}. Expected one of: {_SERVERS}.")
+        # The serving engine, defaults to `threaded` which streams the request bodies to the app (see `_serve`)
+        self.server = server
+        self.num_workers = num_workers
+
         self.uploaded_files: Dict[str, Dict[str, Union[Tuple[int, int], bool]]] = dict()
 
         self.ready = False
 
+        # Maps upload ID -> state of a resumable upload. The state is also kept on disk next to the partial file, so an
+        # upload can be resumed after a restart.
+        self._uploads: Dict[str, Dict] = {}
+        self._uploads_lock = threading.Lock()
+        # The IDs of the uploads being finalized, which do not accept chunks anymore
+        self._finalizing: Set[str] = set()
+        # Serializes storing uploads with the same content hash, which may be received concurrently by the workers
+        self._hash_locks: Dict[str, threading.Lock] = {}
+
+        self._archive_indexes: LRUCache[ArchiveIndex] = LRUCache(archive_index_cache_size)
+        self._drive_index = DriveIndex(self.drive, ttl=drive_index_ttl)
+
     def get_filepath(self, path: str) -> str:
         return os.path.join(self.base_dir, path)
 
     def get_random_filename(self) -> str:
         return uuid.uuid4().hex
 
-    @handle_error
-    def upload_url(self, url):
-        import magic
+    def _write_upload(
+        self,
+        original_file: str,
+        uploaded_file: str,
+        chunks: Iterable[bytes],
+        full_size: Optional[int] = None,
+    ) -> Tuple[int, str, str]:
+        """Writes the uploaded chunks to disk in a single pass, computing the SHA-256 and MIME type on the fly.
+
+        The upload is only stored in the Drive once it is complete (see ``_save_upload``), as ``Drive.put`` takes a
+        local file: the chunks are streamed to the local disk rather than to the Drive, which needs room for the whole
+        upload and adds the time of the ``put`` after the last chunk is received.
+
+        Returns the size, SHA-256 and MIME type of the upload.
+        """
+        self.uploaded_files[original_file] = {"progress": (0, full_size), "done": False}
+
+        digest = _UploadDigest()
+        with open(self.get_filepath(uploaded_file), "wb") as out_file:
+            for chunk in chunks:
+                out_file.write(chunk)
+                digest.update(chunk)
+                self.uploaded_files[original_file]["progress"] = (digest.size, full_size)
 
-        original_file = url.split("/")[-1]
-        uploaded_file = self.get_random_filename()
-        meta_file = uploaded_file + ".meta"
+        return digest.size, digest.sha256, digest.mime_type
 
-        with requests.get(url, stream=True, verify=False) as r:
-            full_size = r.headers["content-length"]
-            self.uploaded_files[original_file] = {
-                "progress": (0, full_size),
-                "done": False,
+    def _put(self, path: str):
+        self.drive.put(path)
+        self._drive_index.add(path)
+
+    def _get_meta(self, file_id: str) -> Optional[Dict]:
+        """Returns the meta of a stored file, or ``None`` if there is no file with this ID."""
+        meta_path = self.get_filepath(file_id + ".meta")
+
+        if not os.path.exists(meta_path):
+            if not self._drive_index.contains(meta_path):
+                return None
+            self.drive.get(meta_path)
+
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _put_meta(self, meta: Dict):
+        meta_path = self.get_filepath(meta["drive_path"] + ".meta")
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        self._put(meta_path)
+
+    def _save_upload(self, original_file: str, uploaded_file: str, size: int, sha256: str, mime_type: str) -> Dict:
+        """Stores an upload in the Drive under a path derived from its content hash.
+
+        If the same content was already uploaded, the upload is discarded and the existing meta is returned with the
+        new display name added to its aliases.
+        """
+        with self._uploads_lock:
+            hash_lock = self._hash_locks.setdefault(sha256, threading.Lock())
+        with hash_lock:
+            return self._store_upload(original_file, uploaded_file, size, sha256, mime_type)
+
+    def _store_upload(self, original_file: str, uploaded_file: str, size: int, sha256: str, mime_type: str) -> Dict:
+        display_name = os.path.splitext(original_file)[0]
+
+        meta = self._get_meta(sha256)
+        if meta is not None:
+            os.remove(self.get_filepath(uploaded_file))
+            if display_name != meta["display_name"] and display_name not in meta.get("aliases", []):
+                meta["aliases"] = meta.get("aliases", []) + [display_name]
+                self._put_meta(meta)
+        else:
+            os.replace(self.get_filepath(uploaded_file), self.get_filepath(sha256))
+            self._put(self.get_filepath(sha256))
+
+            if is_archive(self.get_filepath(sha256)):
+                index = ArchiveIndex.build(self.get_filepath(sha256))
+                index.save(self.get_filepath(sha256 + ".index"))
+                self._put(self.get_filepath(sha256 + ".index"))
+                self._archive_indexes.put(sha256, index)
+
+            meta = {
+                "original_path": original_file,
+                "display_name": display_name,
+                "aliases": [],
+                "size": size,
+                "sha256": sha256,
+                "mime_type": mime_type,
+                "drive_path": sha256,
+                "mtime": time.time(),
             }
-            with open(self.get_filepath(uploaded_file), "wb") as out_file:
-                for chunk in r.iter_content(chunk_size=self.chunk_size):
-                    written_size = out_file.write(chunk)
-                    self.uploaded_files[original_file]["progress"] = (
-                        self.uploaded_files[original_file]["progress"][0] + written_size,
-                        full_size,
-                    )
-
-        self.drive.put(self.get_filepath(uploaded_file))
+            self._put_meta(meta)
+
         self.uploaded_files[original_file] = {
-            "progress": (full_size, full_size),
+            "progress": (size, size),
             "done": True,
         }
 
-        meta = {
-            "original_path": original_file,
-            "display_name": os.path.splitext(original_file)[0],
-            "size": full_size,
-            "mime_type": magic.from_file(self.get_filepath(uploaded_file), mime=True),
-            "drive_path": uploaded_file,
-        }
-        with open(self.get_filepath(meta_file), "w") as f:
-            json.dump(meta, f)
+        return meta
 
-        self.drive.put(self.get_filepath(meta_file))
+    @handle_error
+    def get_meta_by_hash(self, sha256: str):
+        from flask import abort, make_response
 
+        sha256 = sha256.lower()
+        meta = self._get_meta(sha256) if re.fullmatch("[0-9a-f]{64}", sha256) else None
+        if meta is None:
+            abort(make_response({"error": f"No file with the hash {sha256} was uploaded!"}, 404))
         return meta
 
     @handle_error
-    def upload_file(self, file):
-        import magic
+    def upload_url(self, url):
+        original_file = url.split("/")[-1]
+        uploaded_file = self.get_random_filename()
+
+        with requests.get(url, stream=True, verify=False) as r:
+            full_size = int(r.headers["content-length"]) if "content-length" in r.headers else None
+            size, sha256, mime_type = self._write_upload(
+                original_file,
+                uploaded_file,
+                r.iter_content(chunk_size=self.chunk_size),
+                full_size,
+            )
+
+        return self._save_upload(original_file, uploaded_file, size, sha256, mime_type)
 
+    @handle_error
+    def upload_file(self, file):
         original_file = file.filename
         uploaded_file = self.get_random_filename()
-        meta_file = uploaded_file + ".meta"
 
-        self.uploaded_files[original_file] = {"progress": (0, None), "done": False}
+        size, sha256, mime_type = self._write_upload(
+            original_file,
+            uploaded_file,
+            iter(lambda: file.read(self.chunk_size), b""),
+        )
 
-        with open(self.get_filepath(uploaded_file), "wb") as out_file:
-            content = file.read(self.chunk_size)
-            while content:
-                written_size = out_file.write(content)
-                self.uploaded_files[original_file]["progress"] = (
-                    self.uploaded_files[original_file]["progress"][0] + written_size,
-                    None,
-                )
-                content = file.read(self.chunk_size)
+        return self._save_upload(original_file, uploaded_file, size, sha256, mime_type)
 
-        full_size = self.uploaded_files[original_file]["progress"][0]
-        self.drive.put(self.get_filepath(uploaded_file))
-        self.uploaded_files[original_file] = {
-            "progress": (full_size, full_size),
-            "done": True,
-        }
+    @handle_error
+    def upload_stream(self, stream, boundary: str):
+        """Uploads the ``file`` field of a multipart body while it is being received, without buffering the form."""
+        from flask import abort, make_response
+
+        parts = _iter_multipart_file(stream, boundary, "file", self.chunk_size)
+        try:
+            original_file = next(parts)
+        except ValueError as e:
+            abort(make_response({"error": str(e)}, 400))
+        uploaded_file = self.get_random_filename()
 
-        meta = {
-            "original_path": original_file,
-            "display_name": os.path.splitext(original_file)[0],
-            "size": full_size,
-            "mime_type": magic.from_file(self.get_filepath(uploaded_file), mime=True),
-            "drive_path": uploaded_file,
+        size, sha256, mime_type = self._write_upload(original_file, uploaded_file, parts)
+
+        return self._save_upload(original_file, uploaded_file, size, sha256, mime_type)
+
+    def _get_upload(self, upload_id: str) -> Dict:
+        from flask import abort, make_response
+
+        if upload_id not in self._uploads:
+            state_path = self.get_filepath(upload_id + ".upload")
+            if not os.path.exists(state_path):
+                abort(make_response({"error": f"The upload with ID {upload_id} could not be found!"}, 404))
+            with open(state_path) as f:
+                self._uploads[upload_id] = json.load(f)
+        return self._uploads[upload_id]
+
+    def _save_upload_state(self, upload_id: str):
+        with open(self.get_filepath(upload_id + ".upload"), "w") as f:
+            json.dump(self._uploads[upload_id], f)
+
+    @handle_error
+    def initiate_upload(self, filename: Optional[str], size: Union[int, str, None]):
+        """Starts a resumable upload of a file with the given name and size in bytes."""
+        from flask import abort, make_response
+
+        if not filename:
+            abort(make_response({"error": "The upload must have a filename!"}, 400))
+        # Also rejects negative and non-integer sizes, and booleans
+        if not str(size).isdigit():
+            abort(make_response({"error": f"The size must be a non-negative integer, got {size!r}!"}, 400))
+        size = int(size)
+
+        upload_id = self.get_random_filename()
+
+        # Pre-allocate the file so that chunks can be written at any offset, in parallel
+        with open(self.get_filepath(upload_id), "wb") as f:
+            f.truncate(size)
+
+        with self._uploads_lock:
+            self._uploads[upload_id] = {"filename": filename, "size": size, "received": []}
+            self._save_upload_state(upload_id)
+        self.uploaded_files[filename] = {"progress": (0, size), "done": False}
+
+        return {"upload_id": upload_id}
+
+    @handle_error
+    def upload_chunk(self, upload_id: str, offset: int, stream, length: Optional[int]):
+        """Writes a chunk of ``length`` bytes (the Content-Length of the request, which is required) of a resumable
+        upload at the given offset."""
+        from flask import abort, make_response
+
+        if length is None:
+            abort(make_response({"error": "The chunk must be sent with a Content-Length header!"}, 411))
+        upload = self._get_upload(upload_id)
+        if upload_id in self._finalizing:
+            abort(make_response({"error": f"The upload with ID {upload_id} is being finalized!"}, 409))
+        if offset < 0 or offset + length > upload["size"]:
+            abort(make_response({"error": f"The chunk [{offset}, {offset + length}) is out of bounds!"}, 416))
+
+        with open(self.get_filepath(upload_id), "r+b") as f:
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                content = stream.read(min(self.chunk_size, remaining))
+                if not content:
+                    break
+                remaining -= f.write(content)
+
+        with self._uploads_lock:
+            upload["received"] = _add_range(upload["received"], offset, offset + length - remaining)
+            self._save_upload_state(upload_id)
+            received_size = sum(end - start for start, end in upload["received"])
+            self.uploaded_files[upload["filename"]] = {"progress": (received_size, upload["size"]), "done": False}
+
+        return self.get_upload_status(upload_id)
+
+    @handle_error
+    def get_upload_status(self, upload_id: str):
+        """Returns the byte ranges received so far for a resumable upload, as half-open ``[start, end)`` pairs."""
+        upload = self._get_upload(upload_id)
+        return {
+            "upload_id": upload_id,
+            "filename": upload["filename"],
+            "size": upload["size"],
+            "received": upload["received"],
         }
-        with open(self.get_filepath(meta_file), "w") as f:
-            json.dump(meta, f)
 
-        self.drive.put(self.get_filepath(meta_file))
+    @handle_error
+    def finalize_upload(self, upload_id: str):
+        """Completes a resumable upload once every byte was received and stores it in the Drive with its meta."""
+        from flask import abort, make_response
+
+        # The upload is claimed under the lock, so that concurrent calls do not store it twice: the other calls get a
+        # 409 while it is being finalized and a 404 once it is
+        with self._uploads_lock:
+            upload = self._get_upload(upload_id)
+            if upload_id in self._finalizing:
+                abort(make_response({"error": f"The upload with ID {upload_id} is already being finalized!"}, 409))
+            if upload["size"] > 0 and upload["received"] != [[0, upload["size"]]]:
+                abort(make_response({"error": "The upload is incomplete!", "received": upload["received"]}, 409))
+            self._finalizing.add(upload_id)
+
+        try:
+            # The chunks may have arrived in any order, so the file is digested once it is complete
+            digest = _UploadDigest()
+            with open(self.get_filepath(upload_id), "rb") as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                    digest.update(chunk)
+
+            meta = self._save_upload(upload["filename"], upload_id, digest.size, digest.sha256, digest.mime_type)
+        except BaseException:
+            # The upload can be finalized again
+            with self._uploads_lock:
+                self._finalizing.discard(upload_id)
+            raise
+
+        with self._uploads_lock:
+            self._uploads.pop(upload_id, None)
+            os.remove(self.get_filepath(upload_id + ".upload"))
+            self._finalizing.discard(upload_id)
 
         return meta
 
-    def get_file_by_path_local(self, file_path):
+    @staticmethod
+    def _send_file(file_path: str, immutable: bool = False, **kwargs):
+        """Sends a file with support for conditional requests (``If-None-Match`` / ``If-Modified-Since``, answered
+        with a 304) and single range requests (``Range`` / ``If-Range``, answered with a 206).
+
+        Large files can be downloaded in parallel by requesting several ranges concurrently.
+        """
         from flask import send_file
 
+        response = send_file(os.path.abspath(file_path), conditional=True, **kwargs)
+        # Advertise range support on full responses too, so that clients know they can resume or split downloads
+        response.headers.setdefault("Accept-Ranges", "bytes")
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable" if immutable else "no-cache"
+        return response
+
+    def get_file_by_path_local(self, file_path):
         if not os.path.exists(file_path):
             return None
 
-        return send_file(os.path.abspath(file_path))
+        return self._send_file(file_path)
 
     def get_file_by_path_drive(self, file_path):
-        from flask import send_file
-
-        dir_path = os.path.dirname(os.path.join(".", file_path))
-        if file_path not in self.drive.list(dir_path):
+        if not self._drive_index.contains(file_path):
             return None
 
         if not os.path.exists(file_path):
             self.drive.get(file_path)
 
-        return send_file(os.path.abspath(file_path))
+        return self._send_file(file_path)
 
     def get_file_by_id(self, file_id):
-        from flask import send_file
-
         file_path = self.get_filepath(file_id)
         meta_path = self.get_filepath(file_id + ".meta")
 
-        drive_files = self.drive.list(self.base_dir)
-
-        if file_path not in drive_files or meta_path not in drive_files:
+        if not self._drive_index.contains(file_path) or not self._drive_index.contains(meta_path):
             return None
 
         if not os.path.exists(file_path):
@@ -178,11 +472,14 @@ class FileServer(LightningWork):
         with open(meta_path) as f:
             meta = json.load(f)
 
-        return send_file(
-            os.path.abspath(file_path),
+        # Files stored by ID never change, so they can be cached forever and their hash makes a strong ETag
+        return self._send_file(
+            file_path,
+            immutable=True,
             mimetype=meta["mime_type"],
             download_name=meta["original_path"],
-            attachment_filename=meta["original_path"],
+            etag=meta.get("sha256", True),
+            last_modified=meta.get("mtime"),
         )
 
     @handle_error
@@ -209,42 +506,55 @@ class FileServer(LightningWork):
                 )
             )
 
+    def _get_archive_index(self, file_id: str) -> ArchiveIndex:
+        index = self._archive_indexes.get(file_id)
+        if index is not None:
+            return index
+
+        index_path = self.get_filepath(file_id + ".index")
+        if not os.path.exists(index_path):
+            if self._drive_index.contains(index_path):
+                self.drive.get(index_path)
+            else:
+                # Uploaded before archives were indexed
+                file_path = self.get_filepath(file_id)
+                if not os.path.exists(file_path):
+                    self.drive.get(file_path)
+                ArchiveIndex.build(file_path).save(index_path)
+                self._put(index_path)
+
+        index = ArchiveIndex.load(index_path)
+        self._archive_indexes.put(file_id, index)
+        return index
+
+    @staticmethod
+    def _paginate(asset_names: List[str], offset: int = 0, limit: Optional[int] = None) -> Dict:
+        return {
+            "asset_names": asset_names[offset:] if limit is None else asset_names[offset : offset + limit],
+            "total": len(asset_names),
+            "offset": offset,
+        }
+
     @handle_error
     def get_asset_names(
         self,
         file_id: str,
         ext: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
     ):
-        file_path = self.get_filepath(file_id)
-
-        if not os.path.exists(file_path):
-            self.drive.get(file_path)
-
-        if zipfile.is_zipfile(file_path):
-            with zipfile.ZipFile(file_path, "r") as zf:
-                result = zf.namelist()
-        elif tarfile.is_tarfile(file_path):
-            with tarfile.TarFile(file_path, "r") as tf:
-                result = tf.getnames()
-        else:
-            raise ValueError("Cannot open archive file!")
-
-        if ext is not None:
-            ext = ext.lower()
-            ext = ext[1:] if ext.startswith(".") else ext
-            result = [filename for filename in result if os.path.splitext(filename)[1].lower()[1:] == ext]
-
-        return {"asset_names": result}
+        return self._paginate(self._get_archive_index(file_id).get_names(ext), offset, limit)
 
     @handle_error
     def get_subdirs(
         self,
         file_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
     ):
-        result = {os.path.dirname(file) for file in self.get_asset_names(file_id)["asset_names"]}
-        return {"asset_names": list(result)}
+        return self._paginate(self._get_archive_index(file_id).get_dirnames(), offset, limit)
 
-    def run(self):
+    def _create_app(self):
         from flask import Flask, request
         from flask_cors import CORS
 
@@ -260,23 +570,107 @@ class FileServer(LightningWork):
         @app.post("/uploadfile/")
         def upload_file():
             """Upload a file directly as form data."""
+            if request.mimetype == "multipart/form-data" and "boundary" in request.mimetype_params:
+                return self.upload_stream(request.stream, request.mimetype_params["boundary"])
             f = request.files["file"]
             return self.upload_file(f)
 
+        @app.post("/uploads/")
+        def initiate_upload():
+            """Start a resumable upload. Expects the ``filename`` and ``size`` of the file, returns an upload ID."""
+            params = request.get_json(silent=True) or request.form
+            return self.initiate_upload(params.get("filename"), params.get("size"))
+
+        @app.put("/uploads/<upload_id>/")
+        def upload_chunk(upload_id: str):
+            """Upload the request body as the chunk of a resumable upload starting at the ``offset`` query parameter."""
+            return self.upload_chunk(
+                upload_id,
+                int(request.args.get("offset", 0)),
+                request.stream,
+                request.content_length,
+            )
+
+        @app.get("/uploads/<upload_id>/")
+        def get_upload_status(upload_id: str):
+            """Get the byte ranges received so far for a resumable upload."""
+            return self.get_upload_status(upload_id)
+
+        @app.post("/uploads/<upload_id>/finalize/")
+        def finalize_upload(upload_id: str):
+            """Complete a resumable upload, returning the meta of the uploaded file."""
+            return self.finalize_upload(upload_id)
+
+        @app.get("/hash/<sha256>/")
+        def get_meta_by_hash(sha256: str):
+            """Get the meta of the file with the given SHA-256, if it was already uploaded."""
+            return self.get_meta_by_hash(sha256)
+
         @app.get("/listarchive/<path>/")
         @app.get("/listarchive/<path>/<ext>/")
         def get_listarchive(path: str, ext: Optional[str] = None):
-            """Get a list of files contained in a zip file or the file itself if it is not."""
-            return self.get_asset_names(path, ext)
+            """Get a list of files contained in a zip file or the file itself if it is not.
+
+            Supports paging with the ``offset`` and ``limit`` query parameters.
+            """
+            return self.get_asset_names(
+                path,
+                ext,
+                request.args.get("offset", 0, type=int),
+                request.args.get("limit", None, type=int),
+            )
 
         @app.get("/listsubdirs/<path>/")
         def get_listsubdirs(path: str):
-            """Get a list of subdirectories contained in a zip file."""
-            return self.get_subdirs(path)
+            """Get a list of subdirectories contained in a zip file.
+
+            Supports paging with the ``offset`` and ``limit`` query parameters.
+            """
+            return self.get_subdirs(
+                path,
+                request.args.get("offset", 0, type=int),
+                request.args.get("limit", None, type=int),
+            )
 
         @app.get("/file/<path:file_id>")
         def get_file(file_id: str):
             return self.get_file(file_id)
 
+        return app
+
+    def _serve(self, app, host: str, port: int):
+        """Serves the app with the configured engine until the process exits.
+
+        The ``threaded`` engine hands the request bodies to the app as they are received, so uploads are digested and
+        written while they arrive. The ``waitress`` engine receives the whole request body before the app is called:
+        slow uploads and large downloads never tie up one of its worker threads, but each upload is first spooled to a
+        temporary file, then read again by the app.
+        """
+        engine = self.server or "threaded"
+
+        if engine == "waitress":
+            from waitress import serve
+
+            # Request bodies larger than a chunk are spooled to disk rather than held in memory
+            serve(
+                app,
+                host=host,
+                port=port,
+                threads=self.num_workers,
+                max_request_body_size=_MAX_REQUEST_BODY_SIZE,
+                inbuf_overflow=self.chunk_size,
+            )
+        elif engine == "threaded":
+            from werkzeug.serving import make_server
+
+            make_server(host, port, app, threaded=True).serve_forever()
+        elif engine == "development":
+            app.run(host=host, port=port, load_dotenv=False)
+        else:
+            raise ValueError(f"Unknown server: {engine}. Expected one of: {_SERVERS}.")
+
+    def run(self):
+        app = self._create_app()
+
         self.ready = True
-        app.run(host=self.host, port=self.port, load_dotenv=False)
+        self._serve(app, self.host, self.port)
@@ -1,3 +1,4 @@
+import functools
 import logging
 import os.path
 import shutil
@@ -6,9 +7,13 @@ from typing import Dict, List, Optional
 
 from lightning import BuildConfig
 from lightning.app.components.python import TracerPythonScript
+from lightning.app.storage import Drive
 from lightning.app.storage.path import Path
 
 from flashy.components import tasks
+from flashy.components.engines import ENGINES, predict_fiftyone
+from flashy.components.model_cache import fetch_checkpoint, load_model, warm_up_models
+from flashy.components.prediction_stream import PredictionStream
 from flashy.components.tasks import TaskMeta
 from flashy.components.utilities import generate_script
 
@@ -24,7 +29,32 @@ class FiftyOneBuildConfig(BuildConfig):
 
 
 class FlashFiftyOne(TracerPythonScript):
-    def __init__(self):
+    """Visualizes the predictions of a trained model in FiftyOne.
+
+    The model is loaded through the shared model cache and the FiftyOne session is kept open between runs: running the
+    work again with another checkpoint only replaces the dataset shown in the session.
+
+    The validation data is predicted in chunks of ``chunk_size`` samples (all at once if ``None``) with batches of
+    ``batch_size``. The samples of each chunk are added to the FiftyOne dataset as soon as they are predicted, so the
+    session opens after the first chunk and the predictions are never all held in memory.
+
+    With the ``"in_process"`` engine, the predictions are made directly in the work. With the ``"script"`` engine, the
+    prediction script is rendered from ``flash_fiftyone.jinja`` and traced.
+
+    The checkpoints which are not local (including the ``warm_up`` ones) are downloaded from the ``checkpoints`` Drive,
+    if given.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 32,
+        chunk_size: Optional[int] = 1024,
+        engine: str = "in_process",
+        checkpoints: Optional[Drive] = None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}. Expected one of: {ENGINES}.")
+
         super().__init__(
             __file__,
             cache_calls=False,
@@ -34,12 +64,21 @@ class FlashFiftyOne(TracerPythonScript):
             raise_exception=False,
         )
 
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.engine = engine
+        self.checkpoints = checkpoints
+
         self.ready = False
+        self.num_predictions = 0
 
         self.script_dir = tempfile.mkdtemp()
         self.script_path = os.path.join(self.script_dir, "flash_fiftyone.py")
         self._session = None
         self._task_meta: Optional[TaskMeta] = None
+        # The task and checkpoint of the predictions shown in the session
+        self._current = None
+        self._stream: Optional[PredictionStream] = None
 
     def run(
         self,
@@ -47,6 +86,7 @@ class FlashFiftyOne(TracerPythonScript):
         url: str,
         data_config: Dict,
         checkpoint: Path,
+        warm_up: Optional[List[str]] = None,
     ):
         try:
             import fiftyone
@@ -57,36 +97,66 @@ class FlashFiftyOne(TracerPythonScript):
             raise ModuleNotFoundError(msg)
 
         self._task_meta = getattr(tasks, task)
+        warm_up_models(self._task_meta, warm_up or [], drive=self.checkpoints)
 
-        generate_script(
-            self.script_path,
-            "flash_fiftyone.jinja",
-            task=task,
-            data_module_import_path=self._task_meta.data_module_import_path,
-            data_module_class=self._task_meta.data_module_class,
-            task_import_path=self._task_meta.task_import_path,
-            task_class=self._task_meta.task_class,
-            url=url,
-            data_config=data_config,
-            checkpoint=str(checkpoint),
-        )
-        super().run()
+        if self._session is not None and self._current == (task, str(checkpoint)):
+            return
 
-    def on_after_run(self, res):
-        from flash.core.integrations.fiftyone import visualize
-
-        logging.info("Launching FiftyOne")
-
-        if self._session is not None:
-            self._session.close()
+        import fiftyone as fo
 
-        predictions = res["predictions"]
-
-        self._session = visualize(predictions, remote=True, address=self.host)
+        fetch_checkpoint(str(checkpoint), self.checkpoints)
+        self.num_predictions = 0
+        self._stream = PredictionStream(
+            fo.Dataset(),
+            lambda prediction: fo.Sample(filepath=prediction["filepath"], predictions=prediction["predictions"]),
+            on_first_chunk=self._show,
+            on_chunk=lambda _: self._session.refresh(),
+        )
 
-        logging.info(f"Launched at URL: {self._session.url}")
+        if self.engine == "script":
+            generate_script(
+                self.script_path,
+                "flash_fiftyone.jinja",
+                task=task,
+                data_module_import_path=self._task_meta.data_module_import_path,
+                data_module_class=self._task_meta.data_module_class,
+                task_import_path=self._task_meta.task_import_path,
+                task_class=self._task_meta.task_class,
+                url=url,
+                data_config=data_config,
+                checkpoint=str(checkpoint),
+                batch_size=self.batch_size,
+                chunk_size=self.chunk_size,
+            )
+            super().run(
+                load_model=functools.partial(load_model, self._task_meta),
+                on_predictions=self._on_predictions,
+            )
+        else:
+            for predictions in predict_fiftyone(
+                self._task_meta, url, data_config, str(checkpoint), self.batch_size, self.chunk_size
+            ):
+                self._on_predictions(predictions)
+            self.on_after_run(None)
+        self._current = (task, str(checkpoint))
+
+    def _on_predictions(self, predictions):
+        self.num_predictions = self.num_predictions + self._stream.add(predictions)
+
+    def _show(self, dataset):
+        import fiftyone as fo
+
+        if self._session is None:
+            logging.info("Launching FiftyOne")
+            self._session = fo.launch_app(dataset, remote=True, address=self.host)
+            logging.info(f"Launched at URL: {self._session.url}")
+        else:
+            self._session.dataset = dataset
         self.ready = True
 
+    def on_after_run(self, res):
+        logging.info(f"Predicted {self._stream.num_samples} samples in {self._stream.num_chunks} chunks")
+
     def on_exit(self):
         if self._session is not None:
             self._session.close()
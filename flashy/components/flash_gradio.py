@@ -1,55 +1,96 @@
 import logging
-import os
-import tempfile
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from lightning.app.components.python import TracerPythonScript
+from lightning import BuildConfig, LightningWork
+from lightning.app.storage import Drive
 from lightning.app.storage.path import Path
 
 from flashy.components import tasks
+from flashy.components.inference_engine import InferenceEngine, load_predictor
+from flashy.components.model_cache import fetch_checkpoint, warm_up_models
 from flashy.components.tasks import TaskMeta
 from flashy.components.utilities import generate_script
 
 
-class FlashGradio(TracerPythonScript):
-    def __init__(self):
+class FlashGradio(LightningWork):
+    """Serves a Gradio demo of a trained model.
+
+    The model is loaded once when the demo is launched and the predictions are served by an ``InferenceEngine``, which
+    batches concurrent requests together and caches the predictions of repeated inputs.
+
+    Running the work again with another checkpoint switches the model behind the running demo. Loaded models are kept
+    in the shared model cache, so switching back to a previous checkpoint does not load it again. The models of the
+    ``warm_up`` checkpoints are loaded in the background ahead of time.
+
+    The checkpoints which are not local are downloaded from the ``checkpoints`` Drive, if given.
+
+    The work installs the requirements of ``task``. A standalone prediction script of the current model can be
+    exported with ``export_script``.
+    """
+
+    def __init__(
+        self,
+        task: str = "text_classification",
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        cache_size: int = 1024,
+        checkpoints: Optional[Drive] = None,
+    ):
         super().__init__(
-            __file__,
+            cloud_build_config=BuildConfig(requirements=getattr(tasks, task).requirements),
             parallel=True,
             cache_calls=False,
             raise_exception=False,
         )
 
-        self.script_dir = tempfile.mkdtemp()
-        self.script_path = os.path.join(self.script_dir, "flash_gradio.py")
         self.script_options = {"task": None, "data_config": None, "url": None}
-        self._task_meta: Optional[TaskMeta] = None
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.cache_size = cache_size
+        self.checkpoints = checkpoints
 
         self.ready = False
 
+        self._task_meta: Optional[TaskMeta] = None
         self._checkpoint = None
-
-    def run(self, task: str, url: str, data_config: Dict, checkpoint: Path):
+        self._engine: Optional[InferenceEngine] = None
+        self._demo = None
+
+    def run(
+        self,
+        task: str,
+        url: str,
+        data_config: Dict,
+        checkpoint: Path,
+        warm_up: Optional[List[str]] = None,
+    ):
         self._task_meta = getattr(tasks, task)
+        warm_up_models(self._task_meta, warm_up or [], drive=self.checkpoints)
+
+        if self._engine is not None and (self.script_options["task"], str(self._checkpoint)) == (task, str(checkpoint)):
+            return
 
-        # This is bad, we should not do this.
         self._checkpoint = checkpoint
         self.script_options["task"] = task
         self.script_options["data_config"] = data_config
         self.script_options["url"] = url
 
-        # We don't call super().run() as we don't want to run the tracer yet!!
-        # In case the definition of run method changes for the `TracerPythonScript`,
-        # this part of code will have to be changed. Bad workaround!
+        engine = InferenceEngine(
+            load_predictor(self._task_meta, fetch_checkpoint(str(checkpoint), self.checkpoints)),
+            max_batch_size=self.max_batch_size,
+            max_wait=self.max_wait,
+            cache_size=self.cache_size,
+        )
+        engine.start()
+        previous_engine, self._engine = self._engine, engine
+        if previous_engine is not None:
+            previous_engine.close()
 
-        # Why can't we run the tracer yet? The script expects a user input, which will
-        # be available after the Gradio Interface is launched (`demo.launch`).
-        # demo.launch blocks any command after it, and hence super().run() will never be
-        # called if we put it here. The tracer should run in the callback function
-        # _apply which gets the user input text
-        return self.on_after_run({})
+        if self._demo is None:
+            self._launch()
+        self.ready = True
 
-    def on_after_run(self, res):
+    def _launch(self):
         import gradio as gr
 
         logging.info("Launching Gradio server")
@@ -63,32 +104,32 @@ class FlashGradio(TracerPythonScript):
             outputs="text",
         )
 
-        # bad workaround?
-        self.ready = True
         demo.launch(
             server_name=self.host,
             server_port=self.port,
+            prevent_thread_lock=True,
         )
+        self._demo = demo
 
-    def _apply(self, text):
+    def export_script(self, path: str, input_text: str):
+        """Writes a script predicting ``input_text`` with the model of the demo to ``path``."""
+        if self._task_meta is None:
+            raise RuntimeError("There is no model to export the script of. Call `run` first.")
         generate_script(
-            self.script_path,
+            path,
             "flash_gradio.jinja",
-            task=self.script_options["task"],
             data_module_import_path=self._task_meta.data_module_import_path,
             data_module_class=self._task_meta.data_module_class,
             task_import_path=self._task_meta.task_import_path,
             task_class=self._task_meta.task_class,
-            url=self.url,
-            data_config=self.script_options["data_config"],
+            url=self.script_options["url"],
             checkpoint=str(self._checkpoint),
-            input_text=str(text),
+            input_text=input_text,
         )
-        init_globals = globals()
-        self.on_before_run()
-        env_copy = os.environ.copy()
-        if self.env:
-            os.environ.update(self.env)
-        res = self._run_tracer(init_globals=init_globals)
-        os.environ = env_copy
-        return res["predictions"]
+
+    def _apply(self, text):
+        return self._engine.predict(str(text))
+
+    def on_exit(self):
+        if self._engine is not None:
+            self._engine.close()
@@ -1,25 +1,81 @@
-import json
+import contextlib
+import gc
 import logging
 import os
 import os.path
 import shutil
 import sys
-import tarfile
 import tempfile
-import zipfile
-from typing import Dict
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
 from lightning import BuildConfig
 from lightning.app.components.python import TracerPythonScript
 from lightning.app.storage import Drive
 
 from flashy.components import tasks
-from flashy.components.tasks import TaskMeta
+from flashy.components.archive_data import DATA_MODES, supports_archive
+from flashy.components.backbone_cache import BackboneCache, get_backbone_key
+from flashy.components.checkpoints import CHECKPOINT_DTYPES, CHECKPOINT_FORMATS, get_checkpoint_filename, save_weights
+from flashy.components.dataset_cache import DatasetCache, get_archive_members, resolve_paths
+from flashy.components.engines import ENGINES, fetch_backbone, train
+from flashy.components.preprocessing import PreprocessedCache, get_preprocess_params, preprocess_dataset
+from flashy.components.stage_timer import StageTimer
+from flashy.components.tasks import THROUGHPUT_KEYS, TaskMeta, get_throughput_config
 from flashy.components.utilities import generate_script
 
 
 class FlashTrainer(TracerPythonScript):
-    def __init__(self, task: str, datasets: Drive, checkpoints: Drive, **kwargs):
+    """Trains the model of a task on a dataset and uploads its checkpoint.
+
+    With the ``"in_process"`` engine, the datamodule, model and trainer are built directly from the task meta and the
+    configs of the run. With the ``"script"`` engine, the training script is rendered from ``flash_training.jinja`` and
+    traced. The script of the current run can be exported with ``export_script`` with either engine.
+
+    With the ``"archive"`` data mode, the samples are read from the dataset archive in place rather than extracted,
+    for the tasks and data configs which support it (see ``flashy.components.archive_data``).
+
+    With ``preprocess``, the dataset is tokenized or decoded once for all the runs with the same dataset and tokenizer
+    (see ``flashy.components.preprocessing``) and the runs read the preprocessed samples. The preprocessed datasets
+    are shared with the other works through the datasets Drive, so a run which finds its preprocessed dataset there
+    neither downloads nor extracts the original one.
+
+    With the ``"weights"`` checkpoint format, only the weights of the model are saved, optionally cast to
+    ``checkpoint_dtype`` (see ``flashy.components.checkpoints``), rather than a full Lightning checkpoint. The
+    checkpoint is uploaded while the trainer of the run is torn down, and ``checkpoint`` is set once it is uploaded,
+    before the run completes. A run whose checkpoint fails to upload fails.
+
+    With ``cache_backbones``, the pretrained weights of the backbone of a run are fetched from the internet only by the
+    first run which uses it and shared with the other works through the checkpoints Drive (see
+    ``flashy.components.backbone_cache``), so the other runs build their model without any network fetch.
+
+    Setting ``stop_requested`` to the ID of a run stops that run without stopping the work, e.g. for a work of a pool
+    which then goes on with its next runs. The run ends without a checkpoint and ``stopped`` is set.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        datasets: Drive,
+        checkpoints: Drive,
+        engine: str = "in_process",
+        data_mode: str = "extract",
+        preprocess: bool = False,
+        checkpoint_format: str = "full",
+        checkpoint_dtype: Optional[str] = None,
+        cache_backbones: bool = True,
+        **kwargs,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}. Expected one of: {ENGINES}.")
+        if data_mode not in DATA_MODES:
+            raise ValueError(f"Unknown data mode: {data_mode}. Expected one of: {DATA_MODES}.")
+        if checkpoint_format not in CHECKPOINT_FORMATS:
+            raise ValueError(f"Unknown checkpoint format: {checkpoint_format}. Expected one of: {CHECKPOINT_FORMATS}.")
+        if checkpoint_dtype is not None and checkpoint_dtype not in CHECKPOINT_DTYPES:
+            raise ValueError(f"Unknown checkpoint dtype: {checkpoint_dtype}. Expected one of: {CHECKPOINT_DTYPES}.")
+
         super().__init__(
             __file__,
             cloud_build_config=BuildConfig(requirements=getattr(tasks, task).requirements),
@@ -31,15 +87,57 @@ class FlashTrainer(TracerPythonScript):
         self.task = task
         self.datasets = datasets
         self.checkpoints = checkpoints
+        self.engine = engine
+        self.data_mode = data_mode
+        self.preprocess = preprocess
+        self.checkpoint_format = checkpoint_format
+        self.checkpoint_dtype = checkpoint_dtype
+        self.cache_backbones = cache_backbones
 
         self.id = None
 
         self.script_dir = tempfile.mkdtemp()
         self.ready = False
         self.monitor = None
+        # The file name of the checkpoint of the current run in the checkpoints Drive, once it is uploaded
+        self.checkpoint: Optional[str] = None
+        # The values of the monitored metric reported at the end of each validation, used to prune losing runs
+        self.metrics: List[float] = []
         self.progress = 0.0
 
+        # The ID of a run to stop, set by the flow, and whether the current run was stopped at its request
+        self.stop_requested: Optional[str] = None
+        self.stopped = False
+
+        # Whether the work had already completed a run (and so kept its dependencies and datasets) when the current
+        # run started
+        self.warm = False
+        self.time_to_first_batch: Optional[float] = None
+        self.dataset_cache_stats = {"hits": 0, "misses": 0}
+        self.backbone_cache_stats = {"hits": 0, "misses": 0}
+
+        # The batch size used for training (after the search for the largest batch size, if any) and the training
+        # throughput reported by the training script
+        self.batch_size: Optional[int] = None
+        self.samples_per_second: Optional[float] = None
+        self.steps_per_second: Optional[float] = None
+
+        # The start time and duration of the stages of the current run (startup, dataset download and extraction,
+        # script generation, setup until the first batch, training and checkpointing)
+        self.timings: List[Dict] = []
+
         self._task_meta: TaskMeta = getattr(tasks, task)
+        self._num_runs = 0
+        self._launched_at: Optional[float] = None
+        self._first_batch_at: Optional[float] = None
+        self._script_started_at: Optional[float] = None
+        self._timer = StageTimer()
+        self._dataset_cache = DatasetCache(datasets)
+        self._preprocessed_cache = PreprocessedCache(datasets)
+        self._backbone_cache = BackboneCache(checkpoints)
+        self._script_variables: Optional[Dict] = None
+        # The dataset and directory of the view of the dataset cache read by the current run, if any
+        self._dataset_view: Optional[Tuple[str, str]] = None
 
     def run(
         self,
@@ -47,41 +145,84 @@ class FlashTrainer(TracerPythonScript):
         dataset: str,
         data_config: Dict,
         task_config: Dict,
+        launched_at: Optional[float] = None,
+        trainer_config: Optional[Dict] = None,
     ):
         self.id = id
+        self.ready = False
+        self.progress = 0.0
+        self.monitor = None
+        self.checkpoint = None
+        self.metrics = []
+        self.warm = self._num_runs > 0
+        self.time_to_first_batch = None
+        self.batch_size = None
+        self.samples_per_second = None
+        self.steps_per_second = None
+        self._launched_at = launched_at if launched_at is not None else time.time()
+        self._first_batch_at = None
+        self._num_runs += 1
 
-        meta_file_path = dataset + ".meta"
+        self.stopped = False
+        if self.should_stop():
+            # The run was stopped before the work picked it up
+            return
 
-        if not os.path.exists(dataset):
-            self.datasets.get(dataset)
-        if not os.path.exists(meta_file_path):
-            self.datasets.get(meta_file_path)
+        # Time from the launch of the run until the work runs it, which includes starting the machine and installing
+        # the dependencies for a fresh work
+        self._timer.reset()
+        self._timer.record("startup", self._launched_at)
 
-        with open(meta_file_path) as f:
-            meta = json.load(f)
+        backbone = task_config.get("backbone")
+        if self.cache_backbones and backbone:
+            # The download caches must point to the backbone cache before the model libraries (and the tokenizers
+            # used for preprocessing) are first used
+            os.environ.update(self._backbone_cache.environ)
+            with self._stage("backbone"):
+                self._backbone_cache.seed(
+                    get_backbone_key(self.task, backbone),
+                    lambda: fetch_backbone(self._task_meta, backbone),
+                    timer=self._timer,
+                )
+            self.backbone_cache_stats = {"hits": self._backbone_cache.hits, "misses": self._backbone_cache.misses}
 
-        os.replace(dataset, meta["original_path"])
+        archive_path = None
+        preprocessed_dir = None
+        preprocess_params = None
+        if self.preprocess:
+            preprocess_params = get_preprocess_params(self._task_meta, data_config, task_config)
+        with self._stage("dataset"):
+            if preprocess_params is not None:
+                preprocessed_dir = self._get_preprocessed(id, dataset, data_config, preprocess_params)
+            elif self.data_mode == "archive" and supports_archive(self._task_meta, data_config):
+                archive_path, index = self._dataset_cache.get_archive(dataset, timer=self._timer)
+                if not index.is_random_access:
+                    logging.warning(f"Cannot read {dataset} in place, extracting it instead")
+                    archive_path = None
 
-        file_path = meta["original_path"]
+            if archive_path is None and preprocessed_dir is None:
+                # Only the parts of the archive referenced by the data config are extracted
+                data_dir = self._dataset_cache.view(
+                    dataset,
+                    os.path.join(self.script_dir, id),
+                    timer=self._timer,
+                    members=get_archive_members(data_config),
+                )
+                data_config = resolve_paths(data_config, data_dir)
+                self._dataset_view = (dataset, data_dir)
+        self.dataset_cache_stats = {"hits": self._dataset_cache.hits, "misses": self._dataset_cache.misses}
 
-        if zipfile.is_zipfile(file_path):
-            with zipfile.ZipFile(file_path, "r") as zf:
-                zf.extractall(".")
-        elif tarfile.is_tarfile(file_path):
-            with tarfile.TarFile(file_path, "r") as tf:
-                tf.extractall(".")
-        else:
-            raise ValueError("Cannot open archive file!")
+        # The throughput settings are sized to the compute of the work, unless they are part of the task config
+        throughput_config = get_throughput_config(self._task_meta, self.cloud_compute.name, overrides=task_config)
+        task_config = {key: value for key, value in task_config.items() if key not in THROUGHPUT_KEYS}
 
-        logging.info(f"Generating script in: {self.script_dir}")
-        self.script_path = os.path.join(self.script_dir, "flash_training.py")
+        trainer_config = {"max_epochs": 1, **(trainer_config or {})}
 
-        logging.info("Data config: {data_config}")
-        logging.info("Task config: {task_config}")
+        logging.info(f"Data config: {data_config}")
+        logging.info(f"Task config: {task_config}")
+        logging.info(f"Throughput config: {throughput_config}")
 
-        generate_script(
-            self.script_path,
-            "flash_training.jinja",
+        self._script_variables = dict(
             task=self.task,
             data_module_import_path=self._task_meta.data_module_import_path,
             data_module_class=self._task_meta.data_module_class,
@@ -90,23 +231,159 @@ class FlashTrainer(TracerPythonScript):
             linked_attributes=self._task_meta.linked_attributes,
             data_config=data_config,
             task_config=task_config,
+            trainer_config=trainer_config,
+            monitor=self._task_meta.monitor,
+            archive_path=archive_path,
+            preprocessed_dir=preprocessed_dir,
+            **throughput_config,
         )
-        logging.info(f"Running script: {self.script_path}")
+
+        if self.engine == "script":
+            self.script_path = os.path.join(self.script_dir, "flash_training.py")
+            logging.info(f"Generating script: {self.script_path}")
+            with self._stage("script_generation"):
+                self.export_script(self.script_path)
+
+            self.ready = True
+            try:
+                super().run()
+            finally:
+                # Released in ``on_after_run`` when the run succeeds, and here when it fails
+                self._release_dataset()
+            return
 
         self.ready = True
-        super().run()
+        self._script_started_at = time.time()
+        res = {}
+        try:
+            res["trainer"] = train(
+                self,
+                self._task_meta,
+                data_config,
+                task_config,
+                trainer_config,
+                root=self.script_dir,
+                archive_path=archive_path,
+                preprocessed_dir=preprocessed_dir,
+                **throughput_config,
+            )
+            if not res["trainer"].interrupted:
+                self.on_after_run(res)
+        finally:
+            # Released in ``on_after_run`` when the run succeeds, and here when it fails or is interrupted
+            self._release_dataset()
+
+    def _get_preprocessed(self, id: str, dataset: str, data_config: Dict, params: Dict) -> str:
+        """Returns the directory of the preprocessed dataset, preprocessing the dataset first if no run did."""
+        preprocessed = preprocess_dataset(
+            dataset,
+            data_config,
+            params,
+            self._dataset_cache,
+            self._preprocessed_cache,
+            os.path.join(self.script_dir, id),
+            timer=self._timer,
+        )
+        return preprocessed.root
+
+    def export_script(self, path: str):
+        """Writes the training script of the current run to ``path``."""
+        if self._script_variables is None:
+            raise RuntimeError("There is no run to export the script of. Call `run` first.")
+        generate_script(path, "flash_training.jinja", **self._script_variables)
+
+    @contextlib.contextmanager
+    def _stage(self, name: str):
+        try:
+            with self._timer.stage(name):
+                yield
+        finally:
+            self.timings = list(self._timer.stages)
+
+    def _record_stage(self, name: str, start: float):
+        self._timer.record(name, start)
+        self.timings = list(self._timer.stages)
+
+    def on_first_batch(self, batch_size: Optional[int] = None):
+        """Called by the training script when the first training batch starts."""
+        self._first_batch_at = time.time()
+        self._record_stage("setup", self._script_started_at)
+        self.batch_size = batch_size
+        self.time_to_first_batch = self._first_batch_at - self._launched_at
+        logging.info(f"Time to first batch ({'warm' if self.warm else 'cold'}): {self.time_to_first_batch:.2f}s")
+
+    def should_stop(self) -> bool:
+        """Called by the training script after each training batch. Returns whether the current run should stop."""
+        if self.stop_requested is not None and self.stop_requested == self.id:
+            self.stopped = True
+        return self.stopped
+
+    def on_validation_end(self, value: float):
+        """Called by the training script with the value of the monitored metric at the end of each validation."""
+        self.metrics = self.metrics + [value]
+
+    def on_train_end(self):
+        """Called by the training script when training ends."""
+        if self._first_batch_at is not None:
+            self._record_stage("train", self._first_batch_at)
 
     def _run_tracer(self, init_globals):
+        self._script_started_at = time.time()
         sys.argv = [self.script_path]
         tracer = self.configure_tracer()
         return tracer.trace(self.script_path, self, *self.script_args, init_globals=init_globals)
 
     def on_after_run(self, res):
-        checkpoint_path = f"{self.id}_checkpoint.pt"
-        res["trainer"].save_checkpoint(checkpoint_path)
-        self.checkpoints.put(checkpoint_path)
+        if self.stopped:
+            self._teardown(res)
+            self._release_dataset()
+            return
 
         self.monitor = float(res["trainer"].callback_metrics[self._task_meta.monitor].item())
 
+        checkpoint_path = get_checkpoint_filename(self.id, self.checkpoint_format)
+        with self._stage("checkpoint_save"):
+            if self.checkpoint_format == "weights":
+                save_weights(res["trainer"].lightning_module, checkpoint_path, dtype=self.checkpoint_dtype)
+            else:
+                res["trainer"].save_checkpoint(checkpoint_path)
+
+        # The upload overlaps with the teardown of the trainer, and completes before the run does so that the run only
+        # succeeds with its checkpoint available
+        start = time.time()
+        errors = []
+        upload = threading.Thread(target=self._upload_checkpoint, args=(checkpoint_path, errors), daemon=True)
+        upload.start()
+        try:
+            self._teardown(res)
+            self._release_dataset()
+        finally:
+            upload.join()
+        if errors:
+            raise RuntimeError(f"Failed to upload the checkpoint: {checkpoint_path}") from errors[0]
+        self._record_stage("checkpoint_upload", start)
+        self.checkpoint = checkpoint_path
+
+    def _upload_checkpoint(self, checkpoint_path: str, errors: List[Exception]):
+        try:
+            self.checkpoints.put(checkpoint_path)
+        except Exception as error:
+            errors.append(error)
+
+    def _release_dataset(self):
+        """Releases the view of the dataset cache read by the run, so that the dataset can be evicted again."""
+        if self._dataset_view is not None:
+            self._dataset_cache.release(*self._dataset_view)
+            self._dataset_view = None
+
+    @staticmethod
+    def _teardown(res: Dict):
+        """Releases the trainer, model and dataloaders of the run (the globals of the script, with the script engine)
+        and the memory they hold."""
+        res.clear()
+        gc.collect()
+        if "torch" in sys.modules and sys.modules["torch"].cuda.is_available():
+            sys.modules["torch"].cuda.empty_cache()
+
     def on_exit(self):
         shutil.rmtree(self.script_dir)
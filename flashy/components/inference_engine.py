@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from flashy.components.archive_index import LRUCache
+from flashy.components.engines import get_data_module_class
+from flashy.components.model_cache import load_model
+from flashy.components.tasks import TaskMeta
+
+_STOP = object()
+
+
+def load_predictor(task_meta: TaskMeta, checkpoint: str, output: str = "labels") -> Callable[[List[Any]], List[Any]]:
+    """Loads the model of a task from a checkpoint (or gets it from the model cache) and returns a function predicting
+    a batch of inputs with it."""
+    import flash
+
+    data_module_class = get_data_module_class(task_meta)
+    model = load_model(task_meta, checkpoint)
+    trainer = flash.Trainer(logger=False, enable_progress_bar=False)
+
+    def predict(inputs: List[Any]) -> List[Any]:
+        datamodule = data_module_class.from_lists(predict_data=inputs, batch_size=len(inputs))
+        predictions = trainer.predict(model, datamodule=datamodule, output=output)
+        return [prediction for batch in predictions for prediction in batch]
+
+    return predict
+
+
+class InferenceEngine:
+    """Serves predictions from a model which is loaded once.
+
+    Concurrent requests received within ``max_wait`` seconds of each other are grouped into a single call of
+    ``predict_fn`` with up to ``max_batch_size`` inputs. The predictions of the last ``cache_size`` distinct inputs are
+    cached, so repeated inputs are answered without running the model. Inputs must be hashable.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        cache_size: int = 1024,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self.num_batches = 0
+        self.num_cache_hits = 0
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._cache: LRUCache[Any] = LRUCache(cache_size)
+        self._cache_lock = threading.Lock()
+        # Guards starting and closing the engine against the requests being enqueued
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "InferenceEngine":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def close(self):
+        """Stops the engine once the requests received so far are answered. Later requests raise."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+            # Fail any request left behind rather than leave its caller waiting forever
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    item[1].set_exception(RuntimeError("The inference engine was closed."))
+
+    def predict(self, input: Hashable) -> Any:
+        """Returns the prediction for a single input, blocking until the batch it is part of has been predicted."""
+        with self._cache_lock:
+            if input in self._cache:
+                self.num_cache_hits += 1
+                return self._cache.get(input)
+
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                raise RuntimeError("The inference engine is not running. Call `start` first.")
+            self._queue.put((input, future))
+        return future.result()
+
+    def _next_batch(self) -> Tuple[List[Tuple[Hashable, Future]], bool]:
+        """Waits for a request and returns it with the requests received within ``max_wait`` of it, and whether the
+        engine was closed."""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run_batch(self, batch: List[Tuple[Hashable, Future]]):
+        # Identical inputs within a batch are only predicted once
+        inputs = list(dict.fromkeys(input for input, _ in batch))
+        try:
+            predictions = self.predict_fn(inputs)
+        except Exception as e:
+            logging.exception("Prediction failed")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.num_batches += 1
+        predictions = dict(zip(inputs, predictions))
+        with self._cache_lock:
+            for input, prediction in predictions.items():
+                self._cache.put(input, prediction)
+        for input, future in batch:
+            future.set_result(predictions[input])
+
+    def _loop(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if batch:
+                self._run_batch(batch)
@@ -0,0 +1,191 @@
+import functools
+import hashlib
+import importlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from flashy.components.checkpoints import is_weights_checkpoint, load_weights_model
+from flashy.components.tasks import TaskMeta
+
+_DEFAULT_MAX_BYTES = 4 * 1024**3
+
+# Maps (path, size, mtime) -> SHA-256 of a checkpoint file, so a checkpoint is only hashed once
+_checkpoint_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def get_checkpoint_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _checkpoint_hashes:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                sha256.update(chunk)
+        _checkpoint_hashes[key] = sha256.hexdigest()
+    return _checkpoint_hashes[key]
+
+
+def get_model_size(model: Any) -> int:
+    """Returns the number of bytes of the parameters and buffers of a ``torch.nn.Module``."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class ModelCache:
+    """A cache of loaded models keyed by the path and content hash of their checkpoint.
+
+    Models are evicted in least recently used order once their total size grows beyond ``max_bytes``. Concurrent
+    requests for the same checkpoint (e.g. from a warm-up and a demo) only load it once.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = _DEFAULT_MAX_BYTES,
+        size_fn: Callable[[Any], int] = get_model_size,
+    ):
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+
+        self.hits = 0
+        self.misses = 0
+
+        self._models: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[Tuple[str, str], threading.Lock] = {}
+        # The checkpoints being warmed up in the background
+        self._warming: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __contains__(self, checkpoint: str) -> bool:
+        return self._get_key(checkpoint) in self._models
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    @staticmethod
+    def _get_key(checkpoint: str) -> Tuple[str, str]:
+        return os.path.abspath(checkpoint), get_checkpoint_hash(checkpoint)
+
+    def get(self, checkpoint: str, load_fn: Callable[[str], Any]) -> Any:
+        """Returns the model loaded from ``checkpoint``, calling ``load_fn(checkpoint)`` to load it on a miss."""
+        key = self._get_key(checkpoint)
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if key in self._models:
+                    self.hits += 1
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+                self.misses += 1
+
+            logging.info(f"Loading model from: {checkpoint}")
+            model = load_fn(checkpoint)
+            with self._lock:
+                self._models[key] = (model, self.size_fn(model))
+                self._evict(keep=key)
+            return model
+
+    def warm_up(
+        self,
+        checkpoint: str,
+        load_fn: Callable[[str], Any],
+        fetch_fn: Optional[Callable[[str], None]] = None,
+    ) -> Optional[threading.Thread]:
+        """Loads a model in the background, so that it is ready when it is requested.
+
+        ``fetch_fn`` is called with the checkpoint first, e.g. to download it from a Drive. Returns ``None`` if the
+        checkpoint is already being warmed up.
+        """
+        with self._lock:
+            if checkpoint in self._warming:
+                return None
+            self._warming.add(checkpoint)
+
+        def warm_up():
+            try:
+                if fetch_fn is not None:
+                    fetch_fn(checkpoint)
+                self.get(checkpoint, load_fn)
+            except Exception:
+                logging.exception(f"Failed to warm up the model of: {checkpoint}")
+            finally:
+                with self._lock:
+                    self._warming.discard(checkpoint)
+
+        thread = threading.Thread(target=warm_up, daemon=True)
+        thread.start()
+        return thread
+
+    def _evict(self, keep: Tuple[str, str]):
+        total = self.size
+        for key in list(self._models):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            logging.info(f"Evicting model from cache: {key[0]}")
+            _, size = self._models.pop(key)
+            total -= size
+
+
+_model_cache: Optional[ModelCache] = None
+
+
+def get_model_cache() -> ModelCache:
+    """Returns the model cache shared by the components of this process."""
+    global _model_cache
+    if _model_cache is None:
+        _model_cache = ModelCache()
+    return _model_cache
+
+
+def _get_load_fn(task_meta: TaskMeta, checkpoint: str) -> Callable[[str], Any]:
+    """Returns the function loading the model of a task from a full or weights checkpoint."""
+    task_class = getattr(importlib.import_module(task_meta.task_import_path), task_meta.task_class)
+    if is_weights_checkpoint(checkpoint):
+        return functools.partial(load_weights_model, task_class)
+    return task_class.load_from_checkpoint
+
+
+def fetch_checkpoint(checkpoint: str, drive: Optional[Any] = None) -> str:
+    """Downloads a checkpoint from the Drive of the checkpoints (where the training works upload them) if it is not
+    local yet, and returns its local path."""
+    if drive is not None and not os.path.exists(checkpoint):
+        logging.info(f"Downloading checkpoint: {checkpoint}")
+        drive.get(checkpoint)
+    return checkpoint
+
+
+def load_model(task_meta: TaskMeta, checkpoint: str, model_cache: Optional[ModelCache] = None) -> Any:
+    """Returns the model of a task loaded from a checkpoint, through the shared model cache by default."""
+    model_cache = model_cache if model_cache is not None else get_model_cache()
+    return model_cache.get(checkpoint, _get_load_fn(task_meta, checkpoint))
+
+
+def warm_up_models(
+    task_meta: TaskMeta,
+    checkpoints: List[str],
+    model_cache: Optional[ModelCache] = None,
+    drive: Optional[Any] = None,
+):
+    """Loads the models of a task from the given checkpoints into the shared model cache in the background.
+
+    The checkpoints which are not local are downloaded from ``drive`` first (in the background too), if given.
+    """
+    model_cache = model_cache if model_cache is not None else get_model_cache()
+    for checkpoint in checkpoints:
+        if os.path.exists(checkpoint):
+            if checkpoint not in model_cache:
+                model_cache.warm_up(checkpoint, _get_load_fn(task_meta, checkpoint))
+        elif drive is not None:
+            model_cache.warm_up(checkpoint, _get_load_fn(task_meta, checkpoint), fetch_fn=drive.get)
+        else:
+            logging.warning(f"Not warming up the model of a missing checkpoint: {checkpoint}")
@@ -0,0 +1,37 @@
+from typing import Any, Callable, Dict, List, Optional
+
+
+class PredictionStream:
+    """Adds the predictions of a model to a dataset chunk by chunk, as they are predicted.
+
+    ``predictions`` are the batches returned by ``trainer.predict`` for one chunk of the data, each a list of
+    predictions which are converted to samples with ``to_sample``. ``on_first_chunk`` is called with the dataset once
+    the first chunk has been added (e.g. to open a session on it) and ``on_chunk`` after every following chunk.
+    """
+
+    def __init__(
+        self,
+        dataset: Any,
+        to_sample: Callable[[Dict], Any],
+        on_first_chunk: Optional[Callable[[Any], None]] = None,
+        on_chunk: Optional[Callable[[Any], None]] = None,
+    ):
+        self.dataset = dataset
+        self.to_sample = to_sample
+        self.on_first_chunk = on_first_chunk
+        self.on_chunk = on_chunk
+
+        self.num_chunks = 0
+        self.num_samples = 0
+
+    def add(self, predictions: List[List[Dict]]) -> int:
+        """Adds the predictions of a chunk to the dataset and returns the number of samples added."""
+        samples = [self.to_sample(prediction) for batch in predictions for prediction in batch]
+        self.dataset.add_samples(samples)
+        self.num_chunks += 1
+        self.num_samples += len(samples)
+
+        callback = self.on_first_chunk if self.num_chunks == 1 else self.on_chunk
+        if callback is not None:
+            callback(self.dataset)
+        return len(samples)
@@ -0,0 +1,341 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flashy.components.dataset_cache import get_archive_members, resolve_paths
+from flashy.components.drive_index import put_shared, try_get
+from flashy.components.stage_timer import StageTimer, timed
+from flashy.components.tasks import TaskMeta
+
+_DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "flashy", "preprocessed")
+
+# Bumped whenever the preprocessing changes, so that the entries written by previous versions are not used
+PREPROCESS_VERSION = 1
+
+# The size the images are decoded to, which is the default image size of the Flash image classification transforms
+IMAGE_SIZE = (196, 196)
+
+_SPLITS = ("train", "val", "test")
+_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".ppm", ".bmp", ".pgm", ".tif", ".tiff", ".webp")
+
+
+@dataclass
+class PreprocessedDataset:
+    """The preprocessed splits of a dataset: for each split, the columns of its samples (e.g. ``input_ids`` and
+    ``targets``) as arrays memory-mapped from the cache, and the class names the ``targets`` refer to."""
+
+    root: str
+    labels: List[str]
+    splits: Dict[str, Dict[str, Any]]
+
+
+def get_preprocess_params(task_meta: TaskMeta, data_config: Dict, task_config: Dict) -> Optional[Dict[str, Any]]:
+    """Returns the parameters of the preprocessing of the datasets of the runs of a task with the given configs, or
+    ``None`` if their datasets are not preprocessed (texts are preprocessed from CSV files and images from folders).
+
+    Only the parameters which change the preprocessed samples are included, e.g. the tokenizer (the backbone) but not
+    the learning rate, so that the runs of a sweep share their preprocessed datasets.
+    """
+    target = data_config.get("target")
+    if task_meta.preprocessor == "tokenize" and target == "from_csv" and task_config.get("backbone"):
+        return {
+            "preprocessor": "tokenize",
+            "backbone": task_config["backbone"],
+            "max_length": task_config.get("max_length", 128),
+        }
+    if task_meta.preprocessor == "decode" and target == "from_folders":
+        return {"preprocessor": "decode", "image_size": list(IMAGE_SIZE)}
+    return None
+
+
+def get_preprocess_key(dataset_key: str, data_config: Dict, params: Dict[str, Any]) -> str:
+    """Returns the cache key of a dataset (identified by its content hash or drive path) preprocessed with ``params``
+    for the given data config."""
+    key = {"dataset": dataset_key, "data_config": data_config, "params": params, "version": PREPROCESS_VERSION}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def _read_csv(path: str, input_field: str, target_field: str) -> Tuple[List[str], List[str]]:
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    return [row[input_field] for row in rows], [row[target_field] for row in rows]
+
+
+def _create_column(root: str, split: str, column: str, shape: Tuple[int, ...], dtype: str) -> Any:
+    """Creates a column of a preprocessed split as a ``.npy`` file in ``root``, memory-mapped to be written to."""
+    import numpy as np
+
+    os.makedirs(root, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(root, f"{split}.{column}.npy"), mode="w+", dtype=dtype, shape=shape)
+
+
+def tokenize(
+    data_config: Dict,
+    root: str,
+    backbone: str,
+    max_length: int,
+    batch_size: int = 1024,
+    tokenizer: Optional[Callable] = None,
+) -> PreprocessedDataset:
+    """Tokenizes the texts of a ``from_csv`` data config with the tokenizer of ``backbone`` (or ``tokenizer``, if
+    given) into columns in ``root``."""
+    if tokenizer is None:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(backbone, use_fast=True)
+    target_field = data_config["target_fields"]
+    target_field = target_field[0] if isinstance(target_field, (list, tuple)) else target_field
+
+    texts = {}
+    for split in _SPLITS:
+        if data_config.get(f"{split}_file"):
+            texts[split] = _read_csv(data_config[f"{split}_file"], data_config["input_field"], target_field)
+    labels = sorted(set(texts["train"][1]))
+    label_ids = {label: label_id for label_id, label in enumerate(labels)}
+
+    splits = {}
+    for split, (inputs, targets) in texts.items():
+        input_ids = _create_column(root, split, "input_ids", (len(inputs), max_length), "int32")
+        attention_mask = _create_column(root, split, "attention_mask", (len(inputs), max_length), "int8")
+        for start in range(0, len(inputs), batch_size):
+            tokenized = tokenizer(
+                inputs[start : start + batch_size],
+                max_length=max_length,
+                truncation=True,
+                padding="max_length",
+                return_tensors="np",
+            )
+            input_ids[start : start + batch_size] = tokenized["input_ids"]
+            attention_mask[start : start + batch_size] = tokenized["attention_mask"]
+        split_targets = _create_column(root, split, "targets", (len(targets),), "int64")
+        split_targets[:] = [label_ids[target] for target in targets]
+        splits[split] = {"input_ids": input_ids, "attention_mask": attention_mask, "targets": split_targets}
+    return PreprocessedDataset(root, labels, splits)
+
+
+def decode_images(data_config: Dict, root: str, image_size: List[int]) -> PreprocessedDataset:
+    """Decodes and resizes the images of a ``from_folders`` data config (laid out as ``<folder>/<class>/<file>``) into
+    columns in ``root``."""
+    import numpy as np
+    from PIL import Image
+
+    files = {}
+    for split in _SPLITS:
+        folder = data_config.get(f"{split}_folder")
+        if folder:
+            files[split] = sorted(
+                (os.path.join(folder, label, filename), label)
+                for label in os.listdir(folder)
+                if os.path.isdir(os.path.join(folder, label))
+                for filename in os.listdir(os.path.join(folder, label))
+                if filename.lower().endswith(_IMAGE_EXTENSIONS)
+            )
+    labels = sorted({label for _, label in files["train"]})
+    label_ids = {label: label_id for label_id, label in enumerate(labels)}
+
+    height, width = image_size
+    splits = {}
+    for split, samples in files.items():
+        # Channels first, as expected by the numpy inputs of Flash
+        images = _create_column(root, split, "images", (len(samples), 3, height, width), "uint8")
+        for position, (path, _) in enumerate(samples):
+            with Image.open(path) as image:
+                images[position] = np.asarray(image.convert("RGB").resize((width, height))).transpose(2, 0, 1)
+        targets = _create_column(root, split, "targets", (len(samples),), "int64")
+        targets[:] = [label_ids[label] for _, label in samples]
+        splits[split] = {"images": images, "targets": targets}
+    return PreprocessedDataset(root, labels, splits)
+
+
+PREPROCESSORS: Dict[str, Callable[..., PreprocessedDataset]] = {"tokenize": tokenize, "decode": decode_images}
+
+
+def save_preprocessed(dataset: PreprocessedDataset) -> List[str]:
+    """Flushes the columns of a preprocessed dataset to their ``.npy`` files and writes the ``meta.json`` file listing
+    them. Returns the names of the files of the dataset, ``meta.json`` last."""
+    filenames = []
+    for split, columns in dataset.splits.items():
+        for column, values in columns.items():
+            values.flush()
+            filenames.append(f"{split}.{column}.npy")
+
+    columns = {split: list(columns) for split, columns in dataset.splits.items()}
+    with open(os.path.join(dataset.root, "meta.json"), "w") as f:
+        json.dump({"labels": dataset.labels, "columns": columns}, f)
+    return filenames + ["meta.json"]
+
+
+def load_preprocessed(root: str) -> PreprocessedDataset:
+    """Loads a preprocessed dataset saved with ``save_preprocessed``, memory-mapping its columns."""
+    import numpy as np
+
+    with open(os.path.join(root, "meta.json")) as f:
+        meta = json.load(f)
+    splits = {
+        split: {column: np.load(os.path.join(root, f"{split}.{column}.npy"), mmap_mode="r") for column in columns}
+        for split, columns in meta["columns"].items()
+    }
+    return PreprocessedDataset(root, meta["labels"], splits)
+
+
+class PreprocessedCache:
+    """A cache of preprocessed datasets (tokenized texts or decoded images), shared by the runs of the sweeps.
+
+    An entry is preprocessed by the first run which needs it and uploaded to the Drive, so that the other runs (on this
+    work or on others) download it instead of preprocessing the dataset again. Entries are stored locally under
+    ``root`` and their columns are memory-mapped when read.
+    """
+
+    def __init__(self, drive, root: str = _DEFAULT_ROOT):
+        self.drive = drive
+        self.root = root
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self,
+        key: str,
+        build_fn: Callable[[str], PreprocessedDataset],
+        timer: Optional[StageTimer] = None,
+    ) -> PreprocessedDataset:
+        """Returns the preprocessed dataset of ``key``, calling ``build_fn`` with the directory to write the columns
+        to if neither this cache nor the Drive has it.
+
+        The download and the preprocessing are recorded as ``download`` and ``preprocess`` stages of the ``timer``.
+        """
+        entry_dir = os.path.join(self.root, key)
+        if os.path.exists(os.path.join(entry_dir, "meta.json")):
+            self.hits += 1
+            return load_preprocessed(entry_dir)
+
+        # The entry is staged under the current directory, where the Drive reads and writes its files
+        staging_dir = os.path.join("preprocessed", key)
+        if os.path.exists(staging_dir):
+            shutil.rmtree(staging_dir)
+        with timed(timer, "download"):
+            # The metadata is uploaded last, so an entry is complete in the Drive once it is there
+            found = try_get(self.drive, os.path.join(staging_dir, "meta.json"))
+            if found:
+                with open(os.path.join(staging_dir, "meta.json")) as f:
+                    meta = json.load(f)
+                for split, columns in meta["columns"].items():
+                    for column in columns:
+                        self.drive.get(os.path.join(staging_dir, f"{split}.{column}.npy"))
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+            logging.info(f"Preprocessing dataset: {key}")
+            with timed(timer, "preprocess"):
+                filenames = save_preprocessed(build_fn(staging_dir))
+            # Another run may have preprocessed the same entry in the meantime, e.g. if the preparation of its sweep
+            # failed, in which case its files are kept
+            for filename in filenames:
+                put_shared(self.drive, os.path.join(staging_dir, filename))
+
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            os.rename(staging_dir, entry_dir)
+        except OSError:
+            # Another run cached the same entry in the meantime
+            shutil.rmtree(staging_dir)
+        return load_preprocessed(entry_dir)
+
+
+def preprocess_dataset(
+    dataset: str,
+    data_config: Dict,
+    params: Dict[str, Any],
+    dataset_cache: Any,
+    preprocessed_cache: PreprocessedCache,
+    data_dir: str,
+    timer: Optional[StageTimer] = None,
+) -> PreprocessedDataset:
+    """Returns a dataset preprocessed with ``params`` (see ``get_preprocess_params``) from ``preprocessed_cache``.
+
+    If neither the cache nor its Drive has it, the parts of the dataset referenced by the data config are extracted
+    from the dataset cache to ``data_dir`` and preprocessed.
+    """
+    key = get_preprocess_key(dataset_cache.get_key(dataset), data_config, params)
+    params = dict(params)
+    preprocessor = PREPROCESSORS[params.pop("preprocessor")]
+
+    def build(root: str) -> PreprocessedDataset:
+        view_dir = dataset_cache.view(dataset, data_dir, timer=timer, members=get_archive_members(data_config))
+        try:
+            return preprocessor(resolve_paths(data_config, view_dir), root, **params)
+        finally:
+            dataset_cache.release(dataset, view_dir)
+
+    return preprocessed_cache.get(key, build, timer=timer)
+
+
+def build_preprocessed_datamodule(task_meta: TaskMeta, dataset: PreprocessedDataset, **kwargs) -> Any:
+    """Builds the datamodule of a task from its preprocessed dataset.
+
+    Decoded images are given to Flash as numpy arrays. Tokenized texts are given as the positions of their rows in the
+    preprocessed dataset, which the collate function set by ``attach_preprocessed`` turns into batches of tokens.
+    """
+    from flashy.components.engines import get_data_module_class
+
+    data_module_class = get_data_module_class(task_meta)
+    inputs = {}
+    offset = 0
+    for split, columns in dataset.splits.items():
+        targets = columns["targets"]
+        if task_meta.preprocessor == "decode":
+            inputs[f"{split}_data"] = columns["images"]
+        else:
+            inputs[f"{split}_data"] = list(range(offset, offset + len(targets)))
+            offset += len(targets)
+        inputs[f"{split}_targets"] = [dataset.labels[target] for target in targets]
+
+    if task_meta.preprocessor == "decode":
+        return data_module_class.from_numpy(**inputs, **kwargs)
+    return data_module_class.from_lists(**inputs, **kwargs)
+
+
+class PretokenizedCollate:
+    """Collates the samples of a datamodule built by ``build_preprocessed_datamodule`` from tokenized texts, whose
+    inputs are the positions of their rows in the preprocessed splits (in order)."""
+
+    def __init__(self, dataset: PreprocessedDataset):
+        self.splits = list(dataset.splits.values())
+        self.offsets = []
+        offset = 0
+        for columns in self.splits:
+            self.offsets.append(offset)
+            offset += len(columns["targets"])
+
+    def _get_row(self, position: int) -> Tuple[Dict[str, Any], int]:
+        for columns, offset in reversed(list(zip(self.splits, self.offsets))):
+            if position >= offset:
+                return columns, position - offset
+        raise IndexError(position)
+
+    def __call__(self, samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+        import numpy as np
+        import torch
+        from flash.core.data.io.input import DataKeys
+
+        rows = [self._get_row(sample[DataKeys.INPUT]) for sample in samples]
+        batch = {
+            column: torch.from_numpy(np.stack([columns[column][row] for columns, row in rows]).astype(np.int64))
+            for column in ("input_ids", "attention_mask")
+        }
+        if DataKeys.TARGET in samples[0]:
+            batch[DataKeys.TARGET] = torch.tensor([sample[DataKeys.TARGET] for sample in samples])
+        return batch
+
+
+def attach_preprocessed(model: Any, dataset: PreprocessedDataset):
+    """Makes a text model collate the tokens of the preprocessed dataset instead of tokenizing the texts itself."""
+    if "input_ids" in next(iter(dataset.splits.values())):
+        model.collate_fn = PretokenizedCollate(dataset)
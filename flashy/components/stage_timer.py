@@ -0,0 +1,34 @@
+import contextlib
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class StageTimer:
+    """Records the wall-clock start time and duration of the stages of a run, e.g. downloading the dataset or saving
+    the checkpoint. Stages may be nested."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.stages: List[Dict[str, Any]] = []
+
+    def reset(self):
+        self.stages = []
+
+    def record(self, name: str, start: float, end: Optional[float] = None) -> Dict[str, Any]:
+        end = self.clock() if end is None else end
+        stage = {"name": name, "start": start, "duration": end - start}
+        self.stages.append(stage)
+        return stage
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+
+def timed(timer: Optional[StageTimer], name: str):
+    """Returns a context manager timing a stage with the given timer, if any."""
+    return timer.stage(name) if timer is not None else contextlib.nullcontext()
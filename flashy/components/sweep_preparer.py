@@ -0,0 +1,103 @@
+import functools
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+from lightning import BuildConfig, LightningWork
+from lightning.app.storage import Drive
+
+from flashy.components import tasks
+from flashy.components.backbone_cache import BackboneCache, get_backbone_key
+from flashy.components.dataset_cache import DatasetCache
+from flashy.components.engines import fetch_backbone
+from flashy.components.preprocessing import PreprocessedCache, get_preprocess_params, preprocess_dataset
+from flashy.components.stage_timer import StageTimer
+from flashy.components.tasks import TaskMeta
+
+
+class SweepPreparer(LightningWork):
+    """Prepares what the runs of a sweep share before they are launched, so that the runs launched together find it in
+    the Drives rather than all preparing it at once.
+
+    With ``cache_backbones``, the pretrained weights of each backbone of the runs are fetched once into the
+    ``BackboneCache`` of the checkpoints Drive.
+
+    With ``preprocess``, the dataset is preprocessed once for each distinct preprocessing of the runs (e.g. once for
+    each tokenizer of the search space) into the ``PreprocessedCache`` of the datasets Drive.
+
+    The runs do not depend on the preparation: if it fails, they prepare what they need themselves.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        datasets: Drive,
+        checkpoints: Drive,
+        preprocess: bool = False,
+        cache_backbones: bool = False,
+        **kwargs,
+    ):
+        super().__init__(
+            cloud_build_config=BuildConfig(requirements=getattr(tasks, task).requirements),
+            raise_exception=False,
+            parallel=True,
+            **kwargs,
+        )
+
+        self.task = task
+        self.datasets = datasets
+        self.checkpoints = checkpoints
+        self.preprocess = preprocess
+        self.cache_backbones = cache_backbones
+
+        # The stage timings of the preparation
+        self.timings: List[Dict] = []
+
+        self._task_meta: TaskMeta = getattr(tasks, task)
+        self._timer = StageTimer()
+        self._dataset_cache = DatasetCache(datasets)
+        self._preprocessed_cache = PreprocessedCache(datasets)
+        self._backbone_cache = BackboneCache(checkpoints)
+
+    def run(self, dataset: str, data_config: Dict, backbones: List[Optional[str]]):
+        """Prepares the runs of a sweep on ``dataset`` with ``data_config`` whose models use one of ``backbones``."""
+        self._timer.reset()
+        task_configs = [{"backbone": backbone} if backbone else {} for backbone in backbones or [None]]
+
+        if self.cache_backbones:
+            # The tokenizers used for preprocessing are then read from the backbone cache as well
+            os.environ.update(self._backbone_cache.environ)
+            for backbone in filter(None, backbones):
+                logging.info(f"Caching backbone for the sweep: {backbone}")
+                self._backbone_cache.seed(
+                    get_backbone_key(self.task, backbone),
+                    functools.partial(fetch_backbone, self._task_meta, backbone),
+                    timer=self._timer,
+                )
+
+        # The parts of the dataset extracted to be preprocessed are only needed during the preparation
+        data_dir = tempfile.mkdtemp()
+        try:
+            if self.preprocess:
+                prepared = set()
+                for task_config in task_configs:
+                    params = get_preprocess_params(self._task_meta, data_config, task_config)
+                    if params is None or json.dumps(params, sort_keys=True) in prepared:
+                        continue
+                    prepared.add(json.dumps(params, sort_keys=True))
+                    logging.info(f"Preprocessing {dataset} for the sweep: {params}")
+                    preprocess_dataset(
+                        dataset,
+                        data_config,
+                        params,
+                        self._dataset_cache,
+                        self._preprocessed_cache,
+                        data_dir,
+                        timer=self._timer,
+                    )
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+            self.timings = list(self._timer.stages)
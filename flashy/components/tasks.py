@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Any, Dict, List, Optional
 
 
 @dataclass
@@ -13,6 +13,42 @@ class TaskMeta:
     supports_fiftyone: bool
     supports_gradio: bool
     requirements: List[str]
+    # The batch size on a small CPU machine, scaled up for larger compute
+    batch_size: int = 4
+    # Whether the samples can be read from the dataset archive in place (see `flashy.components.archive_data`)
+    supports_archive: bool = False
+    # How the datasets are preprocessed once for all the runs of a sweep ("tokenize" or "decode"), if at all (see
+    # `flashy.components.preprocessing`)
+    preprocessor: Optional[str] = None
+
+
+# Throughput settings for each compute type the runs are scheduled on. On GPUs, the batch size is the initial value of
+# the search for the largest batch size which fits in memory.
+COMPUTE_THROUGHPUT: Dict[str, Dict[str, Any]] = {
+    "cpu-small": {"batch_size_multiplier": 1, "precision": 32, "num_workers": 2, "auto_batch_size": False},
+    "gpu": {"batch_size_multiplier": 8, "precision": 16, "num_workers": 4, "auto_batch_size": True},
+}
+
+# The keys of a model config which are throughput settings rather than arguments of the task
+THROUGHPUT_KEYS = ("batch_size", "precision", "num_workers", "auto_batch_size")
+
+
+def get_throughput_config(
+    task_meta: TaskMeta,
+    compute_name: str,
+    overrides: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Returns the batch size, precision, number of dataloader workers and whether to search for the largest batch
+    size of the runs of a task on the given compute, with the values in ``overrides`` taking precedence."""
+    compute = COMPUTE_THROUGHPUT.get(compute_name, COMPUTE_THROUGHPUT["cpu-small"])
+    throughput_config = {
+        "batch_size": task_meta.batch_size * compute["batch_size_multiplier"],
+        "precision": compute["precision"],
+        "num_workers": compute["num_workers"],
+        "auto_batch_size": compute["auto_batch_size"],
+    }
+    throughput_config.update({key: value for key, value in (overrides or {}).items() if key in THROUGHPUT_KEYS})
+    return throughput_config
 
 
 image_classification = TaskMeta(
@@ -25,6 +61,8 @@ image_classification = TaskMeta(
     True,
     False,
     ["lightning-flash[image]==0.8.1", "torchmetrics==0.10.3"],
+    supports_archive=True,
+    preprocessor="decode",
 )
 
 text_classification = TaskMeta(
@@ -37,4 +75,5 @@ text_classification = TaskMeta(
     False,
     True,
     ["lightning-flash[text]==0.8.1", "torchmetrics==0.10.3"],
+    preprocessor="tokenize",
 )
@@ -3,14 +3,27 @@ import logging
 import os
 import os.path
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, Template
 
 import flashy
 
 
 @functools.lru_cache
 def _get_env():
-    return Environment(loader=FileSystemLoader(flashy.TEMPLATES_ROOT))
+    env = Environment(loader=FileSystemLoader(flashy.TEMPLATES_ROOT))
+    # Values are rendered as Python literals, so strings containing quotes or backslashes stay valid
+    env.filters["repr"] = repr
+    return env
+
+
+@functools.lru_cache
+def get_template(template_file: str) -> Template:
+    """Returns a template, compiled once per process."""
+    return _get_env().get_template(template_file)
+
+
+def render_script(template_file, **kwargs) -> str:
+    return get_template(template_file).render(**kwargs)
 
 
 def generate_script(
@@ -18,8 +31,6 @@ def generate_script(
     template_file,
     **kwargs,
 ):
-    template = _get_env().get_template(os.path.join(template_file))
-
     variables = dict(
         root=os.path.dirname(path),
         **kwargs,
@@ -28,5 +39,5 @@ def generate_script(
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
     with open(path, "w") as f:
-        logging.info(f"Rendering {template_file} with variables: {variables}")
-        f.write(template.render(**variables))
+        logging.debug(f"Rendering {template_file} with variables: {variables}")
+        f.write(render_script(template_file, **variables))
@@ -20,8 +20,22 @@ class WorkManager(LightningFlow):
         self.managed_works[group][str(work_name)] = work_attribute
         setattr(self, work_attribute, work)
 
+    def link_work(self, group, work_name, target_group, target_work_name):
+        """Registers an already managed work under another name, e.g. to look up a pooled work by run."""
+        if group not in self.managed_works:
+            self.managed_works[group] = {}
+        self.managed_works[group][str(work_name)] = self.managed_works[target_group][str(target_work_name)]
+
     def get_work(self, group, work_name):
         work_name = str(work_name)
         if group in self.managed_works and work_name in self.managed_works[group]:
             return getattr(self, self.managed_works[group][work_name], None)
         return None
+
+    def get_works(self, group):
+        works = []
+        for work_name in self.managed_works.get(group, {}):
+            work = self.get_work(group, work_name)
+            if work is not None:
+                works.append(work)
+        return works
@@ -0,0 +1,49 @@
+import copy
+from typing import Any, Dict, List
+
+from flashy.run_tracker import is_terminal
+
+# For each performance preset: the number of runs of a sweep (``count``) and, for multi-fidelity sweeps, the number of
+# configs first screened (``screen``) on a ``fraction`` of the training batches, of which the best ``promote`` are then
+# trained on the full data. Both variants of a preset cost about the same compute, e.g. the ``high`` preset explores
+# 100 configs instead of 10.
+PERFORMANCE_PRESETS: Dict[str, Dict[str, Any]] = {
+    "low": {"count": 1},
+    "medium": {"count": 5, "screen": 25, "fraction": 0.1, "promote": 3},
+    "high": {"count": 10, "screen": 100, "fraction": 0.05, "promote": 5},
+}
+
+SCREENING = "screening"
+FULL = "full"
+
+
+def get_stage(run: Dict[str, Any]) -> str:
+    return run.get("stage", FULL)
+
+
+def is_screening_done(sweep_results: Dict[str, Dict[str, Any]]) -> bool:
+    return all(is_terminal(result) for result in sweep_results.values() if get_stage(result["run"]) == SCREENING)
+
+
+def select_promoted(sweep_results: Dict[str, Dict[str, Any]], count: int, mode: str = "max") -> List[Dict[str, Any]]:
+    """Returns the ``count`` screening runs of a sweep with the best value of the monitored metric."""
+    screened = [
+        result
+        for result in sweep_results.values()
+        if get_stage(result["run"]) == SCREENING
+        and result["progress"] == "succeeded"
+        and result.get("monitor") is not None
+    ]
+    screened.sort(key=lambda result: result["monitor"], reverse=mode == "max")
+    return [result["run"] for result in screened[:count]]
+
+
+def promote(run: Dict[str, Any], run_id: str) -> Dict[str, Any]:
+    """Returns a copy of a screening run which trains on the full data."""
+    run = copy.deepcopy(run)
+    run["id"] = run_id
+    run["stage"] = FULL
+    run["trainer_config"] = {
+        key: value for key, value in run.get("trainer_config", {}).items() if key != "limit_train_batches"
+    }
+    return run
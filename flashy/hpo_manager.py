@@ -1,13 +1,37 @@
+import functools
+import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from lightning import LightningFlow
 from lightning.app.storage import Drive
 from ray import tune
 
+from flashy.components.archive_data import DATA_MODES
+from flashy.components.checkpoints import CHECKPOINT_DTYPES, CHECKPOINT_FORMATS
+from flashy.fidelity import (
+    FULL,
+    PERFORMANCE_PRESETS,
+    SCREENING,
+    get_stage,
+    is_screening_done,
+    promote,
+    select_promoted,
+)
+from flashy.pruning import PRUNERS, should_prune
 from flashy.run_scheduler import RunScheduler
+from flashy.run_tracker import (
+    RunTracker,
+    get_best_run,
+    is_terminal,
+    summarize_time_to_first_batch,
+    to_chrome_trace,
+)
+from flashy.search import SEARCH_ALGORITHMS, Observation, TPESearch, get_observations, sample_random
 
+# The search spaces of each task and model. Besides the arguments of the task, a space may also set the throughput
+# settings of the runs (see `THROUGHPUT_KEYS`), which are otherwise sized to the compute of the run.
 _search_spaces: Dict[str, Dict[str, Dict[str, tune.sample.Domain]]] = {
     "image_classification": {
         "demo": {
@@ -46,27 +70,93 @@ _search_spaces: Dict[str, Dict[str, Dict[str, tune.sample.Domain]]] = {
 }
 
 
-def _generate_runs(count: int, task: str, search_space: Dict) -> List[Dict[str, Any]]:
-    runs = []
-    for _ in range(count):
-        model_config = {}
-        for key, domain in search_space.items():
-            if hasattr(domain, "sample"):
-                model_config[key] = domain.sample()
-            else:
-                model_config[key] = domain
-        runs.append({"task": task, "model_config": model_config})
-    return runs
+def _get_backbones(search_space: Dict) -> List[Optional[str]]:
+    """Returns the backbones the models of a search space can use."""
+    backbone = search_space.get("backbone")
+    if hasattr(backbone, "categories"):
+        return list(backbone.categories)
+    return [backbone]
+
+
+def _generate_runs(
+    count: int,
+    task: str,
+    search_space: Dict,
+    search_algorithm: str = "random",
+    observations: Optional[List[Observation]] = None,
+) -> List[Dict[str, Any]]:
+    if search_algorithm == "tpe":
+        model_configs = TPESearch(search_space).suggest(observations or [], count)
+    else:
+        model_configs = [sample_random(search_space) for _ in range(count)]
+    return [{"task": task, "model_config": model_config} for model_config in model_configs]
 
 
 class HPOManager(LightningFlow):
     """The HPOManager is used to suggest a list of configurations (hyper-parameters) to run with some configuration from
-    the user for the given task."""
+    the user for the given task.
+
+    By default, the configurations are sampled at random. With the ``tpe`` search algorithm, they are proposed from the
+    results of the previous runs with the same task, dataset and model instead.
+
+    With a ``pruner`` (``median`` or ``asha``), the runs report the monitored metric at each validation and the runs
+    which fall behind the other runs of their sweep are stopped early.
+
+    With ``multi_fidelity``, the ``medium`` and ``high`` performance presets first screen many configs on a fraction of
+    the training data and then train the best of them on the full data (see ``PERFORMANCE_PRESETS``).
+
+    With the ``"archive"`` data mode, the runs read the samples from the dataset archive in place rather than
+    extracting it, where supported (see ``flashy.components.archive_data``).
+
+    The runs save their checkpoint in ``checkpoint_format``, with the weights cast to ``checkpoint_dtype`` if given
+    (see ``flashy.components.checkpoints``).
 
-    def __init__(self, datasets: Drive, checkpoints: Drive):
+    The runs of a sweep are launched once what they share is prepared: with ``cache_backbones``, the pretrained
+    weights of the backbones of the search space are fetched (see ``flashy.components.backbone_cache``) and with
+    ``preprocess``, the dataset is preprocessed (see ``flashy.components.preprocessing``). Both are off by default,
+    as the preparation runs on a work of its own, whose startup delays the first runs of the sweep.
+    """
+
+    def __init__(
+        self,
+        datasets: Drive,
+        checkpoints: Drive,
+        pool_size: Optional[int] = None,
+        search_algorithm: str = "random",
+        pruner: str = "none",
+        val_check_interval: float = 0.25,
+        multi_fidelity: bool = False,
+        data_mode: str = "extract",
+        checkpoint_format: str = "full",
+        checkpoint_dtype: Optional[str] = None,
+        preprocess: bool = False,
+        cache_backbones: bool = False,
+    ):
         super().__init__()
 
-        self.runs = RunScheduler(datasets, checkpoints)
+        if search_algorithm not in SEARCH_ALGORITHMS:
+            raise ValueError(f"Unknown search algorithm: {search_algorithm}. Expected one of: {SEARCH_ALGORITHMS}.")
+        if pruner not in PRUNERS:
+            raise ValueError(f"Unknown pruner: {pruner}. Expected one of: {PRUNERS}.")
+        if data_mode not in DATA_MODES:
+            raise ValueError(f"Unknown data mode: {data_mode}. Expected one of: {DATA_MODES}.")
+        if checkpoint_format not in CHECKPOINT_FORMATS:
+            raise ValueError(f"Unknown checkpoint format: {checkpoint_format}. Expected one of: {CHECKPOINT_FORMATS}.")
+        if checkpoint_dtype is not None and checkpoint_dtype not in CHECKPOINT_DTYPES:
+            raise ValueError(f"Unknown checkpoint dtype: {checkpoint_dtype}. Expected one of: {CHECKPOINT_DTYPES}.")
+
+        self.runs = RunScheduler(
+            datasets,
+            checkpoints,
+            pool_size=pool_size,
+            work_kwargs={
+                "data_mode": data_mode,
+                "checkpoint_format": checkpoint_format,
+                "checkpoint_dtype": checkpoint_dtype,
+                "preprocess": preprocess,
+                "cache_backbones": cache_backbones,
+            },
+        )
 
         self.start = False
         self.dataset: Optional[str] = None
@@ -74,74 +164,177 @@ class HPOManager(LightningFlow):
         self.data_config = {}
         self.model = "demo"
         self.performance = "low"
+        self.search_algorithm = search_algorithm
+        self.multi_fidelity = multi_fidelity
+        self.pruner = pruner
+        # How often (as a fraction of an epoch) the runs are validated when pruning, so they can be compared early
+        self.val_check_interval = val_check_interval
+        self.preprocess = preprocess
+        self.cache_backbones = cache_backbones
 
         self.running_runs: Dict[int, List[Dict[str, Any]]] = {}
         self.results: Dict[int, Dict[str, Dict[str, Any]]] = {}
 
         self.stopped_run = None
+        self.pruned_runs: List[str] = []
+
+        # Maps sweep ID -> ID of the best run of the sweep, once all its runs are done
+        self.best_runs: Dict[str, str] = {}
+        # Maps sweep ID -> the best run of the sweep and the name of its checkpoint in the checkpoints Drive. These are
+        # the checkpoints to show and warm up in the demo components (see `get_best_checkpoints`)
+        self.best_checkpoints: Dict[str, Dict[str, Any]] = {}
+
+        # Maps sweep ID -> number of screened configs to promote to the full data once its screening runs are done
+        self.promotions: Dict[str, int] = {}
+
+        # Mean time to first batch of cold and warm runs
+        self.time_to_first_batch: Dict[str, Optional[float]] = {"cold": None, "warm": None}
+
+        self._tracker: Optional[RunTracker] = None
 
     def run(self):
+        if self._tracker is None:
+            self._tracker = RunTracker()
+            self._tracker.restore(self.running_runs, self.results)
+
         if self.start:
             self.start = False
             # Generate runs
-            performance_runs = {
-                "low": 1,
-                "medium": 5,
-                "high": 10,
-            }
+            preset = PERFORMANCE_PRESETS[self.performance]
+            screening = self.multi_fidelity and "screen" in preset
+
+            observations = get_observations(
+                self.results,
+                lambda run: (run["task"], run.get("dataset"), run.get("model"), get_stage(run))
+                == (self.selected_task, self.dataset, self.model, FULL),
+            )
+            search_space = _search_spaces[self.selected_task][self.model]
             generated_runs = _generate_runs(
-                performance_runs[self.performance],
+                preset["screen"] if screening else preset["count"],
                 self.selected_task,
-                _search_spaces[self.selected_task][self.model],
+                search_space,
+                search_algorithm=self.search_algorithm,
+                observations=observations,
             )
 
             # Launch new runs
             for run in generated_runs:
                 run["id"] = uuid.uuid4().hex[:8]  # TODO: Prettier random IDs
                 run["data_config"] = self.data_config
+                run["dataset"] = self.dataset
+                run["model"] = self.model
+                run["stage"] = SCREENING if screening else FULL
+                run["trainer_config"] = {}
+                if screening:
+                    run["trainer_config"]["limit_train_batches"] = preset["fraction"]
+                if self.pruner != "none":
+                    run["trainer_config"]["val_check_interval"] = self.val_check_interval
             logging.info(f"Running: {generated_runs}")
 
             sweep_id = max(int(id) for id in self.running_runs.keys()) + 1 if self.running_runs else 1
-            self.running_runs[sweep_id] = generated_runs
-
-            self.runs.run(self.dataset, generated_runs)
-
-        for sweep_id, runs in self.running_runs.items():
-            if sweep_id not in self.results:
-                self.results[sweep_id] = {}
-
-            for run in runs:
-                run_work = self.runs.get_work("runs", str(run["id"]))
-                if run_work is not None:
-                    if run_work.has_succeeded:
-                        self.results[sweep_id][run["id"]] = {
-                            "run": run,
-                            "progress": "succeeded",
-                            "monitor": run_work.monitor,
-                        }
-                    elif run_work.has_failed:
-                        self.results[sweep_id][run["id"]] = {
-                            "run": run,
-                            "progress": "failed",
-                        }
-                    elif run_work.has_stopped:
-                        self.results[sweep_id][run["id"]] = {
-                            "run": run,
-                            "progress": "stopped",
-                        }
-                    elif run_work.ready:
-                        self.results[sweep_id][run["id"]] = {
-                            "run": run,
-                            "progress": run_work.progress,
-                        }
-                    else:
-                        self.results[sweep_id][run["id"]] = {
-                            "run": run,
-                            "progress": "launching",
-                        }
+            self.running_runs[sweep_id] = []
+            self.results[sweep_id] = {}
+            if screening:
+                self.promotions[str(sweep_id)] = preset["promote"]
+            if self.preprocess or self.cache_backbones:
+                # The runs of the sweep are launched once their backbones are fetched and their dataset preprocessed
+                self.runs.prepare(
+                    str(sweep_id),
+                    self.selected_task,
+                    self.dataset,
+                    self.data_config,
+                    _get_backbones(search_space),
+                    preprocess=self.preprocess,
+                    cache_backbones=self.cache_backbones,
+                )
+            self._launch(sweep_id, generated_runs)
+
+        changed = self._tracker.update(self.results, functools.partial(self.runs.get_work, "runs"))
+        if any(self.results[sweep_id][run_id]["progress"] == "succeeded" for sweep_id, run_id in changed):
+            self.time_to_first_batch = summarize_time_to_first_batch(self.results)
+        if self.pruner != "none":
+            self._prune(changed)
+        self._promote(changed)
+        self._update_best_runs(changed)
+
+        self.runs.run()
 
         if self.stopped_run is not None:
             # TODO: There could be race conditions if two stop requests are made seperately
-            run_work = self.runs.get_work("runs", str(self.stopped_run))
+            run_id = str(self.stopped_run)
             self.stopped_run = None
-            run_work.stop()
+            if self.runs.dequeue(run_id):
+                self._tracker.cancel(self.results, run_id)
+            else:
+                self.runs.stop_run(run_id)
+
+    def export_trace(self, path: str):
+        """Writes the stage timings of all the runs to ``path`` as a Chrome trace file."""
+        with open(path, "w") as f:
+            json.dump(to_chrome_trace(self.results), f)
+
+    def _launch(self, sweep_id: int, runs: List[Dict[str, Any]]):
+        self.running_runs[sweep_id] = self.running_runs[sweep_id] + runs
+        self.results[sweep_id].update({run["id"]: {"run": run, "progress": "queued"} for run in runs})
+        self._tracker.track(sweep_id, runs)
+
+        self.runs.queue(runs[0]["dataset"], runs, after=str(sweep_id))
+
+    def _promote(self, changed: List[Tuple[int, str]]):
+        """Trains the best configs of the multi-fidelity sweeps which completed their screening on the full data."""
+        for sweep_id in {sweep_id for sweep_id, _ in changed if str(sweep_id) in self.promotions}:
+            if not is_screening_done(self.results[sweep_id]):
+                continue
+
+            count = self.promotions.pop(str(sweep_id))
+            promoted_runs = [
+                promote(run, uuid.uuid4().hex[:8]) for run in select_promoted(self.results[sweep_id], count)
+            ]
+            logging.info(f"Promoting to the full data: {promoted_runs}")
+            if promoted_runs:
+                self._launch(sweep_id, promoted_runs)
+
+    def _update_best_runs(self, changed: List[Tuple[int, str]]):
+        for sweep_id in {sweep_id for sweep_id, _ in changed}:
+            sweep_results = self.results[sweep_id]
+            if str(sweep_id) in self.promotions or not all(is_terminal(result) for result in sweep_results.values()):
+                continue
+
+            best_run = get_best_run(sweep_results)
+            if best_run is not None and self.best_runs.get(str(sweep_id)) != best_run:
+                logging.info(f"Best run of sweep {sweep_id}: {best_run}")
+                self.best_runs[str(sweep_id)] = best_run
+                checkpoint = sweep_results[best_run].get("checkpoint")
+                if checkpoint is not None:
+                    self.best_checkpoints[str(sweep_id)] = {
+                        "run": sweep_results[best_run]["run"],
+                        "checkpoint": checkpoint,
+                    }
+
+    def get_best_checkpoints(self, task: str) -> List[Dict[str, Any]]:
+        """Returns the best run of each sweep of ``task`` with the name of its checkpoint in the checkpoints Drive, the
+        most recent sweep first."""
+        return [
+            self.best_checkpoints[sweep_id]
+            for sweep_id in sorted(self.best_checkpoints, key=int, reverse=True)
+            if self.best_checkpoints[sweep_id]["run"]["task"] == task
+        ]
+
+    def _prune(self, changed: List[Tuple[int, str]]):
+        """Stops the runs with an updated result which fall behind the other runs of their sweep."""
+        for sweep_id, run_id in changed:
+            sweep_results = self.results[sweep_id]
+            result = sweep_results[run_id]
+            if is_terminal(result) or not result.get("metrics"):
+                continue
+
+            # Only runs trained on the same fraction of the data are comparable
+            sibling_metrics = [
+                sibling_result.get("metrics", [])
+                for sibling_id, sibling_result in sweep_results.items()
+                if sibling_id != run_id and get_stage(sibling_result["run"]) == get_stage(result["run"])
+            ]
+            if should_prune(self.pruner, result["metrics"], sibling_metrics):
+                if self.runs.stop_run(run_id):
+                    logging.info(f"Pruning run {run_id} after {len(result['metrics'])} validations")
+                    self.pruned_runs.append(run_id)
@@ -0,0 +1,85 @@
+import math
+from typing import List, Sequence
+
+PRUNERS = ("none", "median", "asha")
+
+
+def _is_worse(value: float, reference: float, mode: str) -> bool:
+    return value < reference if mode == "max" else value > reference
+
+
+def _median(values: Sequence[float]) -> float:
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    """Returns the ``q``-th percentile of the values, interpolating linearly between the closest ranks."""
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    lower, upper = math.floor(rank), math.ceil(rank)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def median_stopping(
+    metrics: List[float],
+    sibling_metrics: List[List[float]],
+    mode: str = "max",
+    grace_steps: int = 1,
+    min_siblings: int = 2,
+) -> bool:
+    """The median stopping rule: a run is stopped when its best value so far is worse than the median of the running
+    averages of its siblings at the same step."""
+    step = len(metrics)
+    if step < grace_steps:
+        return False
+
+    averages = [sum(metrics[:step]) / step for metrics in sibling_metrics if len(metrics) >= step]
+    if len(averages) < min_siblings:
+        return False
+
+    best = max(metrics) if mode == "max" else min(metrics)
+    return _is_worse(best, _median(averages), mode)
+
+
+def asha(
+    metrics: List[float],
+    sibling_metrics: List[List[float]],
+    mode: str = "max",
+    grace_steps: int = 1,
+    reduction_factor: int = 3,
+) -> bool:
+    """Asynchronous successive halving: when a run reaches a rung (``grace_steps * reduction_factor ** k`` steps), it
+    is stopped unless its value is in the top ``1 / reduction_factor`` of the values recorded at that rung by all runs
+    of the sweep so far."""
+    step = len(metrics)
+    if step < grace_steps:
+        return False
+
+    rung = grace_steps
+    while rung * reduction_factor <= step:
+        rung *= reduction_factor
+    if rung != step:
+        # Runs are only compared when they reach a rung
+        return False
+
+    values = [metrics[rung - 1] for metrics in sibling_metrics if len(metrics) >= rung] + [metrics[rung - 1]]
+    if len(values) < reduction_factor:
+        return False
+
+    q = (1 - 1 / reduction_factor) * 100
+    cutoff = _percentile(values, q if mode == "max" else 100 - q)
+    return _is_worse(metrics[rung - 1], cutoff, mode)
+
+
+def should_prune(pruner: str, metrics: List[float], sibling_metrics: List[List[float]], mode: str = "max") -> bool:
+    """Returns whether a run with the given intermediate values of the monitored metric should be stopped, given the
+    values reported by the other runs of its sweep."""
+    if pruner == "median":
+        return median_stopping(metrics, sibling_metrics, mode=mode)
+    if pruner == "asha":
+        return asha(metrics, sibling_metrics, mode=mode)
+    if pruner == "none":
+        return False
+    raise ValueError(f"Unknown pruner: {pruner}. Expected one of: {PRUNERS}.")
@@ -0,0 +1,73 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+POLICIES = ("fifo", "priority")
+
+
+def get_compute_name(model_config: Dict[str, Any]) -> str:
+    return "gpu" if model_config.get("use_gpu", False) else "cpu-small"
+
+
+def count_running(works: Iterable[Tuple[str, Any]]) -> Dict[str, int]:
+    """Counts the works which have not yet finished for each compute type.
+
+    Args:
+        works: Pairs of compute name and work.
+    """
+    running: Dict[str, int] = {}
+    for compute_name, work in works:
+        if not (work.has_succeeded or work.has_failed or work.has_stopped):
+            running[compute_name] = running.get(compute_name, 0) + 1
+    return running
+
+
+def order_queued(queued: List[Dict[str, Any]], policy: str = "fifo") -> List[Dict[str, Any]]:
+    if policy == "fifo":
+        return sorted(queued, key=lambda entry: entry["position"])
+    if policy == "priority":
+        return sorted(queued, key=lambda entry: (-entry["priority"], entry["position"]))
+    raise ValueError(f"Unknown queue policy: {policy}. Expected one of: {POLICIES}.")
+
+
+def admit_runs(
+    queued: List[Dict[str, Any]],
+    running: Dict[str, int],
+    launch: Callable[[Dict[str, Any]], bool],
+    max_concurrent_runs: Optional[int] = None,
+    max_concurrent_runs_per_compute: Optional[Dict[str, int]] = None,
+    policy: str = "fifo",
+) -> List[Dict[str, Any]]:
+    """Launches queued runs, in the order given by the policy, while there are free slots.
+
+    A run whose compute type is at capacity is skipped so that it does not block runs of other compute types.
+
+    Args:
+        queued: The queue entries, each with a ``compute``, ``priority`` and ``position``.
+        running: The number of running works for each compute type.
+        launch: Called with each admitted entry. Returns whether the run could actually be launched.
+        max_concurrent_runs: The maximum number of runs in total, or ``None`` for no limit.
+        max_concurrent_runs_per_compute: The maximum number of runs for each compute type. Compute types which are not
+            listed are not limited.
+        policy: Either ``"fifo"`` or ``"priority"`` (highest priority first, then FIFO).
+
+    Returns:
+        The entries which were launched.
+    """
+    running = dict(running)
+    total = sum(running.values())
+    max_concurrent_runs_per_compute = max_concurrent_runs_per_compute or {}
+
+    launched = []
+    for entry in order_queued(queued, policy):
+        if max_concurrent_runs is not None and total >= max_concurrent_runs:
+            break
+
+        compute_name = entry["compute"]
+        limit = max_concurrent_runs_per_compute.get(compute_name)
+        if limit is not None and running.get(compute_name, 0) >= limit:
+            continue
+
+        if launch(entry):
+            running[compute_name] = running.get(compute_name, 0) + 1
+            total += 1
+            launched.append(entry)
+    return launched
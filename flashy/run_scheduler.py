@@ -1,29 +1,264 @@
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Type
 
-from lightning import CloudCompute
+from lightning import CloudCompute, LightningWork
 from lightning.app.storage import Drive
 
 from flashy.components.flash_trainer import FlashTrainer
+from flashy.components.sweep_preparer import SweepPreparer
 from flashy.components.work_manager import WorkManager
+from flashy.run_queue import POLICIES, admit_runs, count_running, get_compute_name
+
+_DEFAULT_MAX_CONCURRENT_RUNS_PER_COMPUTE = {"gpu": 4, "cpu-small": 8}
 
 
 class RunScheduler(WorkManager):
-    def __init__(self, datasets: Drive, checkpoints: Drive):
-        super().__init__(["runs"])
+    """The RunScheduler queues runs and launches them as slots become available, with a cap on the number of
+    concurrent runs in total and for each compute type.
+
+    By default, every run gets a fresh work. When ``pool_size`` is given, the runs are instead executed by a pool of
+    long-lived works (up to ``pool_size`` for each task and compute type) which keep their dependencies and datasets
+    between runs.
+
+    The works are built with ``work_kwargs`` (e.g. the checkpoint format of the ``FlashTrainer``) besides the task, the
+    Drives and the compute.
+
+    Runs queued ``after`` a preparation (see ``prepare``) are only launched once the preparation is done, so that they
+    find what it prepared (e.g. their preprocessed dataset) rather than all preparing it at once.
+    """
+
+    def __init__(
+        self,
+        datasets: Drive,
+        checkpoints: Drive,
+        max_concurrent_runs: Optional[int] = 10,
+        max_concurrent_runs_per_compute: Optional[Dict[str, int]] = None,
+        policy: str = "fifo",
+        pool_size: Optional[int] = None,
+        work_cls: Type[LightningWork] = FlashTrainer,
+        work_kwargs: Optional[Dict[str, Any]] = None,
+        preparer_cls: Type[LightningWork] = SweepPreparer,
+    ):
+        super().__init__(["runs", "workers", "preparations"])
+
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}. Expected one of: {POLICIES}.")
 
         self.datasets = datasets
         self.checkpoints = checkpoints
 
-    def run(self, dataset: str, queued_runs: Optional[List[Dict[str, Any]]]):
-        logging.info(f"Queued runs: {queued_runs}")
-        for run in queued_runs:
-            run_work = FlashTrainer(
-                run["task"],
-                self.datasets,
-                self.checkpoints,
-                cloud_compute=CloudCompute("gpu" if run["model_config"].pop("use_gpu", False) else "cpu-small"),
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_concurrent_runs_per_compute = (
+            dict(_DEFAULT_MAX_CONCURRENT_RUNS_PER_COMPUTE)
+            if max_concurrent_runs_per_compute is None
+            else max_concurrent_runs_per_compute
+        )
+        self.policy = policy
+        self.pool_size = pool_size
+
+        # Maps worker name -> ID of the last run assigned to it
+        self.worker_runs: Dict[str, str] = {}
+
+        self.queued_runs: List[Dict[str, Any]] = []
+        self.num_queued = 0
+
+        # The preparations to launch on the next run, as works can only be created from within `run`
+        self.queued_preparations: List[Dict[str, Any]] = []
+
+        self._work_cls = work_cls
+        self._work_kwargs = dict(work_kwargs or {})
+        self._preparer_cls = preparer_cls
+
+    def prepare(
+        self,
+        preparation_id: str,
+        task: str,
+        dataset: str,
+        data_config: Dict,
+        backbones: List[Optional[str]],
+        **kwargs,
+    ):
+        """Queues the preparation of the runs of a sweep (see ``SweepPreparer``), built with ``kwargs``, e.g.
+        ``preprocess=True``. The runs queued ``after`` it wait until it is done."""
+        self.queued_preparations.append(
+            {
+                "id": str(preparation_id),
+                "task": task,
+                "dataset": dataset,
+                "data_config": data_config,
+                "backbones": backbones,
+                "kwargs": kwargs,
+            }
+        )
+
+    def is_prepared(self, preparation_id: Optional[str]) -> bool:
+        """Returns whether the runs queued after the preparation can be launched. A failed preparation does not block
+        them, they then prepare what they need themselves."""
+        if any(preparation["id"] == preparation_id for preparation in self.queued_preparations):
+            return False
+        preparer = self.get_work("preparations", preparation_id) if preparation_id is not None else None
+        return preparer is None or preparer.has_succeeded or preparer.has_failed or preparer.has_stopped
+
+    def queue(self, dataset: str, runs: List[Dict[str, Any]], priority: int = 0, after: Optional[str] = None):
+        logging.info(f"Queued runs: {runs}")
+        for run in runs:
+            # The compute is recorded on the run, so that copies of it (e.g. promoted runs) are queued alike
+            run["compute"] = run.get("compute") or get_compute_name(run["model_config"])
+            compute_name = run["compute"]
+            run["model_config"].pop("use_gpu", None)
+            self.queued_runs.append(
+                {
+                    "run": run,
+                    "dataset": dataset,
+                    "compute": compute_name,
+                    "priority": priority,
+                    "position": self.num_queued,
+                    "after": after,
+                }
             )
-            self.register_work("runs", run["id"], run_work)
-            logging.info(f"Launching run: {run['id']}. Run work `run` method: {run_work.run}.")
-            run_work.run(run["id"], dataset, run["data_config"], run["model_config"])
+            self.num_queued += 1
+
+    def dequeue(self, run_id: str) -> bool:
+        """Removes a run from the queue if it has not been launched yet.
+
+        Returns whether the run was removed.
+        """
+        for entry in self.queued_runs:
+            if entry["run"]["id"] == run_id:
+                self.queued_runs.remove(entry)
+                return True
+        return False
+
+    def run(self):
+        for preparation in self.queued_preparations:
+            self._launch_preparation(preparation)
+        self.queued_preparations = []
+        for preparer in self.get_works("preparations"):
+            if preparer.has_succeeded:
+                # What it prepared is in the Drives, so its machine is no longer needed
+                preparer.stop()
+
+        if not self.queued_runs:
+            return
+
+        prepared = {after for after in {entry.get("after") for entry in self.queued_runs} if self.is_prepared(after)}
+        admissible = [entry for entry in self.queued_runs if entry.get("after") in prepared]
+        if not admissible:
+            return
+
+        if self.pool_size is None:
+            running = count_running((work.cloud_compute.name, work) for work in self.get_works("runs"))
+        else:
+            running = self._count_busy_workers()
+
+        launched = admit_runs(
+            admissible,
+            running,
+            self._launch if self.pool_size is None else self._launch_pooled,
+            max_concurrent_runs=self.max_concurrent_runs,
+            max_concurrent_runs_per_compute=self.max_concurrent_runs_per_compute,
+            policy=self.policy,
+        )
+        if launched:
+            launched_ids = {entry["run"]["id"] for entry in launched}
+            self.queued_runs = [entry for entry in self.queued_runs if entry["run"]["id"] not in launched_ids]
+
+    def stop_run(self, run_id: str) -> bool:
+        """Stops a launched run and returns whether there was one.
+
+        In pool mode, the worker of the run is asked to stop the run rather than stopped, so it goes on with the next
+        runs (see ``FlashTrainer.stop_requested``).
+        """
+        run_work = self.get_work("runs", run_id)
+        if run_work is None:
+            return False
+        if self.pool_size is None:
+            run_work.stop()
+        else:
+            run_work.stop_requested = str(run_id)
+        return True
+
+    def _launch_preparation(self, preparation: Dict[str, Any]):
+        logging.info(f"Preparing: {preparation['id']}")
+        preparer = self._preparer_cls(preparation["task"], self.datasets, self.checkpoints, **preparation["kwargs"])
+        self.register_work("preparations", preparation["id"], preparer)
+        preparer.run(preparation["dataset"], preparation["data_config"], preparation["backbones"])
+
+    def _launch(self, entry: Dict[str, Any]) -> bool:
+        run = entry["run"]
+        run_work = self._work_cls(
+            run["task"],
+            self.datasets,
+            self.checkpoints,
+            cloud_compute=CloudCompute(entry["compute"]),
+            **self._work_kwargs,
+        )
+        self.register_work("runs", run["id"], run_work)
+        logging.info(f"Launching run: {run['id']}. Run work `run` method: {run_work.run}.")
+        run_work.run(
+            run["id"],
+            entry["dataset"],
+            run["data_config"],
+            run["model_config"],
+            launched_at=time.time(),
+            trainer_config=run.get("trainer_config"),
+        )
+        return True
+
+    def _is_worker_dead(self, worker_name: str) -> bool:
+        worker = self.get_work("workers", worker_name)
+        return worker.has_failed or worker.has_stopped
+
+    def _is_worker_idle(self, worker_name: str) -> bool:
+        # The status of a worker is stale until it has picked up its last run, so also check the ID of its current run
+        worker = self.get_work("workers", worker_name)
+        return worker.id == self.worker_runs[worker_name] and worker.has_succeeded
+
+    def _count_busy_workers(self) -> Dict[str, int]:
+        running: Dict[str, int] = {}
+        for worker_name in self.worker_runs:
+            if not self._is_worker_dead(worker_name) and not self._is_worker_idle(worker_name):
+                compute_name = self.get_work("workers", worker_name).cloud_compute.name
+                running[compute_name] = running.get(compute_name, 0) + 1
+        return running
+
+    def _launch_pooled(self, entry: Dict[str, Any]) -> bool:
+        run = entry["run"]
+        pool_name = f"{run['task']}:{entry['compute']}"
+        pool = [
+            worker_name
+            for worker_name in self.worker_runs
+            if worker_name.rsplit(":", 1)[0] == pool_name and not self._is_worker_dead(worker_name)
+        ]
+
+        worker_name = next((worker_name for worker_name in pool if self._is_worker_idle(worker_name)), None)
+        if worker_name is None:
+            if len(pool) >= self.pool_size:
+                return False
+            worker_name = f"{pool_name}:{len(self.worker_runs)}"
+            self.register_work(
+                "workers",
+                worker_name,
+                self._work_cls(
+                    run["task"],
+                    self.datasets,
+                    self.checkpoints,
+                    cloud_compute=CloudCompute(entry["compute"]),
+                    **self._work_kwargs,
+                ),
+            )
+
+        worker = self.get_work("workers", worker_name)
+        self.link_work("runs", run["id"], "workers", worker_name)
+        self.worker_runs[worker_name] = run["id"]
+        logging.info(f"Launching run: {run['id']} on worker: {worker_name}.")
+        worker.run(
+            run["id"],
+            entry["dataset"],
+            run["data_config"],
+            run["model_config"],
+            launched_at=time.time(),
+            trainer_config=run.get("trainer_config"),
+        )
+        return True
@@ -0,0 +1,153 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TERMINAL_STATES = ("succeeded", "failed", "stopped")
+
+
+def get_run_result(run: Dict[str, Any], run_work: Any) -> Dict[str, Any]:
+    """Returns the result entry displayed in the UI for the given run and the work executing it."""
+    if getattr(run_work, "id", run["id"]) != run["id"]:
+        # A pooled work which has not yet picked up this run
+        return {"run": run, "progress": "launching"}
+    # The values of the monitored metric reported at each validation
+    metrics = list(getattr(run_work, "metrics", []))
+    # The start time and duration of each stage of the run
+    timings = list(getattr(run_work, "timings", []))
+    if getattr(run_work, "stopped", False):
+        # A run stopped without stopping its work, e.g. a pooled work
+        return {"run": run, "progress": "stopped", "metrics": metrics, "timings": timings}
+    if run_work.has_succeeded:
+        return {
+            "run": run,
+            "progress": "succeeded",
+            "monitor": run_work.monitor,
+            "checkpoint": getattr(run_work, "checkpoint", None),
+            "metrics": metrics,
+            "timings": timings,
+            "warm": getattr(run_work, "warm", False),
+            "time_to_first_batch": getattr(run_work, "time_to_first_batch", None),
+            "batch_size": getattr(run_work, "batch_size", None),
+            "samples_per_second": getattr(run_work, "samples_per_second", None),
+            "steps_per_second": getattr(run_work, "steps_per_second", None),
+        }
+    if run_work.has_failed:
+        return {"run": run, "progress": "failed", "metrics": metrics, "timings": timings}
+    if run_work.has_stopped:
+        return {"run": run, "progress": "stopped", "metrics": metrics, "timings": timings}
+    if run_work.ready:
+        return {"run": run, "progress": run_work.progress, "metrics": metrics, "timings": timings}
+    return {"run": run, "progress": "launching"}
+
+
+def is_terminal(result: Optional[Dict[str, Any]]) -> bool:
+    return result is not None and result["progress"] in TERMINAL_STATES
+
+
+def get_best_run(sweep_results: Dict[str, Dict[str, Any]], mode: str = "max") -> Optional[str]:
+    """Returns the ID of the succeeded run of a sweep with the best value of the monitored metric, if any."""
+    succeeded = [
+        (result["monitor"], run_id)
+        for run_id, result in sweep_results.items()
+        if result["progress"] == "succeeded"
+        and result.get("monitor") is not None
+        and result["run"].get("stage", "full") == "full"
+    ]
+    if not succeeded:
+        return None
+    return (max(succeeded) if mode == "max" else min(succeeded))[1]
+
+
+def summarize_time_to_first_batch(results: Dict[int, Dict[str, Dict[str, Any]]]) -> Dict[str, Optional[float]]:
+    """Returns the mean time to first batch of the succeeded cold and warm runs."""
+    times: Dict[str, List[float]] = {"cold": [], "warm": []}
+    for sweep_results in results.values():
+        for result in sweep_results.values():
+            if result.get("time_to_first_batch") is not None:
+                times["warm" if result["warm"] else "cold"].append(result["time_to_first_batch"])
+    return {key: sum(values) / len(values) if values else None for key, values in times.items()}
+
+
+def to_chrome_trace(results: Dict[int, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Returns the stage timings of the runs in the Chrome trace event format (viewable in ``chrome://tracing`` or
+    Perfetto), with one process per sweep and one thread per run."""
+    events = []
+    for sweep_id, sweep_results in results.items():
+        pid = int(sweep_id)
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"Sweep {sweep_id}"}})
+        for tid, (run_id, result) in enumerate(sweep_results.items()):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": run_id}})
+            for stage in result.get("timings", []):
+                events.append(
+                    {
+                        "name": stage["name"],
+                        "cat": "run",
+                        "ph": "X",
+                        "ts": stage["start"] * 1e6,
+                        "dur": stage["duration"] * 1e6,
+                        "pid": pid,
+                        "tid": tid,
+                        "args": {"run_id": run_id, "progress": result["progress"]},
+                    }
+                )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+class RunTracker:
+    """The RunTracker keeps the results of each sweep up to date by only polling the runs which have not yet reached a
+    terminal state.
+
+    Results of finished runs are frozen and a result is only written when the status or progress of its run changes, so
+    the cost of a tick (and the state delta sent to the UI) scales with the number of active runs rather than with the
+    total number of runs.
+    """
+
+    def __init__(self):
+        # Maps run ID -> (sweep ID, run)
+        self._active: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, run_id: str) -> bool:
+        return run_id in self._active
+
+    def track(self, sweep_id: int, runs: List[Dict[str, Any]]):
+        for run in runs:
+            self._active[run["id"]] = (sweep_id, run)
+
+    def restore(self, running_runs: Dict[int, List[Dict[str, Any]]], results: Dict[int, Dict[str, Dict[str, Any]]]):
+        """Rebuilds the set of active runs from the sweeps and their results, e.g. after the app state was reloaded."""
+        self._active = {}
+        for sweep_id, runs in running_runs.items():
+            sweep_results = results.get(sweep_id, {})
+            self.track(sweep_id, [run for run in runs if not is_terminal(sweep_results.get(run["id"]))])
+
+    def cancel(self, results: Dict[int, Dict[str, Dict[str, Any]]], run_id: str):
+        """Marks a run which never got a work, e.g. one removed from the queue, as stopped."""
+        sweep_id, run = self._active.pop(run_id)
+        results.setdefault(sweep_id, {})[run_id] = {"run": run, "progress": "stopped"}
+
+    def update(
+        self,
+        results: Dict[int, Dict[str, Dict[str, Any]]],
+        get_work: Callable[[str], Any],
+    ) -> List[Tuple[int, str]]:
+        """Polls the active runs and writes their results if they changed.
+
+        Returns the ``(sweep_id, run_id)`` pairs of the results that were written.
+        """
+        changed = []
+        for run_id, (sweep_id, run) in list(self._active.items()):
+            run_work = get_work(run_id)
+            if run_work is None:
+                continue
+
+            result = get_run_result(run, run_work)
+
+            sweep_results = results.setdefault(sweep_id, {})
+            if sweep_results.get(run_id) != result:
+                sweep_results[run_id] = result
+                changed.append((sweep_id, run_id))
+
+            if is_terminal(result):
+                del self._active[run_id]
+        return changed
@@ -0,0 +1,186 @@
+import math
+import random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SEARCH_ALGORITHMS = ("random", "tpe")
+
+Observation = Tuple[Dict[str, Any], float]
+
+
+def _is_categorical(domain: Any) -> bool:
+    return hasattr(domain, "categories")
+
+
+def _is_numerical(domain: Any) -> bool:
+    return hasattr(domain, "lower") and hasattr(domain, "upper")
+
+
+def _is_log(domain: Any) -> bool:
+    return type(getattr(domain, "sampler", None)).__name__ == "_LogUniform"
+
+
+class _Parzen:
+    """A Parzen estimator of the density of the observed values of a hyper-parameter, mixed with a uniform prior.
+
+    Numerical values are mapped to ``[0, 1]`` (on a log scale for log-uniform domains) and smoothed with a Gaussian
+    kernel. Categorical values are counted, with one pseudo-count per category.
+    """
+
+    def __init__(self, domain: Any, values: List[Any], prior_weight: float = 1.0):
+        self.domain = domain
+        self.prior_weight = prior_weight
+
+        if _is_categorical(domain):
+            weights = [prior_weight + sum(value == category for value in values) for category in domain.categories]
+            total = sum(weights)
+            self.probs = [weight / total for weight in weights]
+        else:
+            self.points = [self._to_unit(value) for value in values]
+            self.bandwidth = 0.25 * max(len(self.points), 1) ** -0.2
+
+    def _to_unit(self, value: float) -> float:
+        lower, upper = self.domain.lower, self.domain.upper
+        if _is_log(self.domain):
+            value, lower, upper = math.log(value), math.log(lower), math.log(upper)
+        return min(max((value - lower) / (upper - lower), 0.0), 1.0)
+
+    def _from_unit(self, x: float) -> float:
+        lower, upper = self.domain.lower, self.domain.upper
+        if _is_log(self.domain):
+            return math.exp(math.log(lower) + x * (math.log(upper) - math.log(lower)))
+        return lower + x * (upper - lower)
+
+    def sample(self, rng: random.Random) -> Any:
+        if _is_categorical(self.domain):
+            return rng.choices(self.domain.categories, weights=self.probs)[0]
+
+        component = rng.uniform(0, self.prior_weight + len(self.points))
+        if component < self.prior_weight:
+            return self._from_unit(rng.random())
+        mean = self.points[min(int(component - self.prior_weight), len(self.points) - 1)]
+        for _ in range(10):
+            x = rng.gauss(mean, self.bandwidth)
+            if 0.0 <= x <= 1.0:
+                return self._from_unit(x)
+        return self._from_unit(min(max(x, 0.0), 1.0))
+
+    def log_pdf(self, value: Any) -> float:
+        if _is_categorical(self.domain):
+            return math.log(self.probs[self.domain.categories.index(value)])
+
+        x = self._to_unit(value)
+        norm = 1.0 / (self.bandwidth * math.sqrt(2 * math.pi))
+        density = self.prior_weight + sum(
+            norm * math.exp(-0.5 * ((x - point) / self.bandwidth) ** 2) for point in self.points
+        )
+        return math.log(density / (self.prior_weight + len(self.points)))
+
+
+def _sample_value(domain: Any, rng: random.Random) -> Any:
+    if _is_categorical(domain):
+        return rng.choice(domain.categories)
+    if _is_numerical(domain):
+        return _Parzen(domain, []).sample(rng)
+    return domain.sample()
+
+
+def _is_valid(domain: Any, value: Any) -> bool:
+    if _is_categorical(domain):
+        return value in domain.categories
+    return isinstance(value, (int, float)) and domain.lower <= value <= domain.upper
+
+
+def sample_random(search_space: Dict[str, Any], rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """Samples a config uniformly from the search space. Values which are not domains are copied as they are."""
+    rng = rng or random.Random()
+    return {
+        key: _sample_value(domain, rng) if hasattr(domain, "sample") else domain for key, domain in search_space.items()
+    }
+
+
+def get_observations(
+    results: Dict[int, Dict[str, Dict[str, Any]]],
+    match: Callable[[Dict[str, Any]], bool],
+) -> List[Observation]:
+    """Returns the ``(model_config, monitor)`` pairs of the succeeded runs accepted by ``match``."""
+    observations = []
+    for sweep_results in results.values():
+        for result in sweep_results.values():
+            if result["progress"] == "succeeded" and result.get("monitor") is not None and match(result["run"]):
+                observations.append((result["run"]["model_config"], result["monitor"]))
+    return observations
+
+
+class TPESearch:
+    """Proposes configs with the Tree-structured Parzen Estimator.
+
+    The observations are split into the best ``gamma`` fraction and the rest, and the density of the hyper-parameters
+    is estimated for both groups. Candidates are sampled from the density of the best configs and the one which
+    maximizes the ratio of the two densities is proposed. Until ``num_startup`` observations are available, configs
+    are sampled at random.
+    """
+
+    def __init__(
+        self,
+        search_space: Dict[str, Any],
+        mode: str = "max",
+        gamma: float = 0.25,
+        num_startup: int = 5,
+        num_candidates: int = 24,
+        seed: Optional[int] = None,
+    ):
+        if mode not in ("min", "max"):
+            raise ValueError(f"Unknown mode: {mode}. Expected one of: ('min', 'max').")
+
+        self.search_space = search_space
+        self.mode = mode
+        self.gamma = gamma
+        self.num_startup = num_startup
+        self.num_candidates = num_candidates
+
+        self._rng = random.Random(seed)
+        self._domains = {
+            key: domain for key, domain in search_space.items() if _is_categorical(domain) or _is_numerical(domain)
+        }
+
+    def _split(self, observations: List[Observation]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        observations = sorted(observations, key=lambda observation: observation[1], reverse=self.mode == "max")
+        num_good = max(1, math.ceil(self.gamma * len(observations)))
+        configs = [config for config, _ in observations]
+        return configs[:num_good], configs[num_good:]
+
+    def suggest(self, observations: List[Observation], count: int = 1) -> List[Dict[str, Any]]:
+        # Only keep the observations which lie in the current search space
+        observations = [
+            (config, score)
+            for config, score in observations
+            if all(key in config and _is_valid(domain, config[key]) for key, domain in self._domains.items())
+        ]
+        if len(observations) < self.num_startup:
+            return [sample_random(self.search_space, self._rng) for _ in range(count)]
+
+        good, bad = self._split(observations)
+        estimators = {
+            key: (
+                _Parzen(domain, [config[key] for config in good]),
+                _Parzen(domain, [config[key] for config in bad]),
+            )
+            for key, domain in self._domains.items()
+        }
+
+        configs = []
+        for _ in range(count):
+            best_score, best_config = -math.inf, None
+            for _ in range(self.num_candidates):
+                candidate = {key: good_estimator.sample(self._rng) for key, (good_estimator, _) in estimators.items()}
+                score = sum(
+                    good_estimator.log_pdf(candidate[key]) - bad_estimator.log_pdf(candidate[key])
+                    for key, (good_estimator, bad_estimator) in estimators.items()
+                )
+                if score > best_score:
+                    best_score, best_config = score, candidate
+
+            config = sample_random(self.search_space, self._rng)
+            config.update(best_config)
+            configs.append(config)
+        return configs
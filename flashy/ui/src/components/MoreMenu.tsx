@@ -7,21 +7,22 @@ import PillTextField from "./PillTextField";
 import PillTextLabel from "./PillTextLabel";
 
 export type MoreMenuProps = {
-    value: number | "failed" | "launching" | "stopped" | "succeeded";
+    value: number | "queued" | "failed" | "launching" | "stopped" | "succeeded";
     id: string;
+    checkpoint?: string | null;
     lightningState: any;
     updateLightningState: (newState: any) => void;
 };
 
 const MoreMenu = React.forwardRef(
     (
-        { value, id, lightningState, updateLightningState }: MoreMenuProps,
+        { value, id, checkpoint, lightningState, updateLightningState }: MoreMenuProps,
         ref,
     ) => {
         const [checkpointDialogOpen, setCheckpointDialogOpen] = React.useState(false);
         const [anchorEl, setAnchorEl] = React.useState(null);
 
-        const checkpointUrl = lightningState?.vars.checkpoints_server_url + "/file/" + id + "_checkpoint.pt";
+        const checkpointUrl = lightningState?.vars.checkpoints_server_url + "/file/" + (checkpoint ?? id + "_checkpoint.pt");
 
         const handleClick = (event: any) => {
             setAnchorEl(event.currentTarget);
@@ -61,7 +62,7 @@ const MoreMenu = React.forwardRef(
                     <MenuItem onClick={() => {
                         setCheckpointDialogOpen(true);
                         handleClose();
-                    }} disabled={value != "succeeded"}>
+                    }} disabled={value != "succeeded" || checkpoint === null}>
                         <ListItemIcon>
                             <IosShareSharpIcon sx={{ fontSize: 16 }} />
                         </ListItemIcon>
@@ -9,7 +9,7 @@ import RunProgress from "./RunProgress";
 import MoreMenu from "./MoreMenu";
 
 
-function ResultRow(run: { id: string, task: string, model_config: any, data_config: any }, progress: number | "failed" | "launching" | "stopped" | "succeeded", lightningState: any, updateLightningState: (newState: any) => void, monitor?: number): ReactNode[] {
+function ResultRow(run: { id: string, task: string, model_config: any, data_config: any }, progress: number | "queued" | "failed" | "launching" | "stopped" | "succeeded", lightningState: any, updateLightningState: (newState: any) => void, monitor?: number, checkpoint?: string | null): ReactNode[] {
     return [
         run.id,
         <RunProgress value={progress} id={run.id} lightningState={lightningState} updateLightningState={updateLightningState} />,
@@ -17,7 +17,7 @@ function ResultRow(run: { id: string, task: string, model_config: any, data_conf
             (value: any)  => value[1]
         ),
         monitor? monitor: "-",
-        <MoreMenu value={progress} id={run.id} lightningState={lightningState} updateLightningState={updateLightningState} />,
+        <MoreMenu value={progress} id={run.id} checkpoint={checkpoint} lightningState={lightningState} updateLightningState={updateLightningState} />,
     ]
 }
 
@@ -26,7 +26,7 @@ export default function ResultsTable(props: {sweepId: string, results: any, ligh
     if (props.lightningState) {
         if (Object.entries(props.results).length > 0) {
             const rows = Object.entries(props.results).map(
-                (value: any) => ResultRow(value[1].run, value[1].progress, props.lightningState, props.updateLightningState, value[1].monitor)
+                (value: any) => ResultRow(value[1].run, value[1].progress, props.lightningState, props.updateLightningState, value[1].monitor, value[1].checkpoint)
             )
 
             const header = ["ID", "Progress", ...Object.entries((Object.entries(props.results) as any[])[0][1].run.model_config).map((value: any) => value[0]), "Performance", "More"]
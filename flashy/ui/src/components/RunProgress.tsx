@@ -21,7 +21,7 @@ const BorderLinearProgress = styled(LinearProgress)(({ theme }) => ({
 }));
 
 export type RunProgressProps = {
-    value: number | "failed" | "launching" | "stopped" | "succeeded";
+    value: number | "queued" | "failed" | "launching" | "stopped" | "succeeded";
     id: string;
     lightningState: any;
     updateLightningState: (newState: any) => void;
@@ -42,7 +42,18 @@ const RunProgress = React.forwardRef(
             }
         }
 
-        if (value == "launching") {
+        if (value == "queued") {
+            return (
+                <Box sx={{display: "flex", alignItems: "center", height:"20px"}}>
+                    <Box sx={{width: "100%", mr: 1}}>
+                        <Typography variant="body2" color="text.secondary">Queued</Typography>
+                    </Box>
+                    <Box>
+                        <IconButton onClick={stopRun}><CancelIcon sx={{ fontSize: 16 }}/></IconButton>
+                    </Box>
+                </Box>
+            );
+        } else if (value == "launching") {
             return (
                 <BorderLinearProgress/>
             );
@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import pytest
+
+
+class LocalDrive:
+    """A stand-in for a ``Drive`` backed by a local directory, with the same semantics: paths are relative to the
+    current directory and getting a missing file raises a bare exception. The paths it was asked to get are recorded
+    in ``downloads``, and the number of listings in ``num_lists``.
+
+    With ``shared``, the files already in the directory are considered put by another component, and cannot be put
+    again (a ``Drive`` raises for them unless it allows duplicates)."""
+
+    def __init__(self, root: str, shared: bool = False):
+        self.local_root = root
+        self.shared = shared
+        self.downloads = []
+        self.num_lists = 0
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, path: str):
+        drive_path = os.path.join(self.local_root, path)
+        if self.shared and os.path.exists(drive_path):
+            raise Exception(f"The file {path} can't be added as already found in the Drive.")
+        os.makedirs(os.path.dirname(drive_path), exist_ok=True)
+        shutil.copy(path, drive_path)
+
+    def get(self, path: str):
+        self.downloads.append(path)
+        drive_path = os.path.join(self.local_root, path)
+        if not os.path.exists(drive_path):
+            raise Exception(f"We didn't find any match for the associated {path}.")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shutil.copy(drive_path, path)
+
+    def list(self, path: str = "."):
+        self.num_lists += 1
+        dir_path = os.path.join(self.local_root, path)
+        if not os.path.isdir(dir_path):
+            return []
+        return [os.path.join(path, name) for name in os.listdir(dir_path)]
+
+    def add(self, path: str, content: bytes = b""):
+        """Adds a file to the directory, as if another component put it."""
+        drive_path = os.path.join(self.local_root, path)
+        os.makedirs(os.path.dirname(drive_path), exist_ok=True)
+        with open(drive_path, "wb") as f:
+            f.write(content)
+
+
+@pytest.fixture
+def drive(tmp_path):
+    return LocalDrive(str(tmp_path / "drive"))
+
+
+@pytest.fixture
+def shared_drive(tmp_path):
+    return LocalDrive(str(tmp_path / "drive"), shared=True)
+
+
+@pytest.fixture
+def lightning_drive(tmp_path):
+    """A ``LocalDrive`` which is also a ``Drive``, for the works which keep their Drive in their state."""
+    from lightning.app.storage import Drive
+
+    class LightningLocalDrive(LocalDrive, Drive):
+        def __init__(self, root: str):
+            Drive.__init__(self, "lit://test")
+            LocalDrive.__init__(self, root)
+
+    return LightningLocalDrive(str(tmp_path / "drive"))
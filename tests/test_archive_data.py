@@ -0,0 +1,37 @@
+import pytest
+
+from flashy.components import tasks
+from flashy.components.archive_data import build_archive_datamodule, list_folder, supports_archive
+from flashy.components.archive_index import ArchiveIndex
+
+_NAMES = [
+    "data/",
+    "data/train/",
+    "data/train/ants/0.jpg",
+    "data/train/bees/0.jpg",
+    "data/train/bees/1.jpg",
+    "data/train/README.md",
+    "data/val/ants/0.jpg",
+    "data/training/ants/0.jpg",
+]
+
+
+def test_list_folder():
+    index = ArchiveIndex(_NAMES, [0] * len(_NAMES), [name.endswith("/") for name in _NAMES])
+    assert list_folder(index, "data/train/") == (
+        ["data/train/ants/0.jpg", "data/train/bees/0.jpg", "data/train/bees/1.jpg"],
+        ["ants", "bees", "bees"],
+    )
+    assert list_folder(index, "./data/val") == (["data/val/ants/0.jpg"], ["ants"])
+    assert list_folder(index, "data/test") == ([], [])
+
+
+def test_supports_archive():
+    assert supports_archive(tasks.image_classification, {"target": "from_folders", "train_folder": "data/train"})
+    assert not supports_archive(tasks.image_classification, {"target": "from_csv"})
+    assert not supports_archive(tasks.text_classification, {"target": "from_folders"})
+
+
+def test_build_archive_datamodule_unsupported_target():
+    with pytest.raises(ValueError, match="Unsupported data config target for an archive: from_csv"):
+        build_archive_datamodule(tasks.image_classification, {"target": "from_csv"}, reader=None)
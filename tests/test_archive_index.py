@@ -0,0 +1,114 @@
+import io
+import json
+import pickle
+import tarfile
+import zipfile
+
+import pytest
+
+from flashy.components.archive_index import ArchiveIndex, ArchiveReader, LRUCache, open_archive
+
+_MEMBERS = {
+    "data/train/ants/0.jpg": b"ant",
+    "data/train/bees/0.JPG": b"bees",
+    "data/train.csv": b"a,b",
+}
+
+
+def _make_zip(path):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, content in _MEMBERS.items():
+            zf.writestr(name, content)
+
+
+def _make_deflated_zip(path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _MEMBERS.items():
+            zf.writestr(name, content * 100)
+
+
+def _make_tar(path, mode="w:gz"):
+    with tarfile.open(path, mode) as tf:
+        for name, content in _MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tf.addfile(info, io.BytesIO(content))
+
+
+def _make_uncompressed_tar(path):
+    _make_tar(path, mode="w")
+
+
+@pytest.mark.parametrize("make_archive", [_make_zip, _make_tar])
+def test_archive_index(tmp_path, make_archive):
+    archive_path = str(tmp_path / "archive")
+    make_archive(archive_path)
+
+    index = ArchiveIndex.build(archive_path)
+    index.save(str(tmp_path / "archive.index"))
+    index = ArchiveIndex.load(str(tmp_path / "archive.index"))
+
+    assert index.get_names() == list(_MEMBERS)
+    assert index.sizes == [len(content) for content in _MEMBERS.values()]
+    assert index.get_names(".jpg") == ["data/train/ants/0.jpg", "data/train/bees/0.JPG"]
+    assert index.get_names("csv") == ["data/train.csv"]
+    assert index.get_dirnames() == ["data", "data/train/ants", "data/train/bees"]
+
+
+@pytest.mark.parametrize(
+    "make_archive, repeats", [(_make_zip, 1), (_make_deflated_zip, 100), (_make_uncompressed_tar, 1)]
+)
+def test_archive_reader(tmp_path, make_archive, repeats):
+    archive_path = str(tmp_path / "archive")
+    make_archive(archive_path)
+
+    reader = ArchiveReader(archive_path)
+    for name, content in _MEMBERS.items():
+        assert name in reader
+        assert reader.read(name) == content * repeats
+    assert reader.open("data/train.csv").read() == b"a,b" * repeats
+
+    # A reader sent to another process maps the archive again
+    reader = pickle.loads(pickle.dumps(reader))
+    assert reader.read("data/train/ants/0.jpg") == b"ant" * repeats
+    reader.close()
+
+
+def test_archive_reader_compressed_tar(tmp_path):
+    archive_path = str(tmp_path / "archive")
+    _make_tar(archive_path)
+    assert not ArchiveIndex.build(archive_path).is_random_access
+    with pytest.raises(ValueError, match="Compressed tar archives are not supported"):
+        ArchiveReader(archive_path)
+
+
+def test_open_archive_rebuilds_index_without_offsets(tmp_path):
+    archive_path = str(tmp_path / "archive")
+    _make_zip(archive_path)
+    index_path = archive_path + ".index"
+    # An index saved before the offsets were indexed
+    with open(index_path, "w") as f:
+        json.dump({"names": list(_MEMBERS), "sizes": [0, 0, 0], "is_dir": [False, False, False]}, f)
+    assert not ArchiveIndex.load(index_path).is_random_access
+
+    reader = open_archive(archive_path)
+    assert reader.read("data/train/bees/0.JPG") == b"bees"
+    assert ArchiveIndex.load(index_path).is_random_access
+    assert open_archive(archive_path).index.offsets == reader.index.offsets
+
+
+def test_not_an_archive(tmp_path):
+    (tmp_path / "file.txt").write_text("hello")
+    with pytest.raises(ValueError, match="Cannot open archive file!"):
+        ArchiveIndex.build(str(tmp_path / "file.txt"))
+
+
+def test_lru_cache():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from flashy.components.backbone_cache import BackboneCache, get_backbone_key
+
+
+def fake_fetch(cache, name, calls):
+    """Writes the files a torch hub or Hugging Face download of ``name`` would write to the caches of ``cache``."""
+
+    def fetch():
+        calls.append(name)
+        torch_dir = os.path.join(cache.environ["TORCH_HOME"], "hub", "checkpoints")
+        os.makedirs(torch_dir, exist_ok=True)
+        with open(os.path.join(torch_dir, f"{name}.pth"), "wb") as f:
+            f.write(name.encode())
+
+        # The Hugging Face cache keeps the content in blobs, linked from the snapshots
+        model_dir = os.path.join(cache.environ["HF_HOME"], "hub", f"models--{name}")
+        os.makedirs(os.path.join(model_dir, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(model_dir, "snapshots", "abc"), exist_ok=True)
+        os.makedirs(os.path.join(cache.environ["HF_HOME"], "hub", ".locks"), exist_ok=True)
+        with open(os.path.join(model_dir, "blobs", "123"), "w") as f:
+            f.write("{}")
+        with open(os.path.join(cache.environ["HF_HOME"], "hub", ".locks", "123.lock"), "w") as f:
+            f.write("")
+        os.symlink(os.path.join("..", "..", "blobs", "123"), os.path.join(model_dir, "snapshots", "abc", "config.json"))
+
+    return fetch
+
+
+def test_backbone_key():
+    assert get_backbone_key("text_classification", "prajjwal1/bert-tiny").startswith(
+        "text_classification-prajjwal1--bert-tiny-v"
+    )
+    assert get_backbone_key("image_classification", "resnet18") != get_backbone_key("image_classification", "resnet50")
+
+
+def test_backbones_are_fetched_once_and_shared_through_the_drive(drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    cache = BackboneCache(drive, root=str(tmp_path / "work_0"))
+    key = get_backbone_key("text_classification", "bert")
+    assert not cache.seed(key, fake_fetch(cache, "bert", calls))
+    assert cache.seed(key, fake_fetch(cache, "bert", calls))
+    assert calls == ["bert"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Another work seeds its caches from the Drive, without fetching the backbone
+    other = BackboneCache(drive, root=str(tmp_path / "work_1"))
+    assert other.seed(key, fake_fetch(other, "bert", calls))
+    assert calls == ["bert"]
+    assert (other.hits, other.misses) == (1, 0)
+    with open(os.path.join(other.environ["TORCH_HOME"], "hub", "checkpoints", "bert.pth")) as f:
+        assert f.read() == "bert"
+    snapshot = os.path.join(other.environ["HF_HOME"], "hub", "models--bert", "snapshots", "abc", "config.json")
+    with open(snapshot) as f:
+        assert f.read() == "{}"
+    # Only the snapshots are shared, not the blobs they link to nor the lock files
+    assert not os.path.exists(os.path.join(other.environ["HF_HOME"], "hub", "models--bert", "blobs"))
+    assert not os.path.exists(os.path.join(other.environ["HF_HOME"], "hub", ".locks"))
+    assert not os.path.exists(os.path.join("backbones", key))
+
+    # Only the files added by the fetch of a backbone are part of its entry
+    resnet_key = get_backbone_key("image_classification", "resnet")
+    assert not cache.seed(resnet_key, fake_fetch(cache, "resnet", calls))
+    assert other.seed(resnet_key, fake_fetch(other, "resnet", calls))
+    assert calls == ["bert", "resnet"]
+    assert sorted(os.listdir(tmp_path / "drive" / "backbones" / resnet_key / "torch" / "hub" / "checkpoints")) == [
+        "resnet.pth"
+    ]
+
+
+def test_failed_fetches_are_not_cached(drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = BackboneCache(drive, root=str(tmp_path / "work"))
+
+    def fetch():
+        raise ConnectionError("offline")
+
+    key = get_backbone_key("image_classification", "resnet18")
+    with pytest.raises(ConnectionError):
+        cache.seed(key, fetch)
+    assert not os.path.exists(tmp_path / "drive" / "backbones" / key / "manifest.json")
+    assert not os.path.exists(os.path.join(cache.root, "manifests", f"{key}.json"))
+
+
+def test_backbones_fetched_by_concurrent_works_are_kept(shared_drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    key = get_backbone_key("image_classification", "resnet")
+
+    cache = BackboneCache(shared_drive, root=str(tmp_path / "work_0"))
+    assert not cache.seed(key, fake_fetch(cache, "resnet", calls))
+    # Another work misses the backbone while the first one is uploading it (its manifest is uploaded last)
+    os.remove(tmp_path / "drive" / "backbones" / key / "manifest.json")
+
+    other = BackboneCache(shared_drive, root=str(tmp_path / "work_1"))
+    assert not other.seed(key, fake_fetch(other, "resnet", calls))
+    assert calls == ["resnet", "resnet"]
+    assert os.path.exists(tmp_path / "drive" / "backbones" / key / "manifest.json")
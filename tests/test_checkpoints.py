@@ -0,0 +1,111 @@
+import json
+import struct
+
+import pytest
+import torch
+
+from flashy.components import checkpoints
+from flashy.components.checkpoints import (
+    get_checkpoint_filename,
+    is_weights_checkpoint,
+    load_weights,
+    load_weights_model,
+    save_weights,
+)
+
+
+class Model(torch.nn.Module):
+    def __init__(self, num_classes: int = 3, pretrained: bool = True):
+        super().__init__()
+        self.hparams = {"num_classes": num_classes, "pretrained": pretrained, "loss_fn": torch.nn.functional.mse_loss}
+        self.pretrained = pretrained
+        self.linear = torch.nn.Linear(5, num_classes)
+        self.norm = torch.nn.BatchNorm1d(num_classes)
+
+
+def test_checkpoint_filename():
+    assert get_checkpoint_filename("run_0") == "run_0_checkpoint.pt"
+    assert get_checkpoint_filename("run_0", "weights") == "run_0_checkpoint.safetensors"
+    assert is_weights_checkpoint("checkpoints/run_0_checkpoint.safetensors")
+    assert not is_weights_checkpoint("checkpoints/run_0_checkpoint.pt")
+    with pytest.raises(ValueError, match="Unknown checkpoint format"):
+        get_checkpoint_filename("run_0", "onnx")
+
+
+def test_save_and_load_weights(tmp_path):
+    model = Model()
+    path = str(tmp_path / "model.safetensors")
+    size = save_weights(model, path, chunk_size=7)
+
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    assert (8 + header_size) % 8 == 0
+    assert header["linear.weight"] == {"dtype": "F32", "shape": [3, 5], "data_offsets": [0, 60]}
+    # The data of the next tensor starts aligned
+    assert header["linear.bias"]["data_offsets"] == [64, 76]
+    assert header["norm.num_batches_tracked"]["dtype"] == "I64"
+    assert json.loads(header["__metadata__"]["hparams"]) == {"num_classes": 3, "pretrained": True}
+    assert size == 8 + header_size + header["norm.num_batches_tracked"]["data_offsets"][1]
+
+    tensors, metadata = load_weights(path)
+    assert metadata["task_class"].endswith("Model")
+    for name, tensor in model.state_dict().items():
+        assert tensors[name].dtype == tensor.dtype
+        assert torch.equal(tensors[name], tensor)
+
+
+def test_save_weights_casts_floating_point_weights(tmp_path):
+    model = Model()
+    path = str(tmp_path / "model.safetensors")
+    save_weights(model, path, dtype="float16")
+
+    tensors, _ = load_weights(path)
+    assert tensors["linear.weight"].dtype == torch.float16
+    assert tensors["norm.num_batches_tracked"].dtype == torch.int64
+    assert torch.allclose(tensors["linear.weight"].float(), model.linear.weight, atol=1e-3)
+
+    with pytest.raises(ValueError, match="Unknown checkpoint dtype"):
+        save_weights(model, path, dtype="int4")
+
+
+def test_load_weights_model_is_zero_copy(tmp_path):
+    model = Model(num_classes=4)
+    path = str(tmp_path / "model.safetensors")
+    save_weights(model, path)
+
+    loaded = load_weights_model(Model, path)
+    assert not loaded.training
+    # The backbone is built without its pretrained weights
+    assert loaded.pretrained is False
+    assert torch.equal(loaded.linear.weight, model.linear.weight)
+
+    # The weights are used in place from the memory map of the checkpoint, so they are laid out as in the file
+    assert loaded.linear.bias.data_ptr() - loaded.linear.weight.data_ptr() == 4 * 5 * 4
+
+
+def test_load_weights_model_copies_without_assign(tmp_path, monkeypatch):
+    # torch < 2.1 cannot assign the tensors of the state dict to the module
+    monkeypatch.setattr(checkpoints, "_supports_assign", lambda: False)
+    model = Model()
+    path = str(tmp_path / "model.safetensors")
+    save_weights(model, path)
+
+    class RecordingModel(Model):
+        def load_state_dict(self, state_dict, **kwargs):
+            self.load_kwargs = kwargs
+            return super().load_state_dict(state_dict, **kwargs)
+
+    loaded = load_weights_model(RecordingModel, path)
+    assert loaded.load_kwargs == {}
+    assert torch.equal(loaded.linear.weight, model.linear.weight)
+
+
+def test_load_weights_model_casts_to_the_model_dtype(tmp_path):
+    model = Model()
+    path = str(tmp_path / "model.safetensors")
+    save_weights(model, path, dtype="bfloat16")
+
+    loaded = load_weights_model(Model, path)
+    assert loaded.linear.weight.dtype == torch.float32
+    assert torch.allclose(loaded.linear.weight, model.linear.weight, atol=1e-2)
@@ -0,0 +1,271 @@
+import json
+import os
+import shutil
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+from flashy.components import dataset_cache
+from flashy.components.dataset_cache import DatasetCache, extract_archive, get_archive_members, resolve_paths
+from flashy.components.stage_timer import StageTimer
+
+
+def _upload_dataset(drive, tmp_path, name, sha256):
+    archive_path = tmp_path / f"{name}.zip"
+    with zipfile.ZipFile(archive_path, "w") as zf:
+        zf.writestr("data/train/ants/0.jpg", b"ant")
+        zf.writestr("data/train/bees/0.jpg", b"bee")
+
+    drive_path = os.path.join(drive.local_root, name)
+    shutil.copy(archive_path, drive_path)
+    with open(drive_path + ".meta", "w") as f:
+        json.dump({"original_path": f"{name}.zip", "drive_path": name, "sha256": sha256}, f)
+    return os.path.getsize(archive_path)
+
+
+@pytest.fixture
+def drive(drive, tmp_path, monkeypatch):
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    return drive
+
+
+@pytest.fixture
+def extractions(monkeypatch):
+    calls = []
+    extract_archive = dataset_cache.extract_archive
+
+    def counting_extract_archive(file_path, output_dir, **kwargs):
+        calls.append(file_path)
+        extract_archive(file_path, output_dir, **kwargs)
+
+    monkeypatch.setattr(dataset_cache, "extract_archive", counting_extract_archive)
+    return calls
+
+
+def test_second_run_does_no_download_and_no_extraction(drive, extractions, tmp_path):
+    _upload_dataset(drive, tmp_path, "abc", sha256="1234")
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+
+    first_view = cache.view("abc", str(tmp_path / "run_1"))
+    assert drive.downloads == ["abc.meta", "abc"]
+    assert len(extractions) == 1
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    second_view = cache.view("abc", str(tmp_path / "run_2"))
+    assert drive.downloads == ["abc.meta", "abc"]
+    assert len(extractions) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    for view in (first_view, second_view):
+        with open(os.path.join(view, "data", "train", "ants", "0.jpg"), "rb") as f:
+            assert f.read() == b"ant"
+    assert os.path.realpath(os.path.join(first_view, "data")) == os.path.realpath(os.path.join(second_view, "data"))
+
+
+def test_new_cache_instance_reuses_extracted_dataset(drive, extractions, tmp_path):
+    _upload_dataset(drive, tmp_path, "abc", sha256="1234")
+    DatasetCache(drive, root=str(tmp_path / "cache")).get("abc")
+
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+    cache.get("abc")
+    # Only the meta file is fetched again, never the archive
+    assert drive.downloads.count("abc") == 1
+    assert len(extractions) == 1
+    assert cache.hits == 1
+
+
+def test_download_and_extraction_are_timed(drive, tmp_path):
+    _upload_dataset(drive, tmp_path, "abc", sha256="1234")
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+
+    timer = StageTimer()
+    cache.view("abc", str(tmp_path / "run_1"), timer=timer)
+    assert [stage["name"] for stage in timer.stages] == ["download", "extract"]
+
+    timer.reset()
+    cache.view("abc", str(tmp_path / "run_2"), timer=timer)
+    assert timer.stages == []
+
+
+def test_lru_eviction(drive, tmp_path):
+    size = _upload_dataset(drive, tmp_path, "a", sha256="a" * 64)
+    _upload_dataset(drive, tmp_path, "b", sha256="b" * 64)
+    _upload_dataset(drive, tmp_path, "c", sha256="c" * 64)
+
+    # Room for two entries (archive and extracted files) but not three
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"), max_bytes=int(2.5 * (size + 6)))
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    os.utime(os.path.join(cache.get_entry_dir("b"), "last_used"), (0, 0))
+    cache.get("c")
+
+    assert os.path.exists(cache.get_entry_dir("a"))
+    assert not os.path.exists(cache.get_entry_dir("b"))
+    assert os.path.exists(cache.get_entry_dir("c"))
+
+
+def test_extracted_datasets_are_read_only(drive, tmp_path):
+    _upload_dataset(drive, tmp_path, "abc", sha256="1234")
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+    extracted_dir = cache.get("abc")
+
+    paths = [dirpath for dirpath, _, _ in os.walk(extracted_dir)]
+    paths += [os.path.join(dirpath, name) for dirpath, _, filenames in os.walk(extracted_dir) for name in filenames]
+    assert len(paths) == 7
+    assert not any(os.stat(path).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH) for path in paths)
+
+    # The write permissions are restored before the entry is evicted
+    dataset_cache._remove(cache.get_entry_dir("abc"))
+    assert not os.path.exists(cache.get_entry_dir("abc"))
+
+
+def test_resolve_paths():
+    data_config = {"target": "from_folders", "train_folder": "data/train", "val_folder": "", "input_field": "text"}
+    assert resolve_paths(data_config, "/view") == {
+        "target": "from_folders",
+        "train_folder": os.path.join("/view", "data/train"),
+        "val_folder": "",
+        "input_field": "text",
+    }
+
+
+def test_get_archive_members():
+    data_config = {"target": "from_csv", "train_file": "imdb/train.csv", "val_file": "./imdb/valid.csv", "val_split": 0}
+    assert get_archive_members(data_config) == ["imdb/train.csv", "imdb/valid.csv"]
+    assert get_archive_members({"target": "from_folders", "train_folder": "data/train/", "val_folder": ""}) == [
+        "data/train"
+    ]
+    assert get_archive_members({"target": "from_folders", "train_folder": "./"}) is None
+    assert get_archive_members({"target": "from_folders"}) is None
+
+
+def _list_files(root):
+    return sorted(
+        os.path.relpath(os.path.join(dirpath, filename), root)
+        for dirpath, _, filenames in os.walk(root)
+        for filename in filenames
+    )
+
+
+def _write_archive_files(add):
+    for split in ("train", "train_extra", "val"):
+        for index in range(600):
+            add(f"data/{split}/{index % 3}/{index}.jpg", f"{split} {index}".encode())
+    add("README.md", b"readme")
+
+
+@pytest.mark.parametrize("num_workers", [1, 4])
+def test_extract_zip_members(tmp_path, num_workers):
+    archive_path = str(tmp_path / "data.zip")
+    with zipfile.ZipFile(archive_path, "w") as zf:
+        _write_archive_files(zf.writestr)
+
+    output_dir = str(tmp_path / "out")
+    extract_archive(archive_path, output_dir, members=["data/train", "README.md"], num_workers=num_workers)
+
+    files = _list_files(output_dir)
+    assert len(files) == 601
+    assert "README.md" in files
+    assert all(file == "README.md" or file.startswith(os.path.join("data", "train", "")) for file in files)
+    with open(os.path.join(output_dir, "data", "train", "1", "4.jpg"), "rb") as f:
+        assert f.read() == b"train 4"
+
+
+def test_extract_zip_rejects_members_outside_of_the_output_dir(tmp_path):
+    archive_path = str(tmp_path / "data.zip")
+    with zipfile.ZipFile(archive_path, "w") as zf:
+        zf.writestr("data/0.jpg", b"0")
+        zf.writestr("../escaped/0.jpg", b"0")
+
+    with pytest.raises(ValueError, match="Unsafe member path"):
+        extract_archive(archive_path, str(tmp_path / "out"))
+    # Nothing was written, not even the directories of the safe members
+    assert not os.path.exists(tmp_path / "escaped")
+    assert not os.path.exists(tmp_path / "out" / "data")
+
+
+def test_extract_tar_members(tmp_path):
+    archive_path = str(tmp_path / "data.tar.gz")
+    with tarfile.open(archive_path, "w:gz") as tf:
+
+        def add(name, data):
+            path = tmp_path / "src" / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            tf.add(str(path), arcname=name)
+
+        _write_archive_files(add)
+
+    output_dir = str(tmp_path / "out")
+    extract_archive(archive_path, output_dir, members=["data/val"])
+    files = _list_files(output_dir)
+    assert len(files) == 600
+    assert all(file.startswith(os.path.join("data", "val", "")) for file in files)
+
+    extract_archive(archive_path, str(tmp_path / "all"))
+    assert len(_list_files(str(tmp_path / "all"))) == 1801
+
+
+def test_members_are_cached_separately(drive, extractions, tmp_path):
+    _upload_dataset(drive, tmp_path, "abc", sha256="1234")
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+
+    ants_view = cache.view("abc", str(tmp_path / "run_1"), members=["data/train/ants"])
+    assert os.path.exists(os.path.join(ants_view, "data", "train", "ants", "0.jpg"))
+    assert not os.path.exists(os.path.join(ants_view, "data", "train", "bees"))
+
+    cache.view("abc", str(tmp_path / "run_2"), members=["data/train/ants"])
+    assert len(extractions) == 1
+
+    full_view = cache.view("abc", str(tmp_path / "run_3"))
+    assert os.path.exists(os.path.join(full_view, "data", "train", "bees", "0.jpg"))
+    # The archive is downloaded once and extracted once per set of members
+    assert drive.downloads.count("abc") == 1
+    assert len(extractions) == 2
+
+
+def test_get_archive_does_not_extract(drive, extractions, tmp_path):
+    _upload_dataset(drive, tmp_path, "abc", sha256="1234")
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+
+    timer = StageTimer()
+    archive_path, index = cache.get_archive("abc", timer=timer)
+    assert [stage["name"] for stage in timer.stages] == ["download", "index"]
+    assert index.is_random_access
+    assert os.path.exists(archive_path + ".index")
+    assert extractions == []
+
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"))
+    assert cache.get_archive("abc")[0] == archive_path
+    assert drive.downloads.count("abc") == 1
+    assert cache.hits == 1
+
+
+def test_datasets_with_views_are_not_evicted(drive, tmp_path):
+    size = _upload_dataset(drive, tmp_path, "a", sha256="a" * 64)
+    _upload_dataset(drive, tmp_path, "b", sha256="b" * 64)
+    _upload_dataset(drive, tmp_path, "c", sha256="c" * 64)
+
+    # Room for one entry (archive and extracted files) but not two
+    cache = DatasetCache(drive, root=str(tmp_path / "cache"), max_bytes=int(1.5 * (size + 6)))
+    view_dir = cache.view("a", str(tmp_path / "run_a"))
+    # Another process sharing the cache evicts the least recently used entries
+    other = DatasetCache(drive, root=str(tmp_path / "cache"), max_bytes=cache.max_bytes)
+    other.get("b")
+    assert os.path.exists(cache.get_entry_dir("a"))
+
+    cache.release("a", view_dir)
+    assert not os.path.exists(view_dir)
+    other.get("c")
+    assert not os.path.exists(cache.get_entry_dir("a"))
+
+    # The views whose directory was removed without releasing them do not hold their dataset
+    view_dir = cache.view("b", str(tmp_path / "run_b"))
+    shutil.rmtree(view_dir)
+    other.get("a")
+    assert not os.path.exists(cache.get_entry_dir("b"))
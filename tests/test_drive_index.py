@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from flashy.components.drive_index import DriveIndex, put_shared, try_get
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_hits_do_not_list(drive):
+    drive.add("a")
+    drive.add("a.meta")
+    index = DriveIndex(drive, clock=FakeClock())
+
+    assert index.contains("./a")
+    assert index.contains("a.meta")
+    assert index.contains("a")
+    assert drive.num_lists == 1
+
+
+def test_added_paths_do_not_list(drive):
+    index = DriveIndex(drive, clock=FakeClock())
+    index.add("./b")
+
+    assert index.contains("b")
+    assert drive.num_lists == 0
+
+
+def test_negative_results_are_cached_until_ttl(drive):
+    drive.add("a")
+    clock = FakeClock()
+    index = DriveIndex(drive, ttl=5.0, clock=clock)
+
+    assert not index.contains("checkpoint.pt")
+    assert not index.contains("checkpoint.pt")
+    assert drive.num_lists == 1
+
+    # Put by another component
+    drive.add("checkpoint.pt")
+    assert not index.contains("checkpoint.pt")
+
+    clock.time = 5.0
+    assert index.contains("checkpoint.pt")
+    assert drive.num_lists == 2
+
+
+def test_directories_are_listed_separately(drive):
+    drive.add("a")
+    drive.add("dir/b")
+    index = DriveIndex(drive, clock=FakeClock())
+
+    assert index.contains("dir/b")
+    assert not index.contains("dir/a")
+    assert index.contains("a")
+    assert drive.num_lists == 2
+
+
+def test_try_get(shared_drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shared_drive.add("a")
+    assert try_get(shared_drive, "a")
+    assert not try_get(shared_drive, "b")
+    assert os.path.exists("a") and not os.path.exists("b")
+
+    def get(path):
+        raise Exception("Connection refused")
+
+    shared_drive.get = get
+    with pytest.raises(Exception, match="Connection refused"):
+        try_get(shared_drive, "a")
+
+
+def test_put_shared_keeps_the_files_put_by_other_components(shared_drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shared_drive.add("a", b"other")
+    for path in ("a", "b"):
+        with open(path, "wb") as f:
+            f.write(b"own")
+        put_shared(shared_drive, path)
+
+    assert sorted(os.listdir(shared_drive.local_root)) == ["a", "b"]
+    with open(os.path.join(shared_drive.local_root, "a"), "rb") as f:
+        assert f.read() == b"other"
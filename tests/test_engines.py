@@ -0,0 +1,51 @@
+import dataclasses
+
+import pytest
+
+from flashy.components.engines import build_datamodule, build_model, fetch_backbone
+from flashy.components.tasks import TaskMeta
+
+
+class FakeData:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.num_classes = 3
+
+    @classmethod
+    def from_folders(cls, **kwargs):
+        return cls(target="from_folders", **kwargs)
+
+
+class FakeTask:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+fake_task = TaskMeta(__name__, "FakeData", __name__, "FakeTask", ["num_classes"], "val_accuracy", False, False, [])
+
+
+def test_build_datamodule_calls_target():
+    data_config = {"target": "from_folders", "train_folder": 'data/"quoted"\\folder'}
+    datamodule = build_datamodule(fake_task, data_config, batch_size=8)
+    assert datamodule.kwargs == {"target": "from_folders", "train_folder": 'data/"quoted"\\folder', "batch_size": 8}
+    # The data config is not modified
+    assert data_config["target"] == "from_folders"
+
+
+def test_build_datamodule_unknown_target():
+    with pytest.raises(AttributeError):
+        build_datamodule(fake_task, {"target": "from_nothing"})
+
+
+def test_build_model_links_attributes():
+    datamodule = build_datamodule(fake_task, {"target": "from_folders"})
+    model = build_model(fake_task, {"backbone": "resnet18", "learning_rate": 0.01}, datamodule)
+    assert model.kwargs == {"backbone": "resnet18", "learning_rate": 0.01, "num_classes": 3}
+
+
+def test_fetch_backbone_builds_the_task_with_two_classes(monkeypatch):
+    built = []
+    monkeypatch.setattr(FakeTask, "__init__", lambda self, **kwargs: built.append(kwargs))
+    task_meta = dataclasses.replace(fake_task, linked_attributes=["labels", "multi_label"])
+    fetch_backbone(task_meta, "resnet18")
+    assert built == [{"backbone": "resnet18", "num_classes": 2}]
@@ -0,0 +1,55 @@
+import pytest
+
+from flashy.fidelity import FULL, PERFORMANCE_PRESETS, SCREENING, is_screening_done, promote, select_promoted
+
+
+def make_result(run_id, progress, monitor=None, stage=SCREENING):
+    run = {
+        "id": run_id,
+        "stage": stage,
+        "model_config": {"backbone": "resnet18"},
+        "trainer_config": {"limit_train_batches": 0.1, "val_check_interval": 0.25},
+    }
+    return {"run": run, "progress": progress, "monitor": monitor}
+
+
+@pytest.mark.parametrize("performance", ["medium", "high"])
+def test_presets_cost_about_the_same(performance):
+    preset = PERFORMANCE_PRESETS[performance]
+    cost = preset["screen"] * preset["fraction"] + preset["promote"]
+    assert cost == pytest.approx(preset["count"], rel=0.2)
+    assert preset["screen"] > preset["count"]
+
+
+def test_is_screening_done():
+    sweep_results = {"a": make_result("a", "succeeded", 0.5), "b": make_result("b", 0.5)}
+    assert not is_screening_done(sweep_results)
+
+    sweep_results["b"] = make_result("b", "failed")
+    sweep_results["c"] = make_result("c", 0.5, stage=FULL)
+    assert is_screening_done(sweep_results)
+
+
+def test_select_promoted():
+    sweep_results = {
+        "a": make_result("a", "succeeded", 0.5),
+        "b": make_result("b", "succeeded", 0.9),
+        "c": make_result("c", "stopped"),
+        "d": make_result("d", "succeeded", 0.7),
+        "e": make_result("e", "succeeded", 1.0, stage=FULL),
+    }
+    assert [run["id"] for run in select_promoted(sweep_results, 2)] == ["b", "d"]
+    assert [run["id"] for run in select_promoted(sweep_results, 2, mode="min")] == ["a", "d"]
+    assert [run["id"] for run in select_promoted(sweep_results, 10)] == ["b", "d", "a"]
+
+
+def test_promote():
+    run = make_result("a", "succeeded", 0.5)["run"]
+    promoted = promote(run, "b")
+
+    assert promoted["id"] == "b"
+    assert promoted["stage"] == FULL
+    assert promoted["trainer_config"] == {"val_check_interval": 0.25}
+    assert promoted["model_config"] == run["model_config"]
+    assert promoted["model_config"] is not run["model_config"]
+    assert run["stage"] == SCREENING
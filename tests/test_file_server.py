@@ -0,0 +1,183 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from flashy.components.file_server import FileServer
+
+
+@pytest.fixture
+def drive(lightning_drive, tmp_path, monkeypatch):
+    # The Drive paths are relative to the current directory
+    monkeypatch.chdir(tmp_path)
+    return lightning_drive
+
+
+@pytest.fixture
+def client(drive):
+    server = FileServer(drive, base_dir="files", chunk_size=1024)
+    return server._create_app().test_client()
+
+
+def test_upload_file(client, drive):
+    payload = os.urandom(10_000)
+    response = client.post(
+        "/uploadfile/",
+        data={"file": (io.BytesIO(payload), "data.zip")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    meta = response.json
+    assert meta["original_path"] == "data.zip"
+    assert meta["size"] == len(payload)
+    assert meta["sha256"] == hashlib.sha256(payload).hexdigest()
+    with open(os.path.join(drive.local_root, "files", meta["drive_path"]), "rb") as f:
+        assert f.read() == payload
+
+
+def test_resumable_upload(client, drive):
+    payload = os.urandom(10_000)
+
+    upload_id = client.post("/uploads/", json={"filename": "data.zip", "size": len(payload)}).json["upload_id"]
+
+    # Chunks can be sent in any order
+    for offset in (6000, 0, 3000):
+        response = client.put(f"/uploads/{upload_id}/?offset={offset}", data=payload[offset : offset + 3000])
+        assert response.status_code == 200
+    assert client.get(f"/uploads/{upload_id}/").json["received"] == [[0, 9000]]
+
+    response = client.post(f"/uploads/{upload_id}/finalize/")
+    assert response.status_code == 409
+
+    client.put(f"/uploads/{upload_id}/?offset=9000", data=payload[9000:])
+    assert client.get(f"/uploads/{upload_id}/").json["received"] == [[0, len(payload)]]
+
+    meta = client.post(f"/uploads/{upload_id}/finalize/").json
+    assert meta["sha256"] == hashlib.sha256(payload).hexdigest()
+    with open(os.path.join(drive.local_root, "files", meta["drive_path"] + ".meta")) as f:
+        assert json.load(f) == meta
+
+
+def test_resumable_upload_out_of_bounds(client):
+    upload_id = client.post("/uploads/", json={"filename": "data.zip", "size": 10}).json["upload_id"]
+    assert client.put(f"/uploads/{upload_id}/?offset=5", data=b"0123456789").status_code == 416
+    assert client.get("/uploads/unknown/").status_code == 404
+
+
+def test_resumable_upload_requires_the_content_length(client):
+    upload_id = client.post("/uploads/", json={"filename": "data.zip", "size": 10}).json["upload_id"]
+    response = client.put(
+        f"/uploads/{upload_id}/?offset=0",
+        input_stream=io.BytesIO(b"0123456789"),
+        headers={"Transfer-Encoding": "chunked"},
+    )
+    assert response.status_code == 411
+    assert client.get(f"/uploads/{upload_id}/").json["received"] == []
+
+
+def test_malformed_upload_requests(client):
+    for params in (
+        {"filename": "data.zip", "size": -1},
+        {"filename": "data.zip", "size": "ten"},
+        {"filename": "a"},
+        {},
+    ):
+        assert client.post("/uploads/", json=params).status_code == 400
+    assert client.post("/uploads/", data={"filename": "data.zip", "size": "10"}).status_code == 200
+
+    response = client.post(
+        "/uploadfile/",
+        data={"other": (io.BytesIO(b"0123456789"), "data.zip")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
+
+
+def test_concurrent_finalize_stores_the_upload_once(client):
+    payload = os.urandom(10_000)
+    upload_id = client.post("/uploads/", json={"filename": "data.zip", "size": len(payload)}).json["upload_id"]
+    client.put(f"/uploads/{upload_id}/?offset=0", data=payload)
+
+    with ThreadPoolExecutor(4) as executor:
+        responses = list(executor.map(lambda _: client.post(f"/uploads/{upload_id}/finalize/"), range(4)))
+
+    status_codes = sorted(response.status_code for response in responses)
+    assert status_codes[0] == 200
+    assert all(status_code in (200, 404, 409) for status_code in status_codes)
+    assert status_codes.count(200) == 1
+    assert client.post(f"/uploads/{upload_id}/finalize/").status_code == 404
+
+
+def test_identical_uploads_are_deduplicated(client, drive):
+    payload = os.urandom(10_000)
+    sha256 = hashlib.sha256(payload).hexdigest()
+
+    assert client.get(f"/hash/{sha256}/").status_code == 404
+
+    first = client.post(
+        "/uploadfile/",
+        data={"file": (io.BytesIO(payload), "first.zip")},
+        content_type="multipart/form-data",
+    ).json
+    second = client.post(
+        "/uploadfile/",
+        data={"file": (io.BytesIO(payload), "second.zip")},
+        content_type="multipart/form-data",
+    ).json
+
+    assert first["drive_path"] == second["drive_path"] == sha256
+    assert second["display_name"] == "first"
+    assert second["aliases"] == ["second"]
+    assert sorted(os.listdir(os.path.join(drive.local_root, "files"))) == [sha256, sha256 + ".meta"]
+
+    assert client.get(f"/hash/{sha256}/").json == second
+    assert client.get("/hash/..%2F..%2Fetc/").status_code == 404
+
+
+def test_list_archive(client, tmp_path):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for index in range(5):
+            zf.writestr(f"data/train/{index}.jpg", b"image")
+        zf.writestr("data/train.csv", b"a,b")
+    archive.seek(0)
+
+    meta = client.post(
+        "/uploadfile/",
+        data={"file": (archive, "data.zip")},
+        content_type="multipart/form-data",
+    ).json
+
+    response = client.get(f"/listarchive/{meta['drive_path']}/jpg/?offset=1&limit=2").json
+    assert response == {"asset_names": ["data/train/1.jpg", "data/train/2.jpg"], "total": 5, "offset": 1}
+
+    assert client.get(f"/listsubdirs/{meta['drive_path']}/").json["asset_names"] == ["data", "data/train"]
+
+
+def test_get_file_conditional_and_range_requests(client):
+    payload = os.urandom(10_000)
+    meta = client.post(
+        "/uploadfile/",
+        data={"file": (io.BytesIO(payload), "checkpoint.pt")},
+        content_type="multipart/form-data",
+    ).json
+
+    response = client.get(f"/file/{meta['drive_path']}")
+    assert response.status_code == 200
+    assert response.data == payload
+    assert response.headers["ETag"] == f'"{meta["sha256"]}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert "immutable" in response.headers["Cache-Control"]
+
+    response = client.get(f"/file/{meta['drive_path']}", headers={"If-None-Match": f'"{meta["sha256"]}"'})
+    assert response.status_code == 304
+
+    response = client.get(f"/file/{meta['drive_path']}", headers={"Range": "bytes=1000-1999"})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 1000-1999/{len(payload)}"
+    assert response.data == payload[1000:2000]
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from flashy.components.inference_engine import InferenceEngine
+
+
+class FakeModel:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.batches = []
+
+    def __call__(self, inputs):
+        self.batches.append(list(inputs))
+        time.sleep(self.latency)
+        return [text.upper() for text in inputs]
+
+
+def predict_concurrently(engine, inputs):
+    results = [None] * len(inputs)
+    barrier = threading.Barrier(len(inputs))
+
+    def predict(index):
+        barrier.wait()
+        results[index] = engine.predict(inputs[index])
+
+    threads = [threading.Thread(target=predict, args=(index,)) for index in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_predict():
+    model = FakeModel()
+    with InferenceEngine(model) as engine:
+        assert engine.predict("a") == "A"
+    assert model.batches == [["a"]]
+
+
+def test_concurrent_requests_are_batched():
+    model = FakeModel(latency=0.05)
+    inputs = [f"text {index}" for index in range(16)]
+    with InferenceEngine(model, max_batch_size=8, max_wait=0.05) as engine:
+        assert predict_concurrently(engine, inputs) == [text.upper() for text in inputs]
+
+    assert len(model.batches) < len(inputs)
+    assert all(len(batch) <= 8 for batch in model.batches)
+    assert sorted(input for batch in model.batches for input in batch) == sorted(inputs)
+
+
+def test_repeated_inputs_are_cached():
+    model = FakeModel()
+    with InferenceEngine(model, cache_size=2) as engine:
+        for text in ["a", "b", "a", "a", "c", "a", "b"]:
+            assert engine.predict(text) == text.upper()
+
+    # "b" was evicted by "c"
+    assert model.batches == [["a"], ["b"], ["c"], ["b"]]
+    assert engine.num_cache_hits == 3
+
+
+def test_identical_inputs_in_a_batch_are_predicted_once():
+    model = FakeModel()
+    with InferenceEngine(model, max_wait=0.1, cache_size=0) as engine:
+        assert predict_concurrently(engine, ["a"] * 8) == ["A"] * 8
+
+    assert all(batch == ["a"] for batch in model.batches)
+
+
+def test_errors_are_raised_to_the_callers():
+    def predict_fn(inputs):
+        raise ValueError("Bad input")
+
+    with InferenceEngine(predict_fn) as engine:
+        with pytest.raises(ValueError, match="Bad input"):
+            engine.predict("a")
+
+
+def test_predict_before_start():
+    with pytest.raises(RuntimeError, match="not running"):
+        InferenceEngine(FakeModel()).predict("a")
+
+
+def test_close_answers_every_request():
+    model = FakeModel(latency=0.05)
+    engine = InferenceEngine(model, max_batch_size=2, max_wait=0.0)
+    engine.start()
+    results = {}
+
+    def predict(text):
+        try:
+            results[text] = engine.predict(text)
+        except RuntimeError as e:
+            results[text] = e
+
+    threads = [threading.Thread(target=predict, args=(f"text {index}",)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.01)
+    engine.close()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # The requests received before closing are predicted, the others raise rather than wait forever
+    assert not any(thread.is_alive() for thread in threads)
+    assert len(results) == 6
+    assert all(result == text.upper() or isinstance(result, RuntimeError) for text, result in results.items())
+    assert any(result == text.upper() for text, result in results.items())
+
+
+def test_predict_after_close():
+    engine = InferenceEngine(FakeModel())
+    with engine:
+        assert engine.predict("a") == "A"
+    with pytest.raises(RuntimeError, match="not running"):
+        engine.predict("b")
@@ -0,0 +1,147 @@
+import threading
+import time
+
+from flashy.components.model_cache import (
+    ModelCache,
+    fetch_checkpoint,
+    get_checkpoint_hash,
+    load_model,
+    warm_up_models,
+)
+from flashy.components.tasks import TaskMeta
+
+
+class FakeModel:
+    def __init__(self, checkpoint, size):
+        self.checkpoint = checkpoint
+        self.size = size
+
+
+def write_checkpoint(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+class Loader:
+    def __init__(self, size=10, latency=0.0):
+        self.size = size
+        self.latency = latency
+        self.loads = []
+
+    def __call__(self, checkpoint):
+        self.loads.append(checkpoint)
+        time.sleep(self.latency)
+        return FakeModel(checkpoint, self.size)
+
+
+def test_models_are_loaded_once(tmp_path):
+    checkpoint = write_checkpoint(tmp_path, "a.pt", b"a")
+    cache = ModelCache(size_fn=lambda model: model.size)
+    load = Loader()
+
+    model = cache.get(checkpoint, load)
+    assert cache.get(checkpoint, load) is model
+    assert load.loads == [checkpoint]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_changed_checkpoints_are_reloaded(tmp_path):
+    checkpoint = write_checkpoint(tmp_path, "a.pt", b"a")
+    cache = ModelCache(size_fn=lambda model: model.size)
+    load = Loader()
+
+    cache.get(checkpoint, load)
+    write_checkpoint(tmp_path, "a.pt", b"new weights")
+    cache.get(checkpoint, load)
+    assert load.loads == [checkpoint, checkpoint]
+
+
+def test_lru_eviction_within_budget(tmp_path):
+    a, b, c = (write_checkpoint(tmp_path, f"{name}.pt", name.encode()) for name in "abc")
+    cache = ModelCache(max_bytes=25, size_fn=lambda model: model.size)
+    load = Loader(size=10)
+
+    cache.get(a, load)
+    cache.get(b, load)
+    cache.get(a, load)
+    cache.get(c, load)
+
+    assert a in cache and c in cache and b not in cache
+    assert cache.size == 20
+
+
+def test_model_larger_than_budget_is_kept(tmp_path):
+    checkpoint = write_checkpoint(tmp_path, "a.pt", b"a")
+    cache = ModelCache(max_bytes=5, size_fn=lambda model: model.size)
+    cache.get(checkpoint, Loader(size=10))
+    assert checkpoint in cache
+
+
+def test_warm_up_and_concurrent_gets_load_once(tmp_path):
+    checkpoint = write_checkpoint(tmp_path, "a.pt", b"a")
+    cache = ModelCache(size_fn=lambda model: model.size)
+    load = Loader(latency=0.1)
+
+    thread = cache.warm_up(checkpoint, load)
+    models = []
+    getters = [threading.Thread(target=lambda: models.append(cache.get(checkpoint, load))) for _ in range(4)]
+    for getter in getters:
+        getter.start()
+    for getter in getters + [thread]:
+        getter.join()
+
+    assert load.loads == [checkpoint]
+    assert all(model is models[0] for model in models)
+
+
+def test_get_checkpoint_hash(tmp_path):
+    a = write_checkpoint(tmp_path, "a.pt", b"weights")
+    b = write_checkpoint(tmp_path, "b.pt", b"weights")
+    assert get_checkpoint_hash(a) == get_checkpoint_hash(b)
+
+
+class FakeTask:
+    loads = []
+
+    @classmethod
+    def load_from_checkpoint(cls, checkpoint):
+        cls.loads.append(checkpoint)
+        return FakeModel(checkpoint, 10)
+
+
+_FAKE_TASK = TaskMeta(__name__, "FakeData", __name__, "FakeTask", [], "val_accuracy", False, True, [])
+
+
+def test_warm_up_fetches_the_checkpoint_first(tmp_path):
+    cache = ModelCache(size_fn=lambda model: model.size)
+    checkpoint = str(tmp_path / "a.pt")
+    load = Loader()
+
+    thread = cache.warm_up(checkpoint, load, fetch_fn=lambda path: write_checkpoint(tmp_path, "a.pt", b"a"))
+    # A checkpoint already being warmed up is not warmed up twice
+    assert cache.warm_up(checkpoint, load) is None
+    thread.join()
+    assert checkpoint in cache
+    assert load.loads == [checkpoint]
+
+
+def test_warm_up_models_downloads_missing_checkpoints(drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_checkpoint(tmp_path / "drive", "run_0_checkpoint.pt", b"a")
+    cache = ModelCache(size_fn=lambda model: model.size)
+    FakeTask.loads = []
+
+    warm_up_models(_FAKE_TASK, ["run_0_checkpoint.pt", "run_1_checkpoint.pt"], model_cache=cache, drive=drive)
+    deadline = time.time() + 5
+    while (len(cache) == 0 or len(drive.downloads) < 2) and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert FakeTask.loads == ["run_0_checkpoint.pt"]
+    assert sorted(drive.downloads) == ["run_0_checkpoint.pt", "run_1_checkpoint.pt"]
+
+    # Once downloaded, the checkpoints are loaded from the model cache
+    assert fetch_checkpoint("run_0_checkpoint.pt", drive) == "run_0_checkpoint.pt"
+    assert sorted(drive.downloads) == ["run_0_checkpoint.pt", "run_1_checkpoint.pt"]
+    assert load_model(_FAKE_TASK, "run_0_checkpoint.pt", model_cache=cache).checkpoint == "run_0_checkpoint.pt"
+    assert FakeTask.loads == ["run_0_checkpoint.pt"]
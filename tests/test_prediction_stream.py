@@ -0,0 +1,44 @@
+from flashy.components.prediction_stream import PredictionStream
+
+
+class FakeDataset:
+    def __init__(self):
+        self.samples = []
+
+    def add_samples(self, samples):
+        self.samples.extend(samples)
+
+
+def make_chunk(start, num_batches, batch_size):
+    return [[{"filepath": f"{start + b * batch_size + i}.jpg"} for i in range(batch_size)] for b in range(num_batches)]
+
+
+def test_prediction_stream_adds_chunks_incrementally():
+    events = []
+    dataset = FakeDataset()
+    stream = PredictionStream(
+        dataset,
+        lambda prediction: prediction["filepath"],
+        on_first_chunk=lambda d: events.append(("first", len(d.samples))),
+        on_chunk=lambda d: events.append(("chunk", len(d.samples))),
+    )
+
+    assert stream.add(make_chunk(0, 2, 4)) == 8
+    assert events == [("first", 8)]
+
+    assert stream.add(make_chunk(8, 1, 4)) == 4
+    assert stream.add(make_chunk(12, 1, 2)) == 2
+    assert events == [("first", 8), ("chunk", 12), ("chunk", 14)]
+
+    assert dataset.samples == [f"{i}.jpg" for i in range(14)]
+    assert stream.num_chunks == 3
+    assert stream.num_samples == 14
+
+
+def test_prediction_stream_without_callbacks():
+    dataset = FakeDataset()
+    stream = PredictionStream(dataset, lambda prediction: prediction)
+    stream.add([])
+    stream.add(make_chunk(0, 1, 3))
+    assert stream.num_chunks == 2
+    assert len(dataset.samples) == 3
@@ -0,0 +1,109 @@
+import csv
+import os
+
+import numpy as np
+
+from flashy.components import tasks
+from flashy.components.preprocessing import (
+    PreprocessedCache,
+    get_preprocess_key,
+    get_preprocess_params,
+    load_preprocessed,
+    tokenize,
+)
+
+
+def fake_tokenizer(texts, max_length, truncation, padding, return_tensors):
+    input_ids = np.zeros((len(texts), max_length), dtype=np.int64)
+    for row, text in enumerate(texts):
+        tokens = [len(word) for word in text.split()][:max_length]
+        input_ids[row, : len(tokens)] = tokens
+    return {"input_ids": input_ids, "attention_mask": (input_ids > 0).astype(np.int64)}
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["review", "sentiment"])
+        writer.writerows(rows)
+
+
+_DATA_CONFIG = {"target": "from_csv", "input_field": "review", "target_fields": "sentiment"}
+
+
+def test_preprocess_params_are_shared_across_learning_rates():
+    text_task = tasks.text_classification
+    params = get_preprocess_params(text_task, _DATA_CONFIG, {"backbone": "prajjwal1/bert-tiny", "learning_rate": 0.1})
+    assert params == {"preprocessor": "tokenize", "backbone": "prajjwal1/bert-tiny", "max_length": 128}
+    assert params == get_preprocess_params(
+        text_task, _DATA_CONFIG, {"backbone": "prajjwal1/bert-tiny", "learning_rate": 0.01}
+    )
+
+    key = get_preprocess_key("sha", _DATA_CONFIG, params)
+    other_params = get_preprocess_params(text_task, _DATA_CONFIG, {"backbone": "prajjwal1/bert-mini"})
+    assert get_preprocess_key("sha", _DATA_CONFIG, other_params) != key
+    assert get_preprocess_key("other sha", _DATA_CONFIG, params) != key
+
+    assert get_preprocess_params(text_task, {"target": "from_json"}, {"backbone": "prajjwal1/bert-tiny"}) is None
+    assert get_preprocess_params(tasks.image_classification, {"target": "from_folders"}, {})["image_size"]
+
+
+def test_tokenize(tmp_path):
+    _write_csv(tmp_path / "train.csv", [("great movie", "pos"), ("so bad", "neg"), ("a fine film overall", "pos")])
+    _write_csv(tmp_path / "valid.csv", [("meh", "neg")])
+    data_config = dict(_DATA_CONFIG, train_file=str(tmp_path / "train.csv"), val_file=str(tmp_path / "valid.csv"))
+
+    dataset = tokenize(data_config, str(tmp_path / "out"), "fake", max_length=3, batch_size=2, tokenizer=fake_tokenizer)
+    assert dataset.labels == ["neg", "pos"]
+    assert dataset.splits["train"]["input_ids"].tolist() == [[5, 5, 0], [2, 3, 0], [1, 4, 4]]
+    assert dataset.splits["train"]["attention_mask"].tolist() == [[1, 1, 0], [1, 1, 0], [1, 1, 1]]
+    assert dataset.splits["train"]["targets"].tolist() == [1, 0, 1]
+    assert dataset.splits["val"]["targets"].tolist() == [0]
+
+
+def test_preprocessed_cache_shares_entries_through_the_drive(drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_csv(tmp_path / "train.csv", [("great movie", "pos"), ("so bad", "neg")])
+    data_config = dict(_DATA_CONFIG, train_file=str(tmp_path / "train.csv"))
+
+    builds = []
+
+    def build(root):
+        builds.append(root)
+        return tokenize(data_config, root, "fake", max_length=4, tokenizer=fake_tokenizer)
+
+    cache = PreprocessedCache(drive, root=str(tmp_path / "cache_1"))
+    dataset = cache.get("key", build)
+    assert len(builds) == 1
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert isinstance(dataset.splits["train"]["input_ids"], np.memmap)
+    assert cache.get("key", build).splits["train"]["targets"].tolist() == [1, 0]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Another work gets the entry from the drive
+    other_cache = PreprocessedCache(drive, root=str(tmp_path / "cache_2"))
+    other_dataset = other_cache.get("key", build)
+    assert len(builds) == 1
+    assert drive.downloads[0] == os.path.join("preprocessed", "key", "meta.json")
+    assert other_dataset.labels == ["neg", "pos"]
+    assert other_dataset.splits["train"]["input_ids"].tolist() == dataset.splits["train"]["input_ids"].tolist()
+    assert load_preprocessed(other_dataset.root).splits.keys() == {"train"}
+
+
+def test_preprocessed_cache_keeps_the_entries_of_concurrent_runs(shared_drive, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write_csv(tmp_path / "train.csv", [("great movie", "pos"), ("so bad", "neg")])
+    data_config = dict(_DATA_CONFIG, train_file=str(tmp_path / "train.csv"))
+
+    def build(root):
+        return tokenize(data_config, root, "fake", max_length=4, tokenizer=fake_tokenizer)
+
+    first = PreprocessedCache(shared_drive, root=str(tmp_path / "cache_1"))
+    first.get("key", build)
+    # Another work misses the entry while the first one is uploading it (its metadata is uploaded last)
+    os.remove(tmp_path / "drive" / "preprocessed" / "key" / "meta.json")
+
+    second = PreprocessedCache(shared_drive, root=str(tmp_path / "cache_2"))
+    assert second.get("key", build).splits["train"]["targets"].tolist() == [1, 0]
+    assert (second.hits, second.misses) == (0, 1)
+    assert os.path.exists(tmp_path / "drive" / "preprocessed" / "key" / "meta.json")
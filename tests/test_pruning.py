@@ -0,0 +1,64 @@
+import pytest
+
+from flashy.pruning import asha, median_stopping, should_prune
+
+
+def test_median_stopping():
+    siblings = [[0.5, 0.6, 0.7], [0.4, 0.5, 0.6]]
+
+    # The median of the running averages at step 2 is 0.5
+    assert median_stopping([0.3, 0.4], siblings)
+    assert not median_stopping([0.3, 0.6], siblings)
+    assert median_stopping([0.7, 0.6], siblings, mode="min")
+
+
+def test_median_stopping_needs_enough_siblings():
+    assert not median_stopping([0.1], [[0.9]])
+    assert not median_stopping([0.1, 0.1, 0.1, 0.1], [[0.9, 0.9], [0.9, 0.9]])
+    assert not median_stopping([0.1], [[0.9], [0.9]], grace_steps=2)
+
+
+def test_asha_only_compares_at_rungs():
+    siblings = [[0.9] * 9, [0.8] * 9]
+
+    # Rungs are at 1, 3 and 9 steps
+    assert asha([0.1], siblings)
+    assert not asha([0.95, 0.1], siblings)
+    assert asha([0.95, 0.1, 0.1], siblings)
+    assert not asha([0.1] * 4, siblings)
+
+
+def test_asha_keeps_the_top_fraction():
+    siblings = [[0.1], [0.2], [0.3], [0.4], [0.5]]
+
+    assert not asha([0.6], siblings)
+    assert not asha([0.45], siblings)
+    assert asha([0.3], siblings)
+    assert not asha([0.3], siblings[:1])
+    assert not asha([0.05], siblings, mode="min")
+
+
+def test_should_prune():
+    assert not should_prune("none", [0.0], [[1.0], [1.0], [1.0]])
+    assert should_prune("asha", [0.0], [[1.0], [1.0], [1.0]])
+
+    with pytest.raises(ValueError, match="Unknown pruner"):
+        should_prune("hyperband", [0.0], [])
+
+
+def test_asha_reduces_compute():
+    """Simulates a sweep of 9 runs of 9 validations each, with runs finishing one after the other."""
+    finals = [0.1 * index for index in (4, 8, 2, 6, 0, 7, 1, 5, 3)]
+    curves = [[final * (step + 1) / 9 for step in range(9)] for final in finals]
+
+    metrics = {index: [] for index in range(9)}
+    for index, curve in enumerate(curves):
+        for value in curve:
+            metrics[index].append(value)
+            siblings = [values for sibling, values in metrics.items() if sibling != index]
+            if asha(metrics[index], siblings):
+                break
+
+    assert sum(len(values) for values in metrics.values()) < 0.6 * 9 * 9
+    # The best run is never stopped
+    assert len(metrics[1]) == 9
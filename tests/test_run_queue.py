@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+from flashy.run_queue import admit_runs, count_running, get_compute_name
+
+
+class FakeWork:
+    def __init__(self, compute_name: str):
+        self.cloud_compute = SimpleNamespace(name=compute_name)
+        self.has_succeeded = False
+        self.has_failed = False
+        self.has_stopped = False
+
+
+def test_get_compute_name():
+    assert get_compute_name({"use_gpu": True}) == "gpu"
+    assert get_compute_name({"use_gpu": False}) == "cpu-small"
+    assert get_compute_name({}) == "cpu-small"
+
+
+def test_count_running():
+    works = [FakeWork("gpu"), FakeWork("gpu"), FakeWork("cpu-small"), FakeWork("cpu-small")]
+    works[1].has_succeeded = True
+    works[2].has_failed = True
+    works[3].has_stopped = True
+    assert count_running((work.cloud_compute.name, work) for work in works) == {"gpu": 1}
+
+
+def test_failed_launch_keeps_slot():
+    running = {}
+    queued = [{"id": str(index), "compute": "gpu", "priority": 0, "position": index} for index in range(3)]
+    launched = admit_runs(queued, running, lambda entry: entry["id"] != "0", max_concurrent_runs=1)
+    assert [entry["id"] for entry in launched] == ["1"]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError, match="Unknown queue policy"):
+        admit_runs([{"compute": "gpu", "priority": 0, "position": 0}], {}, lambda entry: True, policy="lifo")
@@ -0,0 +1,259 @@
+from lightning import LightningWork
+
+from flashy.run_scheduler import RunScheduler
+
+
+class FakeWork(LightningWork):
+    """Records its runs instead of training. Its status is set by the tests with ``set_stage``."""
+
+    def __init__(self, task, datasets, checkpoints, cloud_compute=None, **kwargs):
+        super().__init__(cloud_compute=cloud_compute, parallel=True)
+        self.task = task
+        self.kwargs = kwargs
+        self.id = None
+        self.num_runs = 0
+        self.stop_requested = None
+        self._stage = "not_started"
+
+    def run(self, id, dataset, data_config, model_config, launched_at=None, trainer_config=None):
+        self.id = id
+        self.num_runs += 1
+        self._stage = "running"
+
+    def set_stage(self, stage: str):
+        self._stage = stage
+
+    def stop(self):
+        self._stage = "stopped"
+
+    @property
+    def has_succeeded(self):
+        return self._stage == "succeeded"
+
+    @property
+    def has_failed(self):
+        return self._stage == "failed"
+
+    @property
+    def has_stopped(self):
+        return self._stage == "stopped"
+
+
+class FakePreparer(FakeWork):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.backbones = None
+
+    def run(self, dataset, data_config, backbones):
+        self.backbones = backbones
+        self._stage = "running"
+
+
+def make_runs(*ids, use_gpu=False):
+    return [
+        {"id": id, "task": "text_classification", "model_config": {"use_gpu": use_gpu}, "data_config": {}} for id in ids
+    ]
+
+
+def make_scheduler(**kwargs):
+    return RunScheduler(None, None, work_cls=FakeWork, preparer_cls=FakePreparer, **kwargs)
+
+
+def launched_ids(scheduler):
+    return list(scheduler.managed_works["runs"])
+
+
+def test_queue():
+    scheduler = make_scheduler()
+    runs = make_runs("a") + make_runs("b", use_gpu=True)
+    scheduler.queue("dataset", runs, priority=2)
+    assert [(entry["run"]["id"], entry["compute"], entry["priority"]) for entry in scheduler.queued_runs] == [
+        ("a", "cpu-small", 2),
+        ("b", "gpu", 2),
+    ]
+    # The compute is recorded on the runs rather than in their model config
+    assert runs[1]["compute"] == "gpu"
+    assert runs[1]["model_config"] == {}
+
+
+def test_global_limit_and_slots_freed():
+    scheduler = make_scheduler(max_concurrent_runs=2, work_kwargs={"checkpoint_format": "weights"})
+    scheduler.queue("dataset", make_runs("a", "b", "c", "d", "e"))
+
+    scheduler.run()
+    assert launched_ids(scheduler) == ["a", "b"]
+    # The launched runs are removed from the queue
+    assert [entry["run"]["id"] for entry in scheduler.queued_runs] == ["c", "d", "e"]
+    work = scheduler.get_work("runs", "a")
+    assert (work.id, work.cloud_compute.name, work.kwargs) == ("a", "cpu-small", {"checkpoint_format": "weights"})
+
+    scheduler.run()
+    assert launched_ids(scheduler) == ["a", "b"]
+
+    scheduler.get_work("runs", "a").set_stage("succeeded")
+    scheduler.run()
+    assert launched_ids(scheduler) == ["a", "b", "c"]
+
+    scheduler.get_work("runs", "b").set_stage("failed")
+    scheduler.get_work("runs", "c").set_stage("stopped")
+    scheduler.run()
+    assert launched_ids(scheduler) == ["a", "b", "c", "d", "e"]
+    assert scheduler.queued_runs == []
+
+
+def test_per_compute_limit_does_not_block_other_compute():
+    scheduler = make_scheduler(max_concurrent_runs_per_compute={"gpu": 1})
+    scheduler.queue("dataset", make_runs("gpu-0", "gpu-1", use_gpu=True) + make_runs("cpu-0"))
+
+    scheduler.run()
+    assert launched_ids(scheduler) == ["gpu-0", "cpu-0"]
+
+    scheduler.get_work("runs", "gpu-0").set_stage("succeeded")
+    scheduler.run()
+    assert launched_ids(scheduler) == ["gpu-0", "cpu-0", "gpu-1"]
+
+
+def test_priority_policy():
+    scheduler = make_scheduler(max_concurrent_runs=2, policy="priority")
+    scheduler.queue("dataset", make_runs("low"))
+    scheduler.queue("dataset", make_runs("high-0", "high-1"), priority=1)
+
+    scheduler.run()
+    assert launched_ids(scheduler) == ["high-0", "high-1"]
+
+
+def test_dequeue():
+    scheduler = make_scheduler(max_concurrent_runs=1)
+    scheduler.queue("dataset", make_runs("a", "b"))
+    scheduler.run()
+
+    # Only the runs which have not been launched yet can be dequeued
+    assert not scheduler.dequeue("a")
+    assert scheduler.dequeue("b")
+    assert scheduler.queued_runs == []
+
+    scheduler.get_work("runs", "a").set_stage("succeeded")
+    scheduler.run()
+    assert launched_ids(scheduler) == ["a"]
+
+
+def test_runs_are_launched_once_prepared():
+    scheduler = make_scheduler()
+    scheduler.prepare("1", "text_classification", "dataset", {}, ["bert-tiny", "bert-small"], preprocess=True)
+    scheduler.queue("dataset", make_runs("a", "b"), after="1")
+    scheduler.queue("dataset", make_runs("c"))
+    scheduler.run()
+    preparer = scheduler.get_work("preparations", "1")
+    assert preparer.backbones == ["bert-tiny", "bert-small"]
+    assert preparer.kwargs == {"preprocess": True}
+    # Only the run which does not wait for the preparation is launched
+    assert scheduler.get_work("runs", "a") is None
+    assert scheduler.get_work("runs", "c").id == "c"
+    assert [entry["run"]["id"] for entry in scheduler.queued_runs] == ["a", "b"]
+
+    preparer.set_stage("succeeded")
+    scheduler.run()
+    assert preparer.has_stopped
+    assert scheduler.get_work("runs", "a").id == "a"
+    assert scheduler.get_work("runs", "b").id == "b"
+    assert scheduler.queued_runs == []
+
+
+def test_failed_preparations_do_not_block_their_runs():
+    scheduler = make_scheduler()
+    scheduler.prepare("1", "text_classification", "dataset", {}, [None])
+    scheduler.queue("dataset", make_runs("a"), after="1")
+    scheduler.run()
+    assert scheduler.get_work("runs", "a") is None
+
+    scheduler.get_work("preparations", "1").set_stage("failed")
+    scheduler.run()
+    assert scheduler.get_work("runs", "a").id == "a"
+
+    # Runs queued after an unknown preparation do not wait
+    scheduler.queue("dataset", make_runs("b"), after="2")
+    scheduler.run()
+    assert scheduler.get_work("runs", "b").id == "b"
+
+
+def test_pooled_runs_reuse_idle_workers():
+    scheduler = make_scheduler(pool_size=1)
+    scheduler.queue("dataset", make_runs("a", "b"))
+
+    scheduler.run()
+    worker = scheduler.get_work("runs", "a")
+    assert worker.id == "a"
+    assert scheduler.get_work("runs", "b") is None
+
+    worker.set_stage("succeeded")
+    scheduler.run()
+    assert scheduler.get_work("runs", "b") is worker
+    assert (worker.id, worker.num_runs) == ("b", 2)
+    assert len(scheduler.worker_runs) == 1
+
+
+def test_pools_are_capped_at_the_pool_size():
+    scheduler = make_scheduler(pool_size=2)
+    scheduler.queue("dataset", make_runs("a", "b", "c") + make_runs("gpu", use_gpu=True))
+
+    scheduler.run()
+    # Each task and compute type has its own pool
+    assert launched_ids(scheduler) == ["a", "b", "gpu"]
+    assert len(scheduler.worker_runs) == 3
+    assert [entry["run"]["id"] for entry in scheduler.queued_runs] == ["c"]
+
+
+def test_dead_workers_are_replaced():
+    scheduler = make_scheduler(pool_size=1)
+    scheduler.queue("dataset", make_runs("a", "b"))
+    scheduler.run()
+
+    scheduler.get_work("runs", "a").set_stage("failed")
+    scheduler.run()
+    assert scheduler.get_work("runs", "b") is not scheduler.get_work("runs", "a")
+    assert scheduler.get_work("runs", "b").id == "b"
+    assert len(scheduler.worker_runs) == 2
+
+
+def test_workers_are_busy_until_they_pick_up_their_run():
+    scheduler = make_scheduler(pool_size=1)
+    scheduler.queue("dataset", make_runs("a", "b", "c"))
+    scheduler.run()
+    worker = scheduler.get_work("runs", "a")
+    worker.set_stage("succeeded")
+    scheduler.run()
+
+    # The worker still reports the status of its previous run until it picks up the next one
+    worker.id = "a"
+    worker.set_stage("succeeded")
+    scheduler.run()
+    assert scheduler.get_work("runs", "c") is None
+
+    worker.id = "b"
+    scheduler.run()
+    assert scheduler.get_work("runs", "c") is worker
+
+
+def test_stop_run():
+    scheduler = make_scheduler()
+    scheduler.queue("dataset", make_runs("a"))
+    scheduler.run()
+    assert scheduler.stop_run("a")
+    assert scheduler.get_work("runs", "a").has_stopped
+    assert not scheduler.stop_run("unknown")
+
+
+def test_stop_pooled_run_keeps_the_worker():
+    scheduler = make_scheduler(pool_size=1)
+    scheduler.queue("dataset", make_runs("a", "b"))
+    scheduler.run()
+
+    worker = scheduler.get_work("runs", "a")
+    assert scheduler.stop_run("a")
+    assert worker.stop_requested == "a"
+    assert not worker.has_stopped
+
+    # The worker ends the run and goes on with the next one
+    worker.set_stage("succeeded")
+    scheduler.run()
+    assert scheduler.get_work("runs", "b") is worker
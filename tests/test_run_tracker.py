@@ -0,0 +1,136 @@
+from flashy.run_tracker import RunTracker, get_best_run
+
+
+class FakeWork:
+    def __init__(self, id):
+        self.id = id
+        self.ready = False
+        self.progress = 0.0
+        self.monitor = None
+        self.checkpoint = None
+        self.has_succeeded = False
+        self.has_failed = False
+        self.has_stopped = False
+        self.num_polls = 0
+
+
+class RecordingResults(dict):
+    """The results of a sweep, recording which run IDs are written."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def __setitem__(self, run_id, result):
+        self.writes.append(run_id)
+        super().__setitem__(run_id, result)
+
+
+def make_result(progress, monitor=None, stage="full"):
+    return {"run": {"stage": stage}, "progress": progress, "monitor": monitor}
+
+
+def test_get_best_run():
+    sweep_results = {
+        "a": make_result("succeeded", 0.5),
+        "b": make_result("succeeded", 0.9),
+        "c": make_result("failed"),
+        "d": make_result("succeeded", 0.95, stage="screening"),
+    }
+    assert get_best_run(sweep_results) == "b"
+    assert get_best_run(sweep_results, mode="min") == "a"
+    assert get_best_run({"c": make_result("stopped")}) is None
+
+
+def make_runs(*ids):
+    return [{"id": id, "task": "text_classification"} for id in ids]
+
+
+def polling(works):
+    def get_work(run_id):
+        work = works.get(run_id)
+        if work is not None:
+            work.num_polls += 1
+        return work
+
+    return get_work
+
+
+def test_only_changed_results_are_written():
+    works = {"a": FakeWork("a"), "b": FakeWork("b")}
+    results = {1: RecordingResults()}
+    tracker = RunTracker()
+    tracker.track(1, make_runs("a", "b", "c"))
+
+    # The run without a work yet is skipped
+    assert tracker.update(results, polling(works)) == [(1, "a"), (1, "b")]
+    assert results[1]["a"]["progress"] == "launching"
+    assert "c" not in results[1]
+
+    results[1].writes.clear()
+    assert tracker.update(results, polling(works)) == []
+    assert results[1].writes == []
+
+    works["a"].ready = True
+    works["a"].progress = 0.5
+    assert tracker.update(results, polling(works)) == [(1, "a")]
+    assert results[1].writes == ["a"]
+    assert results[1]["a"]["progress"] == 0.5
+
+
+def test_terminal_results_are_frozen():
+    works = {"a": FakeWork("a"), "b": FakeWork("b")}
+    results = {1: RecordingResults()}
+    tracker = RunTracker()
+    tracker.track(1, make_runs("a", "b"))
+
+    works["a"].has_succeeded = True
+    works["a"].monitor = 0.9
+    works["a"].checkpoint = "a_checkpoint.safetensors"
+    works["b"].has_failed = True
+    assert tracker.update(results, polling(works)) == [(1, "a"), (1, "b")]
+    assert results[1]["a"]["checkpoint"] == "a_checkpoint.safetensors"
+    assert len(tracker) == 0
+
+    # The finished runs are no longer polled, and their results no longer change
+    works["a"].monitor = 0.1
+    assert tracker.update(results, polling(works)) == []
+    assert (works["a"].num_polls, works["b"].num_polls) == (1, 1)
+    assert results[1]["a"]["monitor"] == 0.9
+
+
+def test_restore():
+    running_runs = {1: make_runs("a", "b"), 2: make_runs("c")}
+    results = {1: {"a": {"run": running_runs[1][0], "progress": "succeeded"}, "b": {"progress": 0.5}}}
+    tracker = RunTracker()
+    tracker.track(3, make_runs("d"))
+
+    tracker.restore(running_runs, results)
+    assert len(tracker) == 2
+    assert "a" not in tracker
+    assert "b" in tracker and "c" in tracker
+    assert "d" not in tracker
+
+
+def test_cancel():
+    results = {}
+    tracker = RunTracker()
+    tracker.track(1, make_runs("a"))
+
+    tracker.cancel(results, "a")
+    assert results == {1: {"a": {"run": make_runs("a")[0], "progress": "stopped"}}}
+    assert "a" not in tracker
+    assert tracker.update(results, polling({"a": FakeWork("a")})) == []
+
+
+def test_runs_stopped_by_their_work_are_stopped():
+    work = FakeWork("a")
+    work.stopped = True
+    work.has_succeeded = True
+    results = {}
+    tracker = RunTracker()
+    tracker.track(1, make_runs("a"))
+
+    assert tracker.update(results, polling({"a": work})) == [(1, "a")]
+    assert results[1]["a"]["progress"] == "stopped"
+    assert "a" not in tracker
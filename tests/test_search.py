@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from flashy.search import TPESearch, get_observations, sample_random
+
+
+class Categorical:
+    def __init__(self, categories):
+        self.categories = categories
+
+    def sample(self):
+        return random.choice(self.categories)
+
+
+class Float:
+    def __init__(self, lower, upper):
+        self.lower = lower
+        self.upper = upper
+
+    def sample(self):
+        return random.uniform(self.lower, self.upper)
+
+
+SEARCH_SPACE = {
+    "backbone": Categorical(["resnet18", "efficientnet_b0", "mobilenet_v2"]),
+    "learning_rate": Float(0.00001, 0.01),
+    "use_gpu": False,
+}
+
+
+def objective(config):
+    """A synthetic validation accuracy, peaking for ``efficientnet_b0`` with a learning rate of 0.003."""
+    backbone_score = {"resnet18": 0.7, "efficientnet_b0": 0.9, "mobilenet_v2": 0.6}[config["backbone"]]
+    return backbone_score - 20 * abs(config["learning_rate"] - 0.003)
+
+
+def search(suggest, num_sweeps=8, sweep_size=5):
+    observations = []
+    for _ in range(num_sweeps):
+        for config in suggest(observations, sweep_size):
+            observations.append((config, objective(config)))
+    return observations
+
+
+def test_sample_random():
+    config = sample_random(SEARCH_SPACE, random.Random(0))
+    assert config["backbone"] in SEARCH_SPACE["backbone"].categories
+    assert 0.00001 <= config["learning_rate"] <= 0.01
+    assert config["use_gpu"] is False
+
+
+def test_tpe_samples_randomly_without_observations():
+    configs = TPESearch(SEARCH_SPACE, num_startup=5, seed=0).suggest([], 3)
+    assert len(configs) == 3
+    assert all(config["use_gpu"] is False for config in configs)
+    assert len({config["learning_rate"] for config in configs}) == 3
+
+
+def test_tpe_ignores_observations_outside_the_search_space():
+    observations = [({"backbone": "resnet101", "learning_rate": 0.001}, 1.0)] * 10
+    configs = TPESearch(SEARCH_SPACE, seed=0).suggest(observations, 20)
+    assert all(config["backbone"] in SEARCH_SPACE["backbone"].categories for config in configs)
+
+
+def test_tpe_finds_better_configs_than_random():
+    tpe_means, random_means = [], []
+    for seed in range(5):
+        rng = random.Random(seed)
+        tpe = TPESearch(SEARCH_SPACE, seed=seed)
+        tpe_observations = search(tpe.suggest)
+        random_observations = search(lambda _, count: [sample_random(SEARCH_SPACE, rng) for _ in range(count)])
+
+        # Compare the quality of the configs proposed in the last sweeps
+        tpe_means.append(sum(score for _, score in tpe_observations[-15:]) / 15)
+        random_means.append(sum(score for _, score in random_observations[-15:]) / 15)
+
+    assert sum(tpe_means) / len(tpe_means) > sum(random_means) / len(random_means) + 0.1
+
+
+@pytest.mark.parametrize("mode", ["min", "max"])
+def test_tpe_mode(mode):
+    sign = 1 if mode == "max" else -1
+    observations = [
+        ({"backbone": backbone, "learning_rate": 0.005}, sign * score)
+        for backbone, score in [("resnet18", 0.1), ("efficientnet_b0", 0.9), ("mobilenet_v2", 0.1)] * 4
+    ]
+    configs = TPESearch(SEARCH_SPACE, mode=mode, seed=0).suggest(observations, 20)
+    assert sum(config["backbone"] == "efficientnet_b0" for config in configs) > 10
+
+
+def test_get_observations():
+    results = {
+        1: {
+            "a": {"run": {"task": "t", "model_config": {"lr": 1}}, "progress": "succeeded", "monitor": 0.5},
+            "b": {"run": {"task": "t", "model_config": {"lr": 2}}, "progress": "failed"},
+            "c": {"run": {"task": "u", "model_config": {"lr": 3}}, "progress": "succeeded", "monitor": 0.7},
+        },
+        2: {
+            "d": {"run": {"task": "t", "model_config": {"lr": 4}}, "progress": "succeeded", "monitor": 0.9},
+        },
+    }
+    assert get_observations(results, lambda run: run["task"] == "t") == [({"lr": 1}, 0.5), ({"lr": 4}, 0.9)]
@@ -0,0 +1,63 @@
+import pytest
+
+from flashy.components.stage_timer import StageTimer, timed
+from flashy.run_tracker import to_chrome_trace
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_stage_timer():
+    clock = FakeClock()
+    timer = StageTimer(clock=clock)
+
+    with timer.stage("dataset"):
+        clock.now += 1
+        with timed(timer, "download"):
+            clock.now += 2
+    timer.record("train", 90.0)
+
+    assert timer.stages == [
+        {"name": "download", "start": 101.0, "duration": 2.0},
+        {"name": "dataset", "start": 100.0, "duration": 3.0},
+        {"name": "train", "start": 90.0, "duration": 13.0},
+    ]
+
+
+def test_stage_timer_records_failed_stages():
+    timer = StageTimer()
+    with pytest.raises(RuntimeError):
+        with timer.stage("checkpoint_upload"):
+            raise RuntimeError
+
+    assert [stage["name"] for stage in timer.stages] == ["checkpoint_upload"]
+
+
+def test_timed_without_timer():
+    with timed(None, "download"):
+        pass
+
+
+def test_to_chrome_trace():
+    results = {
+        "1": {
+            "a": {
+                "run": {"id": "a"},
+                "progress": "succeeded",
+                "timings": [{"name": "startup", "start": 1.0, "duration": 0.5}],
+            },
+            "b": {"run": {"id": "b"}, "progress": "queued"},
+        }
+    }
+    events = to_chrome_trace(results)["traceEvents"]
+
+    assert {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "Sweep 1"}} in events
+    assert {"name": "thread_name", "ph": "M", "pid": 1, "tid": 1, "args": {"name": "b"}} in events
+    (stage,) = [event for event in events if event["ph"] == "X"]
+    assert stage["name"] == "startup"
+    assert (stage["ts"], stage["dur"], stage["pid"], stage["tid"]) == (1e6, 0.5e6, 1, 0)
@@ -0,0 +1,32 @@
+from flashy.components.tasks import get_throughput_config, image_classification
+
+
+def test_get_throughput_config():
+    assert get_throughput_config(image_classification, "cpu-small") == {
+        "batch_size": 4,
+        "precision": 32,
+        "num_workers": 2,
+        "auto_batch_size": False,
+    }
+    assert get_throughput_config(image_classification, "gpu") == {
+        "batch_size": 32,
+        "precision": 16,
+        "num_workers": 4,
+        "auto_batch_size": True,
+    }
+
+
+def test_get_throughput_config_unknown_compute():
+    assert get_throughput_config(image_classification, "default") == get_throughput_config(
+        image_classification, "cpu-small"
+    )
+
+
+def test_get_throughput_config_overrides():
+    throughput_config = get_throughput_config(
+        image_classification,
+        "gpu",
+        overrides={"batch_size": 64, "backbone": "resnet18", "learning_rate": 0.01},
+    )
+    assert throughput_config["batch_size"] == 64
+    assert "backbone" not in throughput_config
@@ -0,0 +1,91 @@
+import ast
+
+from flashy.components import tasks
+from flashy.components.utilities import generate_script, get_template, render_script
+
+
+def _literal_kwargs(tree, func_name):
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, "attr", getattr(node.func, "id", None)) == func_name:
+            # Arguments taken from other objects (e.g. `num_classes=datamodule.num_classes`) are skipped
+            return {
+                keyword.arg: ast.literal_eval(keyword.value)
+                for keyword in node.keywords
+                if isinstance(keyword.value, ast.Constant)
+            }
+    raise AssertionError(f"No call to {func_name}")
+
+
+def test_get_template_is_cached():
+    assert get_template("flash_training.jinja") is get_template("flash_training.jinja")
+
+
+def test_training_script_quotes_values(tmpdir):
+    task_meta = tasks.image_classification
+    data_config = {"target": "from_folders", "train_folder": 'data/it\'s "here"\\train', "val_split": 0.1}
+    path = str(tmpdir / "scripts" / "flash_training.py")
+    generate_script(
+        path,
+        "flash_training.jinja",
+        data_module_import_path=task_meta.data_module_import_path,
+        data_module_class=task_meta.data_module_class,
+        task_import_path=task_meta.task_import_path,
+        task_class=task_meta.task_class,
+        linked_attributes=task_meta.linked_attributes,
+        data_config=data_config,
+        task_config={"backbone": "resnet18", "learning_rate": 0.001},
+        trainer_config={"max_epochs": 1, "limit_train_batches": 0.1},
+        monitor=task_meta.monitor,
+        batch_size=4,
+        num_workers=2,
+        precision=32,
+        auto_batch_size=False,
+    )
+
+    with open(path) as f:
+        tree = ast.parse(f.read())
+
+    assert _literal_kwargs(tree, "from_folders") == {
+        "train_folder": data_config["train_folder"],
+        "val_split": 0.1,
+        "batch_size": 4,
+        "num_workers": 2,
+    }
+    assert _literal_kwargs(tree, "ImageClassifier")["backbone"] == "resnet18"
+
+
+def test_fiftyone_script_quotes_values():
+    script = render_script(
+        "flash_fiftyone.jinja",
+        data_module_import_path="flash.image",
+        data_module_class="ImageClassificationData",
+        task_import_path="flash.image",
+        task_class="ImageClassifier",
+        url="https://example.com/data.zip",
+        data_config={"target": "from_folders", "val_folder": 'C:\\data\\"val"'},
+        checkpoint="checkpoints/run's.pt",
+        batch_size=32,
+        chunk_size=None,
+    )
+    tree = ast.parse(script)
+    assert _literal_kwargs(tree, "from_folders")["val_folder"] == 'C:\\data\\"val"'
+    assert 'load_model("checkpoints/run\'s.pt")' in script
+
+
+def test_gradio_script_quotes_values():
+    script = render_script(
+        "flash_gradio.jinja",
+        data_module_import_path="flash.text",
+        data_module_class="TextClassificationData",
+        task_import_path="flash.text",
+        task_class="TextClassifier",
+        url="https://example.com/data.zip",
+        checkpoint="checkpoints/run's.pt",
+        input_text='It\'s "great"',
+    )
+    tree = ast.parse(script)
+    assert _literal_kwargs(tree, "from_lists") == {"batch_size": 4}
+    assert (
+        ast.literal_eval(next(node for node in ast.walk(tree) if isinstance(node, ast.List)).elts[0]) == 'It\'s "great"'
+    )
+    assert 'load_from_checkpoint("checkpoints/run\'s.pt")' in script